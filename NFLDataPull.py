@@ -3,6 +3,87 @@ import pandas as pd
 import numpy as np
 
 from utils import patched_read_parquet
+from data_ingestion_pipeline import fumble_lost_flags, fumble_player_columns
+from teams import normalize_teams
+from players import attach_player_ids, build_player_index, correct_player_ids
+
+# the raw datasets load_data can get, each a function of the seasons. estimated_rows is roughly what one regular
+# season worth of it has (id_map is not per season) and columns what nfl_data_py returns, for the dry run
+DATASETS = {
+    'id_map': {'load': lambda years: nfl.import_ids(), 'estimated_rows': 12000, 'columns': 35, 'per_season': False},
+    'depth_charts': {'load': lambda years: nfl.import_depth_charts(years = years), 'estimated_rows': 37000, 'columns': 15, 'per_season': True},
+    'ngs_receiving': {'load': lambda years: nfl.import_ngs_data(stat_type = 'receiving', years = years).drop_duplicates(), 'estimated_rows': 2600, 'columns': 23, 'per_season': True},
+    'pfr_receiving': {'load': lambda years: nfl.import_weekly_pfr(s_type = "rec", years = years).drop_duplicates(), 'estimated_rows': 5300, 'columns': 24, 'per_season': True},
+    'weekly': {'load': lambda years: nfl.import_weekly_data(years = years, downcast=True).drop_duplicates(), 'estimated_rows': 5600, 'columns': 53, 'per_season': True},
+    'matchup_data': {'load': lambda years: nfl.import_schedules(years), 'estimated_rows': 285, 'columns': 46, 'per_season': True},
+    'ngs_rush': {'load': lambda years: nfl.import_ngs_data(stat_type = 'rushing', years = years).drop_duplicates(), 'estimated_rows': 600, 'columns': 22, 'per_season': True},
+    'pfr_rush': {'load': lambda years: nfl.import_weekly_pfr(s_type = "rush", years = years).drop_duplicates(), 'estimated_rows': 4300, 'columns': 16, 'per_season': True},
+}
+
+# play-by-play size for the dry run: plays in a season and the number of columns of the full download
+PBP_ROWS_PER_SEASON = 49000
+PBP_ALL_COLUMNS = 372
+# bytes per value we assume in the dry run, numbers are 8 and most strings are short
+BYTES_PER_VALUE = 8
+
+# every table needs these pbp columns: the game, the teams, the play itself, two point tries and what the fumble flags
+# look at (which includes the passer/rusher/receiver ids). offense_players (participation) is merged on old_game_id
+PBP_BASE_COLUMNS = [
+    'play_id', 'game_id', 'old_game_id', 'home_team', 'away_team', 'week', 'posteam', 'defteam', 'yardline_100', 'game_date',
+    'game_seconds_remaining', 'qtr', 'down', 'time', 'desc', 'play_type', 'yards_gained', 'score_differential', 'penalty',
+    'touchdown', 'two_point_attempt', 'two_point_conv_result', 'fumble', 'fumbled_1_team', 'fumbled_1_player_id',
+    'fumbled_1_player_name', 'fumbled_2_player_id', 'fumbled_2_player_name', 'fumbled_2_team', 'fumble_lost',
+    'passer_player_id', 'rusher_player_id', 'receiver_player_id', 'penalty_player_id', 'penalty_yards', 'replay_or_challenge',
+    'replay_or_challenge_result', 'penalty_type', 'timeout', 'first_down', 'epa',
+]
+
+# what each output table needs on top of that
+TABLE_DEPENDENCIES = {
+    'receiving': {
+        'datasets': ['id_map', 'depth_charts', 'matchup_data', 'ngs_receiving', 'pfr_receiving'],
+        'pbp_columns': ['pass_attempt', 'complete_pass', 'incomplete_pass', 'air_yards', 'yards_after_catch', 'receiver_player_name', 'receiving_yards'],
+    },
+    'rushing': {
+        'datasets': ['id_map', 'depth_charts', 'matchup_data', 'ngs_rush', 'pfr_rush'],
+        'pbp_columns': ['rush_attempt', 'rush_touchdown', 'rusher_player_name', 'rushing_yards'],
+    },
+    'passing': {
+        'datasets': ['id_map', 'depth_charts', 'matchup_data'],
+        'pbp_columns': ['pass_attempt', 'complete_pass', 'incomplete_pass', 'interception', 'air_yards', 'pass_touchdown', 'passer_player_name', 'passing_yards'],
+    },
+    # the weekly aggregates, only the full build keeps them around
+    'weekly': {
+        'datasets': ['weekly'],
+        'pbp_columns': [],
+    },
+}
+
+# the tables each paradigm builds
+PARADIGM_TABLES = {
+    'receiving': ['receiving'],
+    'rushing': ['rushing'],
+    'passing': ['passing'],
+    'all': ['receiving', 'rushing', 'passing', 'weekly'],
+}
+
+# the participation columns, nfl_data_py adds them when include_participation is set
+PARTICIPATION_COLUMNS = ['offense_players', 'players_on_play']
+
+# the team columns of every dataset, clean_data converts them to the shared team categorical (teams.TEAM_DTYPE)
+TEAM_COLUMNS = {
+    'id_map': ['team'],
+    'depth_charts': ['club_code'],
+    'ngs_receiving': ['team_abbr'],
+    'pfr_receiving': ['team'],
+    'weekly': ['recent_team', 'opponent_team'],
+    'matchup_data': ['away_team', 'home_team'],
+    'ngs_rush': ['team_abbr'],
+    'pfr_rush': ['team'],
+}
+
+# zero filled in clean_data when they are there. plays that don't result in a touchdown (or a stat) get a 0
+PBP_ZERO_FILL_COLUMNS = ['touchdown', 'interception', 'fumble_lost', 'passing_yards', 'pass_touchdown', 'rushing_yards', 'rush_touchdown', 'receiving_yards']
+
 
 class DataCreator():
     def __init__(self, years: list, paradigm:str = None):
@@ -20,79 +101,94 @@ class DataCreator():
         pd.read_parquet = patched_read_parquet
         
 
-    def load_data(self):
-        # this maps player ID's from accross multiple platforms. There is also associated player information like Name, College, etc. 
-        self.id_map = nfl.import_ids()
-
-        # we want to have depth charts as depth is likely a good predictor of fantasy value. 1st string is utilized more than 3rd string
-        self.depth_charts = nfl.import_depth_charts(years = self._years)
-
-        # importing next gen stats data from AWS
-        self.ngs_receiving = nfl.import_ngs_data(stat_type = 'receiving', years = self._years).drop_duplicates()
-
-        # pro football reference stats
-        self.pfr_receiving = nfl.import_weekly_pfr(s_type = "rec", years = self._years).drop_duplicates()
-
-        # # weekly aggregate stats
-        self.weekly = nfl.import_weekly_data(years = self._years, downcast=True).drop_duplicates()
-
-        # I need to standardize the game ID and player ID's accross the dataframes
-        self.matchup_data = nfl.import_schedules(self._years)
+    def plan(self):
+        """ the dependency plan of the paradigm: the tables it builds, the raw datasets those need and the pbp columns
+        to download. nothing else is loaded"""
+        tables = PARADIGM_TABLES[self._paradigm]
+        datasets = [d for d in DATASETS if any(d in TABLE_DEPENDENCIES[t]['datasets'] for t in tables)]
+        needed = set(PBP_BASE_COLUMNS).union(*[TABLE_DEPENDENCIES[t]['pbp_columns'] for t in tables])
+        # keep the order of PBP_BASE_COLUMNS and then the tables, so the plan reads the same every time
+        pbp_columns = list(dict.fromkeys(c for c in PBP_BASE_COLUMNS + [c for t in tables for c in TABLE_DEPENDENCIES[t]['pbp_columns']] if c in needed))
+        return {'tables': tables, 'datasets': datasets, 'pbp_columns': pbp_columns}
+
+    def dry_run(self):
+        """ prints the plan with a rough estimate of the rows and bytes every download holds, without downloading anything.
+        returns the estimates as a DataFrame"""
+        plan = self.plan()
+        rows = []
+        for d in plan['datasets']:
+            n = DATASETS[d]['estimated_rows'] * (len(self._years) if DATASETS[d]['per_season'] else 1)
+            rows.append({'dataset': d, 'rows': n, 'columns': DATASETS[d]['columns']})
+        n = PBP_ROWS_PER_SEASON * len(self._years)
+        rows.append({'dataset': 'pbp_data', 'rows': n, 'columns': len(plan['pbp_columns']) + len(PARTICIPATION_COLUMNS)})
+        estimate = pd.DataFrame(rows)
+        estimate['bytes'] = estimate['rows'] * estimate['columns'] * BYTES_PER_VALUE
+        estimate.loc[len(estimate)] = ['total', estimate['rows'].sum(), pd.NA, estimate['bytes'].sum()]
+        estimate = estimate.astype({'columns': 'Int64'})
+
+        print(f"paradigm {self._paradigm}: tables {', '.join(plan['tables'])}")
+        print(f"pbp columns ({len(plan['pbp_columns'])} of {PBP_ALL_COLUMNS}): {', '.join(plan['pbp_columns'])}")
+        print(estimate.to_string(index = False))
+        full = PBP_ROWS_PER_SEASON * len(self._years) * PBP_ALL_COLUMNS * BYTES_PER_VALUE
+        print(f"the full play-by-play download would be about {full / 1024**2:.0f} MB")
+        return estimate
+
+    def load_data(self, dry_run = False):
+        """ loads the datasets the paradigm needs (see plan). dry_run prints the plan instead"""
+        if dry_run:
+            return self.dry_run()
+        plan = self.plan()
+        self._pbp_columns = plan['pbp_columns']
+
+        # id_map maps player ID's from accross multiple platforms. There is also associated player information like Name, College, etc.
+        # depth charts as depth is likely a good predictor of fantasy value. 1st string is utilized more than 3rd string
+        # matchup_data lets us standardize the game ID and player ID's accross the dataframes
+        # next gen stats data from AWS and pro football reference stats per paradigm
+        for d in plan['datasets']:
+            setattr(self, d, DATASETS[d]['load'](self._years))
 
         # grab play-by-play data to synthesize some base stats. Adding in stats from other platforms after the fact.
-        # self.pbp_data = nfl.import_pbp_data(years = self._years)
         self.__load_pbp_data()
 
-        # importing rushing next gen stats data
-        self.ngs_rush = nfl.import_ngs_data(stat_type = 'rushing', years = self._years).drop_duplicates()
-
-        # rushing pro football reference stats
-        self.pfr_rush = nfl.import_weekly_pfr(s_type = "rush", years = self._years).drop_duplicates()
-
     def __load_pbp_data(self):
+        # only the columns of the plan are downloaded
+        columns = self._pbp_columns
         # TODO: This will fix itself in future iterations of the nfl_data_py project
         if 2024 in self._years:
             no_2024 = [x for x in self._years if x != 2024]
-            pbp_data = nfl.import_pbp_data(years=no_2024)
+            pbp_data = nfl.import_pbp_data(years=no_2024, columns=columns)
             
             # 2024 needs to be done with a separate flag
-            temp_2024_pbp = nfl.import_pbp_data(years=[2024], include_participation=False)
+            temp_2024_pbp = nfl.import_pbp_data(years=[2024], columns=columns, include_participation=False)
             for c in [c for c in pbp_data.columns.tolist() if c not in temp_2024_pbp.columns.tolist()]:
                 temp_2024_pbp[c] = np.nan
             
             self.pbp_data = pd.concat([pbp_data, temp_2024_pbp[pbp_data.columns.tolist()]], ignore_index = True)
         else: 
-            self.pbp_data = nfl.import_pbp_data(years = self._years)
+            self.pbp_data = nfl.import_pbp_data(years = self._years, columns = columns)
 
 
     def __load_rosters(self):
         pass
 
     def clean_data(self):
-        # fixing Conklin/Izzo issue
-        self.id_map['gsis_id'] = self.id_map['gsis_id'].replace({'00-0034439': '00-0034270', '00-0034270':'11-1111111'})
+        # fixing known id collisions (Conklin/Izzo, see players.ID_CORRECTIONS) and resolving players across id sources
+        correct_player_ids(self.id_map)
+        self.players = build_player_index(self.id_map)
 
         # we also need to map non-conventianal city abreviations for consistency
-        self.id_map['team'] = self.id_map['team'].replace({
-            'LVR':'LV',
-            'KCC':'KC',
-            'NOS':'NO',
-            'TBB':'TB',
-            'SFO':'SF',
-            'NEP':'NE',
-            'LAR':'LA',
-            'GBP':'GB',
-            'JAC':'JAX'
-        })
+        self._clean_club_codes()
 
         # here we grab unique game id's and home/away teams for each game in the season
         self.game_id_map = pd.concat([self.matchup_data[['game_id', 'home_team', 'week']].rename({'home_team':'team_abbr'}, axis=1), self.matchup_data[['game_id', 'away_team', 'week']].rename({'away_team':'team_abbr'}, axis=1)], ignore_index=False)
 
-        # merges the AWS data with the game id data from above
-        self.ngs_receiving = self.ngs_receiving.merge(self.game_id_map, left_on=['week', 'team_abbr'], right_on = ['week', 'team_abbr']).rename({'player_gsis_id':'player_id'},axis=1)
+        # the receiving data is only there when the paradigm needs it
+        if 'receiving' in self.plan()['tables']:
+            # merges the AWS data with the game id data from above
+            self.ngs_receiving = self.ngs_receiving.merge(self.game_id_map, left_on=['week', 'team_abbr'], right_on = ['week', 'team_abbr']).rename({'player_gsis_id':'player_id'},axis=1)
 
-        # merges the PFR data with the game id data from above
-        self.pfr_receiving = self.pfr_receiving.merge(self.id_map[['pfr_id', 'gsis_id']], left_on='pfr_player_id', right_on = 'pfr_id').rename({'gsis_id':'player_id'},axis=1)
+            # merges the PFR data with the game id data from above
+            self.pfr_receiving = attach_player_ids(self.pfr_receiving, 'pfr_player_id', 'pfr', self.players)
         
         # NOTE: The weekly data does not have the opponent team info for 2022. Thus we would need different logic to grab the game_id. 
         # We actually end up creating all the stats from this dataset by hand so there is no need.
@@ -110,17 +206,12 @@ class DataCreator():
         self.pbp_data = self.pbp_data[self.pbp_data.week <= 18]
 
         # just make sure that plays that don't result in a touchdown have data here. Another one-hot (ish)
-        self.pbp_data['touchdown'] = self.pbp_data['touchdown'].fillna(0)
-        self.pbp_data['interception'] = self.pbp_data['interception'].fillna(0)
-        self.pbp_data['fumble_lost'] = self.pbp_data['fumble_lost'].fillna(0)
-        self.pbp_data['passing_yards'] = self.pbp_data['passing_yards'].fillna(0)
-        self.pbp_data['pass_touchdown'] = self.pbp_data['pass_touchdown'].fillna(0)
-        self.pbp_data['rushing_yards'] = self.pbp_data['rushing_yards'].fillna(0)
-        self.pbp_data['rush_touchdown'] = self.pbp_data['rush_touchdown'].fillna(0)
-        self.pbp_data['receiving_yards'] = self.pbp_data['receiving_yards'].fillna(0)
+        for c in [c for c in PBP_ZERO_FILL_COLUMNS if c in self.pbp_data.columns]:
+            self.pbp_data[c] = self.pbp_data[c].fillna(0)
         # this creates a list of offensive players rather than a string. This helps later when we look at snaps played by each player
         # NOTE: Some of these are missing. 
-        self.pbp_data['offense_players'] = self.pbp_data['offense_players'].apply(lambda x: x.split(';') if type(x) == str else x)
+        if 'offense_players' in self.pbp_data.columns:
+            self.pbp_data['offense_players'] = self.pbp_data['offense_players'].apply(lambda x: x.split(';') if type(x) == str else x)
 
         # we are also going to restrict to data that we need in the pbp_data, this will make it easier to look at
         rel_cols_pbp = [
@@ -171,8 +262,6 @@ class DataCreator():
             'rusher_player_id',
             'rusher_player_name',
             'rushing_yards',
-            'fumbled_1_player_id',
-            'fumbled_2_player_id',
             'penalty_player_id',
             'penalty_yards',
             'replay_or_challenge',
@@ -185,54 +274,18 @@ class DataCreator():
             'first_down'
         ]
 
-        self.pbp_data = self.pbp_data[rel_cols_pbp].copy()
+        # the paradigm only downloaded the columns its tables need
+        self.pbp_data = self.pbp_data[[c for c in rel_cols_pbp if c in self.pbp_data.columns]].copy()
+
+    def _clean_club_codes(self):
+        # every team column of the datasets the plan loaded becomes TEAM_DTYPE, so the aliases (LA, LVR, ...) are
+        # resolved the same way everywhere and the joins on team below match
+        for d in self.plan()['datasets']:
+            normalize_teams(getattr(self, d), TEAM_COLUMNS[d])
+        # and every team column of the pbp data (posteam, defteam, home_team, fumbled_1_team, ...)
+        normalize_teams(self.pbp_data)
 
     def engineer_features(self):
 
         # get fumbled player
-        self.pbp_data['receiver_fumble_lost'] = self.pbp_data.apply(lambda x: self.__get_fumble(x, ptype='rec'), axis=1)
-        self.pbp_data['rusher_fumble_lost'] = self.pbp_data.apply(lambda x: self.__get_fumble(x, ptype='rush'), axis=1)
-        self.pbp_data['passer_fumble_lost'] = self.pbp_data.apply(lambda x: self.__get_fumble(x, ptype='pass'), axis=1)
-
-        
-    
-    def __get_fumbles(self, x, ptype = 'rec'):
-
-        if ptype == 'rec':
-            rpid = x['receiver_player_id']
-        elif ptype == 'rush':
-            rpid = x['rusher_player_id']
-        elif ptype == 'pass':
-            rpid = x['passer_player_id']
-
-        fpid1 = x['fumbled_1_player_id'].values[0]
-        fpid2 = x['fumbled_2_player_id'].values[0]
-        fteam1 = x['fumbled_1_team']
-        fteam2 = x['fumbled_2_team']
-
-        if fpid1 is None:
-            fpid1 = ''
-        
-        if fpid2 is None:
-            fpid2 = ''
-        
-        if fteam1 is None:
-            fteam1 = ''
-        
-        if fteam2 is None:
-            fteam2 = ''
-
-        offense = x['posteam']
-        # if there was a fumble and the receiver we are looking at was one of the fumble players
-        if x['fumble_lost'] == 1 and (fpid1 == rpid or fpid2 == rpid):
-            # the only time this is not a fumble for the player in consideration is when
-            # there are two fumbles by the offense and the second player is not the first player.
-            # e.g. player 1 fumbled and it was picked up by teammate player 2, then player 2 fumbles
-            # and it is recovered by the defense
-            if (fpid1 == rpid and fpid2 != rpid) and \
-                (fteam1 == offense and fteam2 == offense):
-                return 0
-            else:
-                return 1
-        else:
-            return 0
+        self.pbp_data[list(fumble_player_columns)] = fumble_lost_flags(self.pbp_data)
@@ -0,0 +1,52 @@
+""" memory of the PrepData pipeline with and without compact mode, on 10 synthetic seasons. prints the compact run's
+memory_report (bytes of every frame before and after compaction) and how far its scaled features are from the
+float64 run's.
+
+    python benchmarks/bench_compact.py
+"""
+import contextlib
+import io
+import os
+import tempfile
+
+import numpy as np
+
+from synthetic import SEASONS, patch_nfl, write_inputs
+
+
+def run(compact):
+    from prepare_data import PrepData
+
+    data = PrepData(compact = compact)
+    data.read_data(path = './data/')
+    data.clean_data()
+    data.get_top_n(n = 20, roll_window = 3, viz = False)
+    data.window_data()
+    data.add_external_stats()
+    data.split_test_train(year_split = SEASONS[-1])
+    data.scale_data()
+    return data
+
+
+def main():
+    patch_nfl()
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as path:
+        # the roster/game dimension files go under ./data/rosters/
+        os.chdir(path)
+        try:
+            write_inputs('./data/')
+            with contextlib.redirect_stdout(io.StringIO()):
+                full, compact = run(False), run(True)
+        finally:
+            os.chdir(cwd)
+
+    report = compact.memory_report()
+    print((report[['bytes_before', 'bytes_after']] / 1024**2).round(1).rename(lambda c: c.replace('bytes', 'MB'), axis = 1).assign(ratio = report['ratio'].round(2)))
+    for name in ['X_train_scaled', 'X_test_scaled']:
+        diff = np.nanmax(np.abs(getattr(full, name).astype(float) - getattr(compact, name)))
+        print(f'{name}: {getattr(compact, name).dtype}, max difference to the float64 run {diff:.1e}')
+
+
+if __name__ == '__main__':
+    main()
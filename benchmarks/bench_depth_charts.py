@@ -0,0 +1,58 @@
+""" the depth chart index and the injured starter counts on 10 synthetic seasons, and on 2 of them against a plain
+python reference (the best depth per player with a groupby, the latest chart per report in a loop) that has to give
+the same counts.
+
+    python benchmarks/bench_depth_charts.py
+"""
+import pandas as pd
+
+from synthetic import SEASONS, TEAMS, depth_charts, injuries, report, schedules, team_players, timed
+from depth_charts import STARTER_FORMATIONS, build_depth_index, injured_starters
+from players import build_player_index
+from season_calendar import build_games, team_games
+
+
+def reference_counts(charts, reports):
+    """ {(team, season, week, formation): injured starters}, one report at a time"""
+    dc = charts[(charts['position'] == charts['depth_position']) & charts['depth_team'].notna()]
+    best = dc.groupby(['team', 'season', 'week', 'formation', 'gsis_id']).depth_team.min()
+    chart_weeks = dc.groupby(['team', 'season']).week.apply(lambda x: sorted(set(x))).to_dict()
+    counts = {}
+    for r in reports[reports['report_status'] == 'Out'].itertuples():
+        weeks = [w for w in chart_weeks.get((r.team, r.season), []) if w <= r.week]
+        if not weeks:
+            continue
+        for formation in STARTER_FORMATIONS:
+            if best.get((r.team, r.season, weeks[-1], formation, r.gsis_id)) == 1:
+                counts[(r.team, r.season, r.week, formation)] = counts.get((r.team, r.season, r.week, formation), 0) + 1
+    return counts
+
+
+def run(seasons, players):
+    charts = depth_charts(seasons).rename({'club_code': 'team'}, axis = 1)
+    reports = injuries(seasons)
+    grid = team_games(build_games(schedules(seasons)))
+    grid = grid[grid['game_type'] == 'REG']
+    seconds, out = timed(lambda: injured_starters(reports, build_depth_index(charts, players), players, grid))
+    return charts, reports, seconds, out
+
+
+def main():
+    players = build_player_index(pd.DataFrame({'gsis_id': [p for team in TEAMS for p, _ in team_players(team)]}), path = None)
+
+    charts, reports, full_time, _ = run(SEASONS, players)
+    print(f'{len(SEASONS)} seasons: {len(charts)} depth chart rows, {len(reports)} injury reports')
+
+    small_charts, small_reports, small_time, out = run(SEASONS[-2:], players)
+    reference_time, counts = timed(lambda: reference_counts(small_charts, small_reports), repeat = 1)
+    for formation, column in STARTER_FORMATIONS.items():
+        expected = [counts.get((r.team, r.season, r.week, formation), 0) for r in out.itertuples()]
+        assert out[column].tolist() == expected, column
+
+    report([(f'index + injured starters, {len(SEASONS)} seasons', full_time),
+            ('index + injured starters, 2 seasons', small_time),
+            ('reference loop, 2 seasons', reference_time)])
+
+
+if __name__ == '__main__':
+    main()
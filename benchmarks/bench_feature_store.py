@@ -0,0 +1,47 @@
+""" reading the receiving table from the csv export against the parquet feature store, on 10 synthetic seasons:
+the full table (everything but DROP_COLUMNS, what read_data reads by default) and a two season WR slice of a few
+columns, which the store answers from its partitions.
+
+    python benchmarks/bench_feature_store.py
+"""
+import os
+import tempfile
+
+import pandas as pd
+
+from synthetic import SEASONS, report, timed, write_inputs
+
+SLICE_COLUMNS = ['player_id', 'game_id', 'season', 'week', 'position', 'team', 'targets_1', 'receptions', 'receiving_yards',
+                 'air_yards', 'receiving_fpoints']
+
+
+def main():
+    from prepare_data import DATA_FILES, DROP_COLUMNS
+    from feature_store import build_store, read_table
+
+    with tempfile.TemporaryDirectory() as path:
+        rows = write_inputs(path)
+        store = os.path.join(path, 'store')
+        build_store(DATA_FILES, path = path, store = store)
+        csv = os.path.join(path, DATA_FILES['receiving'])
+        print(f'{rows} receiving rows over {len(SEASONS)} seasons')
+
+        csv_time, from_csv = timed(lambda: pd.read_csv(csv, usecols = lambda c: c not in DROP_COLUMNS))
+        columns = list(from_csv.columns)
+        store_time, from_store = timed(lambda: read_table('receiving', columns = columns, store = store))
+        # the store comes back grouped by partition
+        key = ['player_id', 'game_id']
+        pd.testing.assert_frame_equal(from_csv.sort_values(key).reset_index(drop = True)[columns],
+                                      from_store.sort_values(key).reset_index(drop = True)[columns], check_dtype = False, check_categorical = False)
+
+        seasons = SEASONS[-2:]
+        slice_time, wr = timed(lambda: read_table('receiving', columns = SLICE_COLUMNS, seasons = seasons, positions = ['WR'], store = store))
+        assert set(wr['season']) == set(seasons) and set(wr['position']) == {'WR'}
+
+    report([('full receiving table: csv', csv_time),
+            ('full receiving table: store', store_time),
+            (f'{len(seasons)} season WR slice, {len(SLICE_COLUMNS)} columns: store', slice_time)])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+""" what each NFLDataPull paradigm downloads: the dry run estimate of its plan against the bytes load_data actually
+holds when the importers return synthetic frames of the estimated size (numbers are floats, ids/names/teams short
+strings), next to the full play-by-play download. the text columns take a lot more than the 8 bytes a value the
+estimate assumes, so loaded comes out a few times the estimate.
+
+    python benchmarks/bench_plan.py
+"""
+import contextlib
+import io
+
+import numpy as np
+import pandas as pd
+
+from synthetic import SEASONS
+
+# pbp columns that hold text, the rest are numbers
+TEXT_SUFFIXES = ('_id', '_name', 'team', 'desc', 'time', 'game_date', 'play_type', 'players_on_play', 'offense_players')
+
+
+def fake_frame(rows, columns, seed = 0):
+    """ rows of the given columns, text columns get one of 50 short strings"""
+    rng = np.random.default_rng(seed)
+    labels = np.array([f'00-{i:07d}' for i in range(50)], dtype = object)
+    return pd.DataFrame({c: labels[rng.integers(0, 50, rows)] if c.endswith(TEXT_SUFFIXES) else rng.random(rows) for c in columns})
+
+
+def patch_importers(years):
+    """ every importer DataCreator calls returns a frame of the size DATASETS (and the pbp constants) estimate for it"""
+    import nfl_data_py as nfl
+    import NFLDataPull
+
+    def sized(name):
+        meta = NFLDataPull.DATASETS[name]
+        rows = meta['estimated_rows'] * (len(years) if meta['per_season'] else 1)
+        return fake_frame(rows, [f'{name}_{i}' for i in range(meta['columns'])])
+
+    nfl.import_ids = lambda: sized('id_map')
+    nfl.import_depth_charts = lambda years: sized('depth_charts')
+    nfl.import_ngs_data = lambda stat_type, years: sized('ngs_receiving' if stat_type == 'receiving' else 'ngs_rush')
+    nfl.import_weekly_pfr = lambda s_type, years: sized('pfr_receiving' if s_type == 'rec' else 'pfr_rush')
+    nfl.import_weekly_data = lambda years, downcast = True: sized('weekly')
+    nfl.import_schedules = lambda years: sized('matchup_data')
+
+    def import_pbp_data(years, columns, include_participation = True):
+        columns = columns + (NFLDataPull.PARTICIPATION_COLUMNS if include_participation else [])
+        return fake_frame(NFLDataPull.PBP_ROWS_PER_SEASON * len(years), columns)
+    nfl.import_pbp_data = import_pbp_data
+
+
+def main():
+    years = SEASONS[-3:]
+    patch_importers(years)
+    from NFLDataPull import BYTES_PER_VALUE, DATASETS, PARADIGM_TABLES, PBP_ALL_COLUMNS, PBP_ROWS_PER_SEASON, DataCreator
+
+    rows = []
+    for paradigm in PARADIGM_TABLES:
+        creator = DataCreator(years, paradigm)
+        with contextlib.redirect_stdout(io.StringIO()):
+            estimate = creator.dry_run()
+        creator.load_data()
+        plan = creator.plan()
+        loaded = sum(getattr(creator, d).memory_usage(deep = True).sum() for d in plan['datasets'] + ['pbp_data'])
+        rows.append({'paradigm': paradigm,
+                     'datasets': len(plan['datasets']),
+                     'pbp_columns': len(plan['pbp_columns']),
+                     'estimated_MB': estimate['bytes'].iloc[-1] / 1024**2,
+                     'loaded_MB': loaded / 1024**2})
+
+    print(f'{len(years)} seasons, {len(DATASETS)} raw datasets')
+    print(pd.DataFrame(rows).round(1).to_string(index = False))
+    print(f'the full play-by-play download: {PBP_ROWS_PER_SEASON * len(years) * PBP_ALL_COLUMNS * BYTES_PER_VALUE / 1024**2:.0f} MB')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+""" the player identity index on a synthetic id map of 12k players: building it from scratch and rebuilding it on top
+of the persisted one (keys kept), and resolving 300k pfr ids by merging on the id map (what the DataCreators used to do)
+against attach_player_ids.
+
+    python benchmarks/bench_player_index.py
+"""
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from synthetic import report, timed
+from players import attach_player_ids, build_player_index, correct_player_ids
+
+
+def id_map(n = 12000, seed = 4):
+    """ nfl.import_ids: every player has a gsis and pfr id, most of them an espn and sleeper one (floats, like the
+    real table), a few have no gsis id"""
+    rng = np.random.default_rng(seed)
+    ids = pd.DataFrame({'gsis_id': [f'00-{i:07d}' for i in range(n)],
+                        'pfr_id': [f'Pl{i:05d}' for i in range(n)],
+                        'espn_id': np.where(rng.random(n) < 0.8, np.arange(n) + 3000000, np.nan),
+                        'sleeper_id': np.where(rng.random(n) < 0.7, np.arange(n) + 100.0, np.nan),
+                        'name': [f'N{i}' for i in range(n)]})
+    ids.loc[rng.choice(n, 50, replace = False), 'gsis_id'] = None
+    correct_player_ids(ids)
+    return ids
+
+
+def main():
+    ids = id_map()
+    rng = np.random.default_rng(5)
+    pfr = pd.DataFrame({'pfr_player_id': rng.choice(ids['pfr_id'].tolist() + ['Unknown0'], 300000), 'x': rng.random(300000)})
+
+    with tempfile.TemporaryDirectory() as path:
+        path = os.path.join(path, 'player_index.parquet')
+        build_time, index = timed(lambda: build_player_index(ids, path = None))
+        build_player_index(ids, path = path)
+        # next season: shuffled and a rookie class
+        later = pd.concat([ids.sample(frac = 1, random_state = 6),
+                           pd.DataFrame({'gsis_id': [f'00-9{i:06d}' for i in range(300)], 'pfr_id': [f'Ro{i:05d}' for i in range(300)]})], ignore_index = True)
+        rebuild_time, rebuilt = timed(lambda: build_player_index(later, path = path))
+        assert (rebuilt['player_key'].iloc[:len(index)] == index['player_key']).all()
+
+    merge_time, merged = timed(lambda: pfr.merge(ids[['pfr_id', 'gsis_id']], left_on = 'pfr_player_id', right_on = 'pfr_id').rename({'gsis_id': 'player_id'}, axis = 1))
+    lookup_time, attached = timed(lambda: attach_player_ids(pfr, 'pfr_player_id', 'pfr', index))
+    key = ['pfr_player_id', 'x']
+    pd.testing.assert_frame_equal(merged.sort_values(key).reset_index(drop = True)[key + ['player_id']],
+                                  attached.sort_values(key).reset_index(drop = True)[key + ['player_id']])
+
+    report([(f'build_player_index, {len(ids)} players', build_time),
+            (f'rebuild on the stored index, {len(later)} players', rebuild_time),
+            (f'{len(pfr)} pfr ids: merge on the id map', merge_time),
+            (f'{len(pfr)} pfr ids: attach_player_ids', lookup_time)])
+
+
+if __name__ == '__main__':
+    main()
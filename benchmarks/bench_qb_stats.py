@@ -0,0 +1,96 @@
+""" the QB tables on 10 synthetic seasons: the per game passing stats with the notebook's row-wise get_QBR apply against
+qb_game_stats, and the starting QBs with the notebook's idxmin and row-wise new starter flag against qb_starters. the
+notebook versions are kept here as the reference and both pairs have to give the same frames.
+
+    python benchmarks/bench_qb_stats.py
+"""
+import numpy as np
+import pandas as pd
+
+from synthetic import SEASONS, player_id, report, schedules, timed
+from qb_stats import qb_game_stats, qb_starters
+from season_calendar import build_games, team_games
+
+KEYS = ['passer_player_id', 'game_id', 'posteam', 'week']
+
+
+def plays(grid, per_game = 130, seed = 6):
+    """ per_game offensive plays of every team game, thrown by the team's QB1 (now and then QB2)"""
+    rng = np.random.default_rng(seed)
+    n = len(grid) * per_game
+    rows = grid.loc[grid.index.repeat(per_game)].reset_index(drop = True)
+    passer = [player_id(team, number) for team, number in zip(rows['team'], (rng.random(n) < 0.05).astype(int))]
+    play_type = rng.choice(['pass', 'run', 'no_play', None], n, p = [0.55, 0.35, 0.05, 0.05])
+    return pd.DataFrame({
+        'game_id': rows['game_id'],
+        'posteam': pd.Categorical(rows['team']),
+        'week': rows['week'],
+        'passer_player_id': np.where(play_type == 'pass', passer, None),
+        'play_type': play_type,
+        'complete_pass': np.where(rng.random(n) < 0.9, rng.integers(0, 2, n), np.nan),
+        'passing_yards': rng.integers(-5, 40, n).astype(float),
+        'touchdown': rng.integers(0, 2, n) * (rng.random(n) < 0.1),
+        'interception': (rng.random(n) < 0.03).astype(float),
+        'down': np.where(rng.random(n) < 0.8, rng.integers(1, 5, n), np.nan),
+    })
+
+
+def get_QBR(x):
+    terms = [5 * (x['completion_percentage'] - 0.3), 0.25 * (x['yards_per_attempt'] - 3), 20 * x['td_percentage'], 2.375 - 25 * x['interception_percentage']]
+    terms = [0 if t < 0 else 2.375 if t > 2.375 else t for t in terms]
+    return pd.Series({'QBR': 100 * sum(terms) / 6}, index = ['QBR'])
+
+
+def notebook_game_stats(pbp):
+    passes = pbp[pbp['play_type'] == 'pass'].groupby(KEYS, observed = True)
+    snaps = pbp.groupby(KEYS, observed = True)['down'].count().reset_index().rename({'down': 'qb_num_snaps'}, axis = 1)
+    qb = passes.agg(completions = ('complete_pass', 'sum'), attempts = ('complete_pass', 'count'), passing_yards = ('passing_yards', 'sum'),
+                    touchdowns = ('touchdown', 'sum'), interceptions = ('interception', 'sum')).reset_index()
+    for rate, stat in [('completion_percentage', 'completions'), ('yards_per_attempt', 'passing_yards'), ('td_percentage', 'touchdowns'), ('interception_percentage', 'interceptions')]:
+        qb[rate] = qb[stat] / qb['attempts']
+    qb['QBR'] = qb.apply(get_QBR, axis = 1)
+    return qb.merge(snaps, on = KEYS)
+
+
+def depth_rows(grid, seed = 7):
+    """ the QB depth chart rows of every team game: the team's three QBs, a random depth each"""
+    rng = np.random.default_rng(seed)
+    rows = grid.loc[grid.index.repeat(3)].reset_index(drop = True)
+    qbs = pd.DataFrame({'game_id': rows['game_id'], 'team': rows['team'].astype('category'),
+                        'player_id': [player_id(team, i % 3) for i, team in enumerate(rows['team'])],
+                        'season': rows['season'], 'week': rows['week'], 'depth_team': rng.integers(1, 4, len(rows)).astype(float)})
+    return qbs.sort_values(['game_id', 'team', 'depth_team', 'player_id'])
+
+
+def notebook_starters(qbs):
+    qb_1 = qbs.loc[qbs.groupby(['game_id', 'team'], observed = True)['depth_team'].idxmin()][['game_id', 'team', 'player_id', 'season', 'week']]
+    prev = qb_1[['season', 'team', 'player_id', 'week']].copy()
+    prev['week'] += 1
+    qb_1 = qb_1.merge(prev.rename({'player_id': 'prev_player_id'}, axis = 1), on = ['season', 'team', 'week'], how = 'left')
+    qb_1['is_new_qb_starter'] = qb_1.apply(lambda x: 0 if ((x['player_id'] == x['prev_player_id']) or (x['week'] == 1)) else 1, axis = 1)
+    return qb_1.drop('prev_player_id', axis = 1)
+
+
+def main():
+    grid = team_games(build_games(schedules()))
+    grid = grid[grid['game_type'] == 'REG'].reset_index(drop = True)
+    pbp = plays(grid)
+    qbs = depth_rows(grid)
+    print(f'{len(SEASONS)} seasons: {len(pbp)} plays, {len(qbs)} QB depth chart rows')
+
+    old_stats_time, expected = timed(lambda: notebook_game_stats(pbp), repeat = 1)
+    stats_time, stats = timed(lambda: qb_game_stats(pbp))
+    pd.testing.assert_frame_equal(stats, expected)
+
+    old_starters_time, expected = timed(lambda: notebook_starters(qbs), repeat = 1)
+    starters_time, starters = timed(lambda: qb_starters(qbs))
+    pd.testing.assert_frame_equal(starters[expected.columns].reset_index(drop = True), expected)
+
+    report([(f'game stats, {len(stats)} QB games: notebook apply', old_stats_time),
+            (f'game stats, {len(stats)} QB games: qb_game_stats', stats_time),
+            (f'starters, {len(starters)} team games: notebook idxmin + apply', old_starters_time),
+            (f'starters, {len(starters)} team games: qb_starters', starters_time)])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+""" the roster dimension on 10 synthetic seasons: the two row-wise applies get_rosters used to fill depth_position
+against the where/fillna that replaced them, and get_rosters building every season file (cold) against reading
+them back (warm).
+
+    python benchmarks/bench_rosters.py
+"""
+import tempfile
+
+import pandas as pd
+
+from synthetic import SEASONS, depth_charts, patch_nfl, report, timed, weekly_rosters
+
+
+def blank_positions_apply(charts):
+    return charts.apply(lambda x: x['position'] if x['depth_position'].strip() == '' else x['depth_position'], axis = 1)
+
+
+def blank_positions_where(charts):
+    return charts['depth_position'].where(charts['depth_position'].str.strip() != '', charts['position'])
+
+
+def missing_positions_apply(final):
+    return final.apply(lambda x: x['position'] if (x['depth_position'] != x['depth_position'] or x['depth_position'] is None) else x['depth_position'], axis = 1)
+
+
+def missing_positions_fillna(final):
+    return final['depth_position'].fillna(final['position'])
+
+
+def main():
+    charts = depth_charts()
+    charts = charts[charts['formation'] == 'Offense'].reset_index(drop = True)
+    # rosters left joined to the charts, players without a chart entry have no depth_position
+    final = weekly_rosters().merge(charts[['season', 'week', 'gsis_id', 'depth_position']].rename({'gsis_id': 'player_id'}, axis = 1),
+                                   on = ['season', 'week', 'player_id'], how = 'left')
+    print(f'{len(charts)} offensive depth chart rows, {len(final)} roster rows')
+
+    rows = []
+    for what, old, new, df in [('blank depth_position', blank_positions_apply, blank_positions_where, charts),
+                               ('missing depth_position', missing_positions_apply, missing_positions_fillna, final)]:
+        old_time, expected = timed(lambda: old(df), repeat = 1)
+        new_time, out = timed(lambda: new(df))
+        pd.testing.assert_series_equal(out, expected, check_names = False)
+        rows += [(f'{what}: apply', old_time), (f'{what}: vectorized', new_time)]
+
+    patch_nfl()
+    import prepare_data
+    with tempfile.TemporaryDirectory() as path:
+        cold, rosters = timed(lambda: prepare_data.get_rosters(SEASONS, path = path, refresh = True), repeat = 1)
+        warm, again = timed(lambda: prepare_data.get_rosters(SEASONS, path = path))
+        pd.testing.assert_frame_equal(rosters, again)
+    rows += [(f'get_rosters, {len(SEASONS)} seasons: cold', cold), (f'get_rosters, {len(SEASONS)} seasons: warm', warm)]
+    report(rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,193 @@
+""" seeded synthetic stand-ins for the nfl_data_py downloads, shaped like the real tables (32 teams, 17 week seasons up
+to 2020 and 18 after, a week of playoffs, ~53 players a team) so the benchmarks can regenerate their figures without
+network. patch_nfl points the importers the pipeline calls at them"""
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+# the benchmarks run as scripts from anywhere, the modules live at the top of the repo
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from teams import TEAM_IDS
+
+TEAMS = list(TEAM_IDS)
+SEASONS = list(range(2015, 2025))
+
+# a 53 man roster: positions and how many of each
+ROSTER = {'QB': 3, 'RB': 4, 'WR': 6, 'TE': 3, 'T': 4, 'G': 4, 'C': 2, 'DE': 4, 'DT': 4, 'LB': 6, 'CB': 6, 'S': 4, 'K': 1, 'P': 1, 'LS': 1}
+OFFENSE = ['QB', 'RB', 'WR', 'TE', 'T', 'G', 'C']
+
+
+def last_week(season):
+    return 17 if season < 2021 else 18
+
+
+def player_id(team, number):
+    """ the gsis id of a synthetic player, every team has its own block"""
+    return f'00-{TEAM_IDS[team]:02d}{number:05d}'
+
+
+def team_players(team):
+    """ [(gsis id, position)] of a team, the same players every season"""
+    players, number = [], 0
+    for position, count in ROSTER.items():
+        for _ in range(count):
+            players.append((player_id(team, number), position))
+            number += 1
+    return players
+
+
+def schedules(seasons = SEASONS, seed = 0):
+    """ nfl.import_schedules: every team plays every regular season week, then 6 wild card games"""
+    rng = np.random.default_rng(seed)
+    rows = []
+    for season in seasons:
+        for week in range(1, last_week(season) + 2):
+            teams = rng.permutation(TEAMS)
+            games = 16 if week <= last_week(season) else 6
+            for away, home in zip(teams[:games], teams[16:16 + games]):
+                rows.append({'game_id': f'{season}_{week:02d}_{away}_{home}', 'season': season, 'week': week,
+                             'game_type': 'REG' if week <= last_week(season) else 'WC', 'away_team': away, 'home_team': home})
+    return pd.DataFrame(rows)
+
+
+def weekly_rosters(seasons = SEASONS, seed = 1):
+    """ nfl.import_weekly_rosters: every player of every team each week (through the playoffs), mostly active"""
+    rng = np.random.default_rng(seed)
+    frames = []
+    for season in seasons:
+        for team in TEAMS:
+            players = team_players(team)
+            weeks = np.repeat(np.arange(1, last_week(season) + 2), len(players))
+            frames.append(pd.DataFrame({
+                'season': season,
+                'week': weeks,
+                'team': team,
+                'player_id': [p for p, _ in players] * (last_week(season) + 1),
+                'position': [pos for _, pos in players] * (last_week(season) + 1),
+                'player_name': 'synthetic',
+                'status': rng.choice(['ACT', 'RES', 'INA'], len(weeks), p = [0.85, 0.1, 0.05]),
+            }))
+    return pd.concat(frames, ignore_index = True)
+
+
+def depth_charts(seasons = SEASONS, seed = 2):
+    """ nfl.import_depth_charts: two deep at every position each regular season week, in a shuffled order. a tenth of
+    the weeks have no new chart, depth_position is often blank and some depths are missing"""
+    rng = np.random.default_rng(seed)
+    rows = []
+    for season in seasons:
+        for team in TEAMS:
+            players = team_players(team)
+            for week in range(1, last_week(season) + 1):
+                if rng.random() < 0.1:
+                    continue
+                for gsis_id, position in rng.permutation(players):
+                    formation = 'Offense' if position in OFFENSE else 'Defense' if position not in ['K', 'P', 'LS'] else 'Special Teams'
+                    depth_position = '' if rng.random() < 0.4 else position
+                    depth_team = np.nan if rng.random() < 0.02 else float(rng.integers(1, 3))
+                    rows.append((season, week, 'REG', team, formation, position, depth_position, depth_team, gsis_id))
+    return pd.DataFrame(rows, columns = ['season', 'week', 'game_type', 'club_code', 'formation', 'position', 'depth_position', 'depth_team', 'gsis_id'])
+
+
+def injuries(seasons = SEASONS, seed = 5):
+    """ nfl.import_injuries: 12 players of every team on the report each regular season week"""
+    rng = np.random.default_rng(seed)
+    rows = []
+    for season in seasons:
+        for team in TEAMS:
+            ids = [p for p, _ in team_players(team)]
+            for week in range(1, last_week(season) + 1):
+                for gsis_id in rng.choice(ids, 12, replace = False):
+                    rows.append((season, 'REG', team, week, gsis_id, rng.choice(['Out', 'Doubtful', 'Questionable'])))
+    return pd.DataFrame(rows, columns = ['season', 'game_type', 'team', 'week', 'gsis_id', 'report_status'])
+
+
+def patch_nfl(seasons = SEASONS):
+    """ points the nfl_data_py importers the pipeline calls at the fixtures (built once, sliced per call)"""
+    import nfl_data_py as nfl
+
+    fixtures = {'schedules': schedules(seasons), 'rosters': weekly_rosters(seasons), 'depth_charts': depth_charts(seasons)}
+
+    def seasons_of(name, years):
+        df = fixtures[name]
+        return df[df['season'].isin(list(years))].reset_index(drop = True)
+
+    nfl.import_schedules = lambda years: seasons_of('schedules', years)
+    nfl.import_weekly_rosters = lambda years: seasons_of('rosters', years)
+    nfl.import_depth_charts = lambda years: seasons_of('depth_charts', years)
+    return fixtures
+
+
+def write_inputs(path, seasons = SEASONS, catchers = 25, seed = 3):
+    """ writes the four csv exports PrepData.read_data reads (prepare_data.DATA_FILES) under path, on the regular
+    season games of schedules(seasons): catchers pass catchers a team missing ~15% of their games, every team's
+    defense and its QB1 (sometimes QB2). the stats are noise, a few percent of them missing. returns the number of
+    receiving rows"""
+    from prepare_data import DATA_FILES, DROP_COLUMNS, lag_columns
+
+    rng = np.random.default_rng(seed)
+    os.makedirs(path, exist_ok = True)
+    stats = [c for c in lag_columns if c not in ['player_id', 'game_id', 'season', 'week', 'receiving_fpoints']]
+
+    games = schedules(seasons)
+    games = games[games['game_type'] == 'REG']
+    team_games = pd.concat([games.rename({'away_team': 'team', 'home_team': 'opp_team'}, axis = 1),
+                            games.rename({'home_team': 'team', 'away_team': 'opp_team'}, axis = 1)], ignore_index = True)
+
+    rows, defense, injuries, qbs = [], [], [], []
+    for game in team_games.itertuples():
+        for j in range(catchers):
+            if rng.random() < 0.15:
+                continue
+            row = {'player_id': player_id(game.team, 100 + j), 'game_id': game.game_id, 'week': game.week, 'season': game.season,
+                   'position': ['WR', 'WR', 'TE', 'RB'][j % 4], 'team': game.team, 'opp_team': game.opp_team,
+                   'player_name': f'P{j}', 'status': 'ACT', 'college': 'U', 'twitter_username': None}
+            row.update({c: float(rng.integers(0, 10)) if rng.random() > 0.03 else np.nan for c in stats})
+            row['receiving_fpoints'] = float(rng.gamma(2, 4))
+            row.update({'age': 25.0, 'height': 72.0, 'weight': np.nan if rng.random() < 0.05 else 200.0,
+                        'depth_team': np.nan if rng.random() < 0.2 else float(rng.integers(1, 4)),
+                        'ESPN_projection': np.nan if rng.random() < 0.5 else float(rng.integers(0, 20))})
+            row.update({c: 1.0 for c in DROP_COLUMNS})
+            rows.append(row)
+
+        defense.append({'game_id': game.game_id, 'defteam': game.team, 'week': game.week,
+                        **{f'total_{pos}_fpoints_given_up': rng.gamma(3, 5) for pos in ['qb', 'rb', 'wr', 'te']}})
+        if rng.random() < 0.5:
+            injuries.append({'game_id': game.game_id, 'team': game.team, 'week': game.week, 'num_injured_starters': int(rng.integers(1, 4))})
+
+        attempts = int(rng.integers(5, 45))
+        completions = int(rng.integers(0, attempts + 1))
+        qbs.append({'passer_player_id': player_id(game.team, int(rng.random() < 0.1)), 'game_id': game.game_id, 'posteam': game.team,
+                    'week': game.week, 'completions': completions, 'attempts': attempts, 'passing_yards': float(rng.integers(0, 400)),
+                    'touchdowns': float(rng.integers(0, 4)), 'interceptions': float(rng.integers(0, 3)),
+                    'completion_percentage': completions / attempts, 'yards_per_attempt': rng.random() * 10,
+                    'td_percentage': rng.random() * 0.1, 'interception_percentage': rng.random() * 0.05,
+                    'QBR': rng.random() * 150, 'qb_num_snaps': int(rng.integers(10, 70))})
+
+    pd.DataFrame(rows).to_csv(os.path.join(path, DATA_FILES['receiving']), index = False)
+    pd.DataFrame(defense).to_csv(os.path.join(path, DATA_FILES['def_points']), index = False)
+    pd.DataFrame(injuries).to_csv(os.path.join(path, DATA_FILES['def_injuries']), index = False)
+    pd.DataFrame(qbs).to_csv(os.path.join(path, DATA_FILES['qb_stats']), index = False)
+    return len(rows)
+
+
+def timed(fn, repeat = 3):
+    """ the best wall time of repeat calls of fn and its last result"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def report(rows):
+    """ prints [(what, seconds)] as a small table"""
+    width = max(len(what) for what, _ in rows)
+    for what, seconds in rows:
+        print(f'{what:<{width}}  {seconds * 1000:10.1f} ms')
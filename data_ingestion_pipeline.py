@@ -1,3 +1,6 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
 import nfl_data_py as nfl
 import pandas as pd
 
@@ -6,32 +9,22 @@ import pandas as pd
 from warnings import simplefilter 
 import numpy as np
 
+from scoring import defense_fpoints_allowed, player_game_fpoints
+from season_calendar import attach_games, build_games, current_season, game_keys, is_regular_season, season_weeks, team_games
+from teams import normalize_teams, team_dimension
+from feature_store import GAME_TABLES_PATH, STORE_PATH, game_fingerprints, read_ingest_state, read_seasons, upsert_games, write_ingest_state, write_season
+from stage_cache import DatasetCache
+from database import DB_PATH, load_frames
+from depth_charts import build_depth_index, injured_starters
+from players import attach_player_ids, build_player_index, correct_player_ids, player_ids, player_keys
+from qb_stats import qb_game_stats, qb_starters
+from participation import PLAY_CLASSES, classify_plays, participation_matrix, snap_counts
 
-common_club_code_map =     {
-        "LVR": "LV",
-        "KCC": "KC",
-        "NOS": "NO",
-        "TBB": "TB",
-        "SFO": "SF",
-        "NEP": "NE",
-        "GBP": "GB",
-        "JAC": "JAX",
-        "OAK":"LV",
-        "STL":"LAR",
-        "SL":"LAR",
-        "SD":"LAC",
-        "SDC":"LAC",
-        "RAM":"LAR",
-        "LA":"LAR",
-        "BLT":"BAL",
-        "HST":"HOU",
-        "CLV":"CLE",
-        "ARZ":"ARI"
-    }
 
 rel_cols_pbp = [
             "play_id",
             "game_id",
+            "season",
             "home_team",
             "away_team",
             "week",
@@ -77,8 +70,6 @@ rel_cols_pbp = [
             "rusher_player_id",
             "rusher_player_name",
             "rushing_yards",
-            "fumbled_1_player_id",
-            "fumbled_2_player_id",
             "penalty_player_id",
             "penalty_yards",
             "replay_or_challenge",
@@ -89,8 +80,279 @@ rel_cols_pbp = [
             "timeout",
             "is_two_point_conversion",
             "first_down",
+            "play_class",
         ]
 
+# who was on the field. participation data is only published up to 2023, later seasons get empty columns
+participation_columns = ["offense_players", "players_on_play"]
+
+# the raw pbp columns rel_cols_pbp is built from, nothing else is downloaded. nfl_data_py merges the participation
+# data on old_game_id, so we need that one too
+pbp_source_columns = [c for c in rel_cols_pbp if c not in participation_columns + ["is_two_point_conversion", "play_class"]] + ["two_point_conv_result", "old_game_id"]
+
+# the name of the cleaned pbp data in the store. bump it when clean_pbp changes what it stores, the seasons are then
+# downloaded again instead of mixing old and new partitions
+pbp_store_name = "pbp_v2"
+
+# the per game tables DataCreator.ingest keeps in the store. key is the row key, it starts with the game_id a table is
+# replaced by. build is the DataCreator method that fills attribute, inputs are the game keyed frames it reads (or the
+# methods that make them): a game whose rows changed in any of them (a new week, a stat correction, a late upload, a
+# roster move) is aggregated again
+ingest_tables = {
+    "receiving": {"key": ["game_id", "player_id"], "build": "aggregate_receiving", "attribute": "agg_receiving", "inputs": ["pbp_data", "pfr_receiving", "ngs_receiving", "_roster_games"]},
+    "player_fpoints": {"key": ["game_id", "player_id"], "build": "aggregate_fantasy_points", "attribute": "player_fpoints", "inputs": ["pbp_data"]},
+    "def_fpoints": {"key": ["game_id", "defteam"], "build": "aggregate_fantasy_points", "attribute": "def_fpoints", "inputs": ["pbp_data", "_roster_games"]},
+    "def_injuries": {"key": ["game_id", "team"], "build": "build_injuries", "attribute": "def_injuries", "inputs": ["injuries", "_depth_charts_og"]},
+    "qb_stats": {"key": ["game_id", "passer_player_id"], "build": "aggregate_qb_stats", "attribute": "qb_stats", "inputs": ["pbp_data"]},
+}
+
+# the frames a season worker (DataCreator.build_seasons) needs besides the play-by-play data, sliced to its season,
+# and the tables it hands back
+season_shard_inputs = ["rosters", "game_id_map", "games", "pfr_receiving", "ngs_receiving", "_depth_charts_og"]
+season_shard_outputs = ["agg_receiving", "player_fpoints", "def_fpoints", "qb_stats", "qb_starters"]
+
+# just make sure that plays that don't result in a touchdown (or a stat) have data here. Another one-hot (ish)
+pbp_zero_fill_columns = ["touchdown", "interception", "fumble_lost", "passing_yards", "pass_touchdown", "rushing_yards", "rush_touchdown", "receiving_yards"]
+
+
+def iter_pbp_seasons(years, columns=pbp_source_columns):
+    """ yields (season, pbp data) one season at a time with only columns downloaded, so we never hold more than a
+    season of the ~390 column raw table"""
+    for yr in years:
+        # NOTE: According to this twitter post (https://x.com/John_B_Edwards/status/1832091502895579354) participation data may be gone for good.
+        # TODO: You should remove it from the models
+        with_participation = yr < 2024
+        pbp_data = nfl.import_pbp_data(years=[yr], columns=columns, include_participation=with_participation)
+        for c in participation_columns:
+            if c not in pbp_data.columns:
+                pbp_data[c] = None
+        yield yr, pbp_data[columns + participation_columns].drop_duplicates()
+
+
+def clean_pbp(pbp_data, games):
+    """ the play-by-play cleaning that only needs the plays themselves and the game dimension. works on any set of
+    seasons, we run it on one season at a time as they come in"""
+    pbp_data = pbp_data.copy()
+    normalize_teams(pbp_data)
+
+    # since we are going to aggregate the play-by-play data to game-by-game data, we want to fix some features so we can count easier
+    # this just makes a countable two point conversion field. One-hot encoding if you will
+    pbp_data["is_two_point_conversion"] = (pbp_data["two_point_conv_result"] == "success").astype(int)
+
+    # we're only going to consider the regular season
+    # NOTE: In 2021, there was an extra regular season game added. the schedule knows which games are regular season
+    keys = game_keys(pbp_data, games)
+    regular = is_regular_season(pbp_data, games, keys=keys)
+    pbp_data = attach_games(pbp_data[regular], games, columns=["season", "week"], keys=keys[regular])
+
+    pbp_data[pbp_zero_fill_columns] = pbp_data[pbp_zero_fill_columns].fillna(0)
+    # what kind of play it is, the snap counts only look at this instead of scanning the descriptions again
+    pbp_data["play_class"] = classify_plays(pbp_data)
+    # NOTE: offense_players stays a ';' separated string (some are missing), DataCreator.build_participation turns it
+    # into a sparse player x play matrix
+
+    # we are also going to restrict to data that we need in the pbp_data, this will make it easier to look at
+    return pbp_data[rel_cols_pbp].reset_index(drop=True)
+
+
+# the weekly roster columns we keep
+roster_columns = ["week", "position", "player_name", "player_id", "team", "status"]
+
+# the nfl_data_py importers load_data runs. each one is called with a single season, that's how the dataset cache
+# stores them (and the roster importer does not work when you pass it multiple years all at once anyway)
+raw_datasets = {
+    # this maps player ID's from accross multiple platforms. There is also associated player information like Name, College, etc.
+    "id_map": lambda years: nfl.import_ids(),
+    # we want to have depth charts as depth is likely a good predictor of fantasy value. 1st string is utilized more than 3rd string
+    "depth_charts": lambda years: nfl.import_depth_charts(years=years),
+    # importing next gen stats data from AWS
+    "ngs_receiving": lambda years: nfl.import_ngs_data(stat_type="receiving", years=years).drop_duplicates(),
+    # pro football reference stats
+    "pfr_receiving": lambda years: nfl.import_weekly_pfr(s_type="rec", years=years).drop_duplicates(),
+    # weekly aggregate stats
+    "weekly": lambda years: nfl.import_weekly_data(years=years, downcast=True).drop_duplicates(),
+    # I need to standardize the game ID and player ID's accross the dataframes
+    "matchup_data": lambda years: nfl.import_schedules(years).drop_duplicates(),
+    "rosters": lambda years: nfl.import_weekly_rosters(years=years)[roster_columns].assign(season=years[0]),
+    # rushing next gen stats and pro football reference stats
+    "ngs_rush": lambda years: nfl.import_ngs_data(stat_type="rushing", years=years).drop_duplicates(),
+    "pfr_rush": lambda years: nfl.import_weekly_pfr(s_type="rush", years=years).drop_duplicates(),
+    "injuries": lambda years: nfl.import_injuries(years=years).drop_duplicates(),
+}
+
+# datasets that are not split by season
+unseasoned_datasets = ["id_map"]
+
+# how many weeks before its window DataCreator.ingest keeps of a dataset. the injured starters and the starting QBs
+# come from the latest depth chart at or before each game, which can be from before a bye week
+window_context_weeks = {"depth_charts": 2}
+
+
+# the player column each *_fumble_lost flag is attributed to
+fumble_player_columns = {
+    "receiver_fumble_lost": "receiver_player_id",
+    "rusher_fumble_lost": "rusher_player_id",
+    "passer_fumble_lost": "passer_player_id",
+}
+
+
+def fumble_lost_flags(pbp_data):
+    """ flags, for the receiver, rusher and passer of every play, whether they lost a fumble on it.
+    a player lost a fumble when the play had a lost fumble and they were one of the two fumblers, unless they only
+    fumbled first, both fumbles were by the offense and the ball was then lost by a teammate.
+    missing ids/teams never match anything."""
+    # pandas treats None == None as a match for object columns, so every comparison also checks for nulls
+    def same(a, b):
+        return (pbp_data[a].eq(pbp_data[b]) & pbp_data[b].notna()).to_numpy()
+
+    lost = pbp_data["fumble_lost"].to_numpy() == 1
+    # the ball stayed with the offense after the first fumble and was lost on the second
+    both_offense = same("fumbled_1_team", "posteam") & same("fumbled_2_team", "posteam")
+
+    flags = {}
+    for flag, player_col in fumble_player_columns.items():
+        first = same("fumbled_1_player_id", player_col)
+        second = same("fumbled_2_player_id", player_col)
+        recovered_by_teammate = first & ~second & both_offense
+        flags[flag] = (lost & (first | second) & ~recovered_by_teammate).astype(int)
+
+    return pd.DataFrame(flags, index=pbp_data.index)
+
+
+# the receiving table (agg_wr_final) column order
+receiving_columns = [
+    "player_id", "game_id", "receiving_yards", "avg_yac", "receptions", "receiving_touchdowns", "week", "status",
+    "targets_1", "targets_2", "targets_3", "targets_4", "total_targets", "rz_targets", "garbage_time_fpoints",
+    "receiving_fpoints", "avg_depth_of_target", "air_yards", "max_target_depth", "fumble_lost", "receiving_first_downs",
+    "receiving_epa", "receiving_2pt_conversions", "unrealized_air_yards", "racr", "snap_count_1", "snap_count_2",
+    "snap_count_3", "snap_count_4", "total_relevant_snaps", "receiving_broken_tackles", "receiving_drop",
+    "receiving_drop_pct", "receiving_int", "receiving_rat", "avg_cushion", "avg_separation", "position", "player_name",
+    "team", "season", "birthdate", "age", "draft_year", "draft_round", "draft_pick", "draft_ovr", "twitter_username",
+    "height", "weight", "college", "snap_percentage_1", "snap_percentage_2", "snap_percentage_3", "snap_percentage_4",
+    "snap_percentage", "target_share_1", "target_share_2", "target_share_3", "target_share_4", "target_share",
+    "air_yards_share", "depth_team", "wopr", "opp_team", "ESPN_projection",
+]
+
+# players at these positions get a row for every game they were active, even without a target
+receiving_roster_positions = ["WR", "RB", "FB", "TE", "QB"]
+
+downs = [1, 2, 3, 4]
+
+
+def relevant_snaps(pbp_data):
+    """ plays where the offense lined up to run a play (no kicks/punts, including plays called back)"""
+    return (pbp_data["play_class"] == "snap").to_numpy()
+
+
+def receiving_play_metrics(pbp_data):
+    """ every per-play receiving quantity, already masked to the plays it counts on (0/NaN elsewhere), so a single
+    groupby sum gives all the player-game receiving stats. the fantasy points are PPR.
+    returns the metric frame and a mask of the plays that make a receiver show up in the table"""
+    real_play = (pbp_data["play_type"] != "no_play").to_numpy()
+    complete = (pbp_data["complete_pass"] == 1).to_numpy()
+    # not the same as ~complete, a play without a complete_pass value is neither
+    incomplete = (pbp_data["complete_pass"] == 0).to_numpy()
+    target = (pbp_data["pass_attempt"] == 1).to_numpy()
+    caught = complete & real_play
+    down = pbp_data["down"].to_numpy()
+    air_yards = pbp_data["air_yards"].to_numpy(dtype=float)
+    yac = pbp_data["yards_after_catch"].to_numpy(dtype=float)
+    receiving_yards = pbp_data["receiving_yards"].to_numpy(dtype=float)
+    fumble_lost_by_receiver = (pbp_data["receiver_fumble_lost"] == 1).to_numpy()
+    first_down = complete & (pbp_data["first_down"] == 1).to_numpy()
+    two_point = complete & (pbp_data["is_two_point_conversion"] == 1).to_numpy()
+
+    # Garbage Time Situation 1: If the score differential is greater than 28 points and there is one-quarter or less left in the game
+    # Garbage Time Situation 2: If the score differential is greater than 21 points and there is 10 minutes or less left in the game
+    # Garbage Time Situation 3: If the score differential is greater than 14 points and there is 3 minutes or less left in the game
+    # NOTE: these definitions are not standardized and are subject to change.
+    score_diff = pbp_data["score_differential"].to_numpy()
+    seconds_left = pbp_data["game_seconds_remaining"].to_numpy()
+    garbage = caught & (
+        ((score_diff <= -28) & (seconds_left <= 15 * 60))
+        | ((score_diff <= -21) & (seconds_left <= 10 * 60))
+        | ((score_diff <= -14) & (seconds_left <= 3 * 60))
+    )
+    fpoints = (
+        0.1 * pbp_data["yards_gained"].to_numpy(dtype=float)
+        + 1
+        + 6 * pbp_data["touchdown"].to_numpy(dtype=float)
+        + 2 * pbp_data["is_two_point_conversion"].to_numpy(dtype=float)
+        - 2 * fumble_lost_by_receiver
+    )
+
+    metrics = {
+        "receiving_yards": np.where(caught, receiving_yards, 0),
+        "yac_sum": np.where(caught, yac, np.nan),
+        "yac_count": caught & ~np.isnan(yac),
+        "receptions": caught,
+        "receiving_touchdowns": np.where(caught, pbp_data["touchdown"].to_numpy(dtype=float), 0),
+        **{f"targets_{d}": target & (down == d) for d in downs},
+        "rz_targets": target & real_play & (pbp_data["yardline_100"] <= 20).to_numpy(),
+        "garbage_time_fpoints": np.where(garbage, fpoints, np.nan),
+        "receiving_fpoints": np.where(caught, fpoints, np.nan),
+        "air_yards": np.where(target, air_yards, np.nan),
+        "air_yards_count": target & ~np.isnan(air_yards),
+        "max_target_depth": np.where(target, air_yards, np.nan),
+        "fumble_lost": np.where(fumble_lost_by_receiver, pbp_data["fumble_lost"].to_numpy(dtype=float), 0),
+        "receiving_first_downs": first_down,
+        "receiving_epa": np.where(target, pbp_data["epa"].to_numpy(dtype=float), np.nan),
+        "receiving_2pt_conversions": two_point,
+        "unrealized_air_yards": np.where(target & incomplete, air_yards, np.nan),
+        "target_yards": np.where(target, receiving_yards, 0),
+    }
+    member = caught | target | fumble_lost_by_receiver | first_down | two_point
+    return pd.DataFrame(metrics, index=pbp_data.index), member
+
+
+def aggregate_player_games(pbp_data):
+    """ all player-game receiving stats in one grouped pass (keyed on receiver_player_id/game_id)"""
+    metrics, member = receiving_play_metrics(pbp_data)
+    metrics["receiver_player_id"] = pbp_data["receiver_player_id"].to_numpy()
+    metrics["game_id"] = pbp_data["game_id"].to_numpy()
+    metrics = metrics[member & pbp_data["receiver_player_id"].notna().to_numpy()]
+
+    how = {c: "sum" for c in metrics.columns if c not in ["receiver_player_id", "game_id"]}
+    how["max_target_depth"] = "max"
+    games = metrics.groupby(["receiver_player_id", "game_id"], sort=False).agg(how)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        games["avg_yac"] = games["yac_sum"] / games["yac_count"]
+        games["avg_depth_of_target"] = games["air_yards"] / games["air_yards_count"]
+        # racr (ratio of receiving yards to air yards)
+        games["racr"] = games["target_yards"] / games["air_yards"]
+    games["total_targets"] = games[[f"targets_{d}" for d in downs]].sum(axis=1)
+
+    games = games.drop(["yac_sum", "yac_count", "air_yards_count", "target_yards"], axis=1)
+    return games.reset_index().rename({"receiver_player_id": "player_id"}, axis=1)
+
+
+def aggregate_player_snaps(pbp_data, participation, players):
+    """ relevant snaps per down for every player on the field, from the participation matrix (build_participation)"""
+    snaps = snap_counts(participation, players, pbp_data, downs=downs)
+    snaps["total_relevant_snaps"] = snaps[[f"snap_count_{d}" for d in downs]].sum(axis=1)
+    return snaps
+
+
+def aggregate_team_games(pbp_data):
+    """ the team-game totals the share stats are divided by: targets and snaps per down plus air yards"""
+    target = (pbp_data["pass_attempt"] == 1).to_numpy()
+    snap = relevant_snaps(pbp_data)
+    down = pbp_data["down"].to_numpy()
+    totals = pd.DataFrame(
+        {
+            **{f"ttargets_{d}": target & (down == d) for d in downs},
+            "team_air_yards": np.where(target, pbp_data["air_yards"].to_numpy(dtype=float), np.nan),
+            **{f"tsnap_count_{d}": snap & (down == d) for d in downs},
+            "game_id": pbp_data["game_id"].to_numpy(),
+            "team": pbp_data["posteam"].to_numpy(),
+        }
+    ).groupby(["game_id", "team"], sort=False, observed=True).sum()
+    totals["ttotal_targets"] = totals[[f"ttargets_{d}" for d in downs]].sum(axis=1)
+    totals["ttotal_relevant_snaps"] = totals[[f"tsnap_count_{d}" for d in downs]].sum(axis=1)
+    return totals.reset_index()
+
+
 # this code avoids a numpy error. nfl_data_py will have a new version soon to handle new python and numpy versions
 _read_parquet = pd.read_parquet
 
@@ -99,10 +361,37 @@ def patched_read_parquet(*args, **kwargs):
     return _read_parquet(*args, **kwargs)
 
 
+def _limit_memory(max_bytes):
+    """runs in every worker process. a worker that goes over the cap gets a MemoryError instead of taking the box down
+    with it. RLIMIT_AS caps the virtual address space, not the resident memory, and arrow/numpy allocators reserve more
+    than they touch, so a worker can fail well before its RSS gets to max_bytes. windows has no resource module, there
+    the cap is skipped"""
+    if max_bytes is None or os.name == "nt":
+        return
+    import resource
+
+    resource.setrlimit(resource.RLIMIT_AS, (max_bytes, max_bytes))
+
+
+def _aggregate_season(season, frames, store, rules, projections):
+    # the map step of DataCreator.build_seasons, runs in a worker process. the season's play-by-play data is read from
+    # the store here, so it never has to be sent over from the driver
+    dc = DataCreator([season])
+    for name, df in frames.items():
+        setattr(dc, name, df)
+    dc._read_pbp_data(store=store)
+    dc.engineer_features()
+    dc.aggregate_receiving(projections)
+    dc.aggregate_fantasy_points(rules)
+    dc.aggregate_qb_stats()
+    return {name: getattr(dc, name) for name in season_shard_outputs}
+
 
 class DataCreator:
-    def __init__(self, years: list = [2023]):
+    def __init__(self, years: list = [2023], datasets: DatasetCache = None):
         self._years = years
+        # the local copy of everything we download, DatasetCache(offline=True) runs without network
+        self._datasets = datasets or DatasetCache()
 
         # this is a temporary fix for the data API
         pd.read_parquet = patched_read_parquet
@@ -110,112 +399,92 @@ class DataCreator:
         # warning filter
         simplefilter(action="ignore", category=pd.errors.PerformanceWarning) 
 
-    def load_data(self):
-        # this maps player ID's from accross multiple platforms. There is also associated player information like Name, College, etc.
-        self.id_map = nfl.import_ids()
-
-        # we want to have depth charts as depth is likely a good predictor of fantasy value. 1st string is utilized more than 3rd string
-        self.depth_charts = nfl.import_depth_charts(years=self._years)
-
-        # importing next gen stats data from AWS
-        self.ngs_receiving = nfl.import_ngs_data(
-            stat_type="receiving", years=self._years
-        ).drop_duplicates()
-
-        # pro football reference stats
-        self.pfr_receiving = nfl.import_weekly_pfr(
-            s_type="rec", years=self._years
-        ).drop_duplicates()
-
-        # # weekly aggregate stats
-        self.weekly = nfl.import_weekly_data(
-            years=self._years, downcast=True
-        ).drop_duplicates()
-
-        # I need to standardize the game ID and player ID's accross the dataframes
-        self.matchup_data = nfl.import_schedules(self._years).drop_duplicates()
-
-        # grab play-by-play data to synthesize some base stats. Adding in stats from other platforms after the fact.
-        self._import_pbp_data()
+    def load_data(self, workers=8, window=None):
+        """ downloads (or reads from the dataset cache) every raw dataset. the downloads are independent of each other, so
+        every dataset and season is its own job in a thread pool and a cold load takes about as long as the slowest one.
+        window ({season: first week}, see ingest) keeps only those weeks of every dataset but the schedule"""
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            jobs = {
+                name: [pool.submit(self._datasets.get, name, fetch, season) for season in ([None] if name in unseasoned_datasets else self._years)]
+                for name, fetch in raw_datasets.items()
+            }
+            # grab play-by-play data to synthesize some base stats. it needs the schedule, which was queued first
+            pbp_job = pool.submit(lambda: self._import_pbp_data(games=build_games(pd.concat([j.result() for j in jobs["matchup_data"]], ignore_index=True)), window=window))
+
+            for name, season_jobs in jobs.items():
+                setattr(self, name, pd.concat([j.result() for j in season_jobs], ignore_index=True))
+            pbp_job.result()
+
+        if window is not None:
+            # the sources only publish whole seasons, so they are cut down to the window before anything is cleaned or
+            # merged. the schedule stays whole, it is the game dimension
+            for name in raw_datasets:
+                if name in unseasoned_datasets or name == "matchup_data":
+                    continue
+                df = getattr(self, name)
+                start = df["season"].map(window) - window_context_weeks.get(name, 0)
+                setattr(self, name, df[df["week"] >= start].reset_index(drop=True))
 
         # grab roster data
         self._import_roster_data()
 
-        # importing rushing next gen stats data
-        self.ngs_rush = nfl.import_ngs_data(
-            stat_type="rushing", years=self._years
-        ).drop_duplicates()
-
-        # rushing pro football reference stats
-        self.pfr_rush = nfl.import_weekly_pfr(
-            s_type="rush", years=self._years
-        ).drop_duplicates()
-
-        # importing injuries
-        self.injuries = nfl.import_injuries(years=self._years).drop_duplicates()
-
-    def _import_pbp_data(self):
-
+    def _import_pbp_data(self, store=STORE_PATH, games=None, window=None):
         # grab play-by-play data to synthesize some base stats. Adding in stats from other platforms after the fact.
-        # there is an issue with participation data after 2023. We need to import these separately.
-
-        # NOTE: According to this twitter post (https://x.com/John_B_Edwards/status/1832091502895579354) participation data may be gone for good. 
-        # TODO: You should remove it from the models
-
-        pbp_init_years = [x for x in self._years if x < 2024]
-        pbp_extra_years = [x for x in self._years if x >= 2024]
-
-        # import pre-2023 data normally
-        pbp_data = nfl.import_pbp_data(years=pbp_init_years).drop_duplicates()
-
-        # import post-2023 data and ignore participation stats
-        temp_2024_pbp = nfl.import_pbp_data(years=pbp_extra_years, include_participation=False)
-
-        for c in [c for c in pbp_data.columns.tolist() if c not in temp_2024_pbp.columns.tolist()]:
-            temp_2024_pbp[c] = np.nan
-
-        self.pbp_data = pd.concat([pbp_data, temp_2024_pbp[pbp_data.columns.tolist()]], ignore_index = True)
-
-    def _import_roster_data(self):
-        r_col_list = ["week", "position", "player_name", "player_id", "team", "status"]
-        rosters = pd.DataFrame(columns=r_col_list)
-        # this is due to a bug in the NFL data API. This function does not work when you pass it multiple years all at once
+        # every season is downloaded with just the columns we need, cleaned and appended to the store before we
+        # ask for the next one, so memory is bounded by one season rather than all of them.
+        # seasons already in the store are only downloaded again under the same rules as the dataset cache.
+        # with a window only its weeks are read from the store. a season that has to be downloaded again still comes
+        # in whole, but only its window is cleaned, and that is not written back since the store holds whole seasons
+        games = build_games(self.matchup_data) if games is None else games
+        cleaned = {}
         for yr in self._years:
-            t_roster = nfl.import_weekly_rosters(years=[yr])[r_col_list]
-            t_roster["season"] = yr
-            if yr < 2021:
-                t_roster = t_roster[t_roster.week <= 17]
+            if self._datasets.is_fresh(os.path.join(store, pbp_store_name, f"season={yr}", "part-0.parquet"), yr):
+                continue
+            if self._datasets.offline:
+                raise FileNotFoundError(f"the {yr} play-by-play data is not in {store}")
+            pbp_data = next(iter_pbp_seasons([yr]))[1]
+            if window is None:
+                write_season(clean_pbp(pbp_data, games), pbp_store_name, yr, store=store)
+                print(f"Stored {yr} play-by-play data: {len(pbp_data)} plays")
             else:
-                t_roster = t_roster[t_roster.week <= 18]
-            rosters = pd.concat([rosters, t_roster], ignore_index=True)
+                cleaned[yr] = clean_pbp(pbp_data[pbp_data["week"] >= window[yr]], games)
+                print(f"Cleaned {yr} play-by-play data from week {window[yr]}: {len(cleaned[yr])} plays")
+
+        self._read_pbp_data(store=store, window=window, cleaned=cleaned)
+
+    def _read_pbp_data(self, store=STORE_PATH, window=None, cleaned=None):
+        """ reads the cleaned play-by-play data of our seasons back from the store, only the weeks of window
+        ({season: first week}) when one is given. cleaned holds the plays of seasons that were cleaned but not stored"""
+        cleaned = cleaned or {}
+        seasons = [yr for yr in self._years if yr not in cleaned]
+        frames = list(cleaned.values())
+        if seasons:
+            start_weeks = {yr: window[yr] for yr in seasons} if window is not None else None
+            frames.insert(0, read_seasons(pbp_store_name, seasons=seasons, store=store, start_weeks=start_weeks)[rel_cols_pbp])
+        self.pbp_data = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+        # parquet hands back a categorical per file, this puts them back on our dtypes
+        normalize_teams(self.pbp_data)
+        self.pbp_data["play_class"] = self.pbp_data["play_class"].astype(PLAY_CLASSES)
 
-        self.rosters = rosters
+    def _import_roster_data(self):
+        # the last regular season week of each season comes from the schedule
+        reg_weeks = season_weeks(build_games(self.matchup_data))
+        self.rosters = self.rosters[self.rosters["week"] <= self.rosters["season"].map(reg_weeks)].reset_index(drop=True)
 
     def clean_data(self):
-        # fixing Conklin/Izzo issue
-        # TODO: Do we still need to do this? We could probably just drop these players? What happens for older years, is this still an issue?
-        self.id_map["gsis_id"] = self.id_map["gsis_id"].replace(
-            {"00-0034439": "00-0034270", "00-0034270": "11-1111111"}
-        )
+        # fixing known id collisions (Conklin/Izzo, see players.ID_CORRECTIONS) and resolving every player to one
+        # integer player_key across gsis/pfr/espn/sleeper ids
+        correct_player_ids(self.id_map)
+        self.players = build_player_index(self.id_map)
 
         # we also need to map non-conventional city abbreviations for consistency
         # TODO: This is a much more prevalent problem, we will map ALL club codes to a common map just for consistencies sake. DONE 10/22/2024
-        # TODO: What we should do is have a TEAM_ID variable that is unchanging when club code changes.
-        # TODO: This should be included when you design the database for this project
+        # the stable TEAM_ID and the alias history live in teams.py
         self._clean_club_codes()
 
-        # here we grab unique game id's and home/away teams for each game in the season
-        self.game_id_map = pd.concat(
-            [
-                self.matchup_data[["game_id", "home_team", "week"]].rename(
-                    {"home_team": "team_abbr"}, axis=1
-                ),
-                self.matchup_data[["game_id", "away_team", "week"]].rename(
-                    {"away_team": "team_abbr"}, axis=1
-                ),
-            ],
-            ignore_index=False,
-        )
+        # the game dimension (integer season/week, game type, home/away) and the game id of every team each week
+        self.games = build_games(self.matchup_data)
+        self.game_id_map = team_games(self.games)[["game_id", "team", "week", "season"]].rename({"team": "team_abbr"}, axis=1)
 
         # get a unique game id on all datasets that don't already have it.
         self._merge_gameids()
@@ -229,170 +498,339 @@ class DataCreator:
         self._depth_charts_og = self.depth_charts.copy()
 
         self.depth_charts = self.depth_charts[self.depth_charts['formation'] == 'Offense'].copy()
-        self.depth_charts['depth_position'] = self.depth_charts.apply(lambda x: x['position'] if x['depth_position'].strip() == '' else x['depth_position'], axis = 1)
+        # a blank depth_position means the player is listed at their own position
+        depth_position = self.depth_charts['depth_position']
+        self.depth_charts['depth_position'] = depth_position.where(depth_position.str.strip() != '', self.depth_charts['position'])
 
-        # since we are going to aggregate the play-by-play data to game-by-game data, we want to fix some features so we can count easier
-        d = {}
-        # this just makes a countable two point conversion field. One-hot encoding if you will
-        d["is_two_point_conversion"] = self.pbp_data["two_point_conv_result"].apply(
-            lambda x: 1 if x == "success" else 0
-        )
-        self.pbp_data = pd.concat([self.pbp_data, pd.DataFrame(d)], axis=1)
-
-        # we're only going to consider the regular season
-        # we're only going to consider the regular season
-        # NOTE: In 2021, there was an extra regular season game added
-        # TODO: we can do better than hardcoding this
-        t1 = self.pbp_data[
-            (self.pbp_data.week <= 18)
-            & (
-                (self.pbp_data["game_id"].str.contains("2021"))
-                | (self.pbp_data["game_id"].str.contains("2022"))
-                | (self.pbp_data["game_id"].str.contains("2023"))
-                | (self.pbp_data["game_id"].str.contains("2024"))
-            )
-        ].copy()
-        t2 = self.pbp_data[
-            (self.pbp_data.week <= 17)
-            & (
-                (self.pbp_data["game_id"].str.contains("2020"))
-                | (self.pbp_data["game_id"].str.contains("2019"))
-                | (self.pbp_data["game_id"].str.contains("2018"))
-                | (self.pbp_data["game_id"].str.contains("2017"))
-                | (self.pbp_data["game_id"].str.contains("2016"))
-                | (self.pbp_data["game_id"].str.contains("2015"))
-            )
-        ].copy()
-        self.pbp_data = pd.concat([t1, t2], ignore_index=True)
-
-        # just make sure that plays that don't result in a touchdown have data here. Another one-hot (ish)
-        self.pbp_data["touchdown"] = self.pbp_data["touchdown"].fillna(0)
-        self.pbp_data["interception"] = self.pbp_data["interception"].fillna(0)
-        self.pbp_data["fumble_lost"] = self.pbp_data["fumble_lost"].fillna(0)
-        self.pbp_data["passing_yards"] = self.pbp_data["passing_yards"].fillna(0)
-        self.pbp_data["pass_touchdown"] = self.pbp_data["pass_touchdown"].fillna(0)
-        self.pbp_data["rushing_yards"] = self.pbp_data["rushing_yards"].fillna(0)
-        self.pbp_data["rush_touchdown"] = self.pbp_data["rush_touchdown"].fillna(0)
-        self.pbp_data["receiving_yards"] = self.pbp_data["receiving_yards"].fillna(0)
-        # this creates a list of offensive players rather than a string. This helps later when we look at snaps played by each player
-        # NOTE: Some of these are missing.
-        self.pbp_data["offense_players"] = self.pbp_data["offense_players"].apply(
-            lambda x: x.split(";") if type(x) == str else x
-        )
-
-        # we are also going to restrict to data that we need in the pbp_data, this will make it easier to look at
-        self.pbp_data = self.pbp_data[rel_cols_pbp].copy()
+        # the play-by-play data was already cleaned season by season as it came in (clean_pbp)
 
     def _clean_club_codes(self):
-        self.id_map["team"] = self.id_map["team"].replace(common_club_code_map)
-        self.depth_charts["club_code"] = self.depth_charts["club_code"].replace(common_club_code_map)
-        self.ngs_receiving["team_abbr"] = self.ngs_receiving["team_abbr"].replace(common_club_code_map)
-        self.pfr_receiving["team"] = self.pfr_receiving["team"].replace(common_club_code_map)
-        self.weekly["recent_team"] = self.weekly["recent_team"].replace(common_club_code_map)
-        self.weekly["opponent_team"] = self.weekly["opponent_team"].replace(common_club_code_map)
-        self.matchup_data["away_team"] = self.matchup_data["away_team"].replace(common_club_code_map)
-        self.matchup_data["home_team"] = self.matchup_data["home_team"].replace(common_club_code_map)
-        self.ngs_rush["team_abbr"] = self.ngs_rush["team_abbr"].replace(common_club_code_map)
-        self.pfr_rush["team"] = self.pfr_rush["team"].replace(common_club_code_map)
-        self.injuries['team'] = self.injuries['team'].replace(common_club_code_map)
-        self.rosters['team'] = self.rosters['team'].replace(common_club_code_map)
-
-        # team pops up in many columns in the pbp_data. not all in the below list are team name columns
-        # but for those that aren't, the replace just won't do anything. 
-        for col in [x for x in self.pbp_data.columns if 'team' in x]:
-            self.pbp_data[col] = self.pbp_data[col].replace(common_club_code_map)
+        # every team column becomes the shared team categorical (teams.TEAM_DTYPE), so all the aliases are resolved in
+        # one place and joins on team compare integer codes
+        normalize_teams(self.id_map, ["team"])
+        normalize_teams(self.depth_charts, ["club_code"])
+        normalize_teams(self.ngs_receiving, ["team_abbr"])
+        normalize_teams(self.pfr_receiving, ["team"])
+        normalize_teams(self.weekly, ["recent_team", "opponent_team"])
+        normalize_teams(self.matchup_data, ["away_team", "home_team"])
+        normalize_teams(self.ngs_rush, ["team_abbr"])
+        normalize_teams(self.pfr_rush, ["team"])
+        normalize_teams(self.injuries, ["team"])
+        normalize_teams(self.rosters, ["team"])
+        # the pbp_data team columns were normalized in clean_pbp
 
     def _merge_gameids(self):
         # merges the AWS data with the game id data from above
+        # NOTE: week numbers repeat every season, so the season has to be part of the key when we load several years
         self.ngs_receiving = self.ngs_receiving.merge(
             self.game_id_map,
-            left_on=["week", "team_abbr"],
-            right_on=["week", "team_abbr"],
+            left_on=["season", "week", "team_abbr"],
+            right_on=["season", "week", "team_abbr"],
         ).rename({"player_gsis_id": "player_id"}, axis=1)
 
-        # merges the PFR data with the game id data from above
-        self.pfr_receiving = self.pfr_receiving.merge(
-            self.id_map[["pfr_id", "gsis_id"]],
-            left_on="pfr_player_id",
-            right_on="pfr_id",
-        ).rename({"gsis_id": "player_id"}, axis=1)
+        # resolves the PFR ids to our player keys (and gsis player ids)
+        self.pfr_receiving = attach_player_ids(self.pfr_receiving, "pfr_player_id", "pfr", self.players)
 
         # merges the AWS data with the game id data from above
-        self.ngs_rushing = self.ngs_rushing.merge(
+        self.ngs_rush = self.ngs_rush.merge(
             self.game_id_map,
-            left_on=["week", "team_abbr"],
-            right_on=["week", "team_abbr"],
+            left_on=["season", "week", "team_abbr"],
+            right_on=["season", "week", "team_abbr"],
         ).rename({"player_gsis_id": "player_id"}, axis=1)
 
-        # merges the PFR data with the game id data from above
-        self.pfr_rushing = self.pfr_rushing.merge(
-            self.id_map[["pfr_id", "gsis_id"]],
-            left_on="pfr_player_id",
-            right_on="pfr_id",
-        ).rename({"gsis_id": "player_id"}, axis=1)
+        # resolves the PFR ids to our player keys (and gsis player ids)
+        self.pfr_rush = attach_player_ids(self.pfr_rush, "pfr_player_id", "pfr", self.players)
 
         # NOTE: The weekly data does not have the opponent team info for 2022. Thus we would need different logic to grab the game_id.
         # We actually end up creating all the stats from this dataset by hand so there is no need.
 
+        # the game of every injury report
+        self.injuries = self.injuries.merge(
+            self.game_id_map,
+            left_on=["season", "week", "team"],
+            right_on=["season", "week", "team_abbr"],
+            how="left",
+        ).drop("team_abbr", axis=1)
+
         # merges the depth chart data with the game id data from above
         self.depth_charts = self.depth_charts.merge(
             self.game_id_map,
-            left_on=["week", "club_code"],
-            right_on=["week", "team_abbr"],
+            left_on=["season", "week", "club_code"],
+            right_on=["season", "week", "team_abbr"],
         )
 
 
     def engineer_features(self):
 
         # get fumbled player data
-        self.pbp_data["receiver_fumble_lost"] = self.pbp_data.apply(
-            lambda x: self.__get_fumble(x, ptype="rec"), axis=1
+        self.pbp_data[list(fumble_player_columns)] = fumble_lost_flags(self.pbp_data)
+
+        # who was on the field for every play
+        self.build_participation()
+
+    def build_injuries(self):
+        """ the depth chart index (self.depth_index, see depth_charts.build_depth_index) and the number of offensive and
+        defensive starters ruled Out per team game (self.def_injuries, the inj_defense table plus num_injured_offense_starters)"""
+        self.depth_index = build_depth_index(self._depth_charts_og, self.players)
+        regular = team_games(self.games[self.games["game_type"] == "REG"])
+        self.def_injuries = injured_starters(self.injuries, self.depth_index, self.players, regular)
+        return self.def_injuries
+
+    def build_participation(self):
+        """ the sparse player x play incidence of offense_players (self.participation). its rows are the players of
+        the id map, plus anyone on the field the id map doesn't know, in the order of self.participation_players"""
+        players = pd.Index(self.id_map["gsis_id"].dropna().unique())
+        self.participation, self.participation_players = participation_matrix(self.pbp_data, players)
+
+    def _roster_games(self):
+        """ active/reserve players per game, prioritizing a players ACTIVE status"""
+        roster_games = self.rosters.merge(
+            self.game_id_map,
+            left_on=["week", "team", "season"],
+            right_on=["week", "team_abbr", "season"],
+        ).drop("team_abbr", axis=1)
+        roster_games = roster_games[roster_games["status"].isin(["ACT", "RES"]) & (roster_games["week"] <= 18)]
+        return roster_games.sort_values(by=["game_id", "player_id", "status"]).drop_duplicates(subset=["game_id", "player_id"])
+
+    def aggregate_fantasy_points(self, rules="ppr"):
+        """ scores every play under rules (a name in scoring.SCORING_RULES or a custom rule set) and rolls it up to
+        fantasy points per player-game (self.player_fpoints) and the points each defense gave up to every position
+        per game (self.def_fpoints, same columns as def_fpoints). rescoring under a different league is just another call."""
+        self.player_fpoints = player_game_fpoints(self.pbp_data, rules)
+        self.def_fpoints = defense_fpoints_allowed(self.pbp_data, self._roster_games(), rules)
+        return self.def_fpoints
+
+    def aggregate_qb_stats(self):
+        """ the qb table (self.qb_stats, same columns as qb_stats): passing totals, rate stats, passer rating and snaps
+        per passer and game, see qb_stats.qb_game_stats. plus the starting QB of every regular season team game and
+        whether the starter changed from the week before (self.qb_starters), taken from the depth chart index"""
+        self.qb_stats = qb_game_stats(self.pbp_data)
+        if getattr(self, "depth_index", None) is None:
+            self.depth_index = build_depth_index(self._depth_charts_og, self.players)
+        qbs = self.depth_index[(self.depth_index["formation"] == "Offense") & (self.depth_index["position"] == "QB")]
+        qbs = qbs[["team", "season", "week", "gsis_id", "player_key", "depth_team"]].rename({"gsis_id": "player_id"}, axis=1)
+        regular = team_games(self.games[self.games["game_type"] == "REG"])[["game_id", "team", "season", "week"]]
+        self.qb_starters = qb_starters(regular.merge(qbs, on=["team", "season", "week"])).reset_index(drop=True)
+        return self.qb_stats
+
+    def aggregate_receiving(self, projections=None):
+        """ builds the receiving table (same columns as agg_wr_final) from the cleaned play-by-play data.
+        every player-game stat comes out of one grouped pass and every team-game total out of another, instead of
+        a groupby per stat followed by a chain of outer merges. projections (season, Week, gsis_id, Proj) fills
+        ESPN_projection when given, the espn scrape (playerId, Player instead of gsis_id) is resolved through self.players."""
+        games = aggregate_player_games(self.pbp_data)
+        roster_games = self._roster_games()
+
+        # now we ensure that active players who didn't get any of the above stats are still in the dataset (as zeros).
+        # players that are not on the active roster keep their stats with a status of 0
+        missing = roster_games.loc[roster_games["position"].isin(receiving_roster_positions), ["game_id", "player_id"]]
+        missing = missing.merge(games[["game_id", "player_id"]], how="left", indicator=True)
+        games = pd.concat([games, missing.loc[missing["_merge"] == "left_only", ["game_id", "player_id"]]], ignore_index=True)
+        games = games.merge(roster_games[["game_id", "player_id", "status"]], on=["game_id", "player_id"], how="left")
+
+        games = games.merge(aggregate_player_snaps(self.pbp_data, self.participation, self.participation_players), on=["game_id", "player_id"], how="left")
+        games = attach_games(games, self.games, columns=["week"])
+        games = games.fillna(0)
+
+        # pro football reference and next gen stats data
+        games = games.merge(
+            self.pfr_receiving[["game_id", "player_id", "receiving_broken_tackles", "receiving_drop", "receiving_drop_pct", "receiving_int", "receiving_rat"]],
+            on=["game_id", "player_id"],
+            how="left",
+        )
+        games = games.merge(
+            self.ngs_receiving.rename({"game_id_x": "game_id"}, axis=1)[["game_id", "player_id", "avg_cushion", "avg_separation"]],
+            on=["game_id", "player_id"],
+            how="left",
         )
-        self.pbp_data["rusher_fumble_lost"] = self.pbp_data.apply(
-            lambda x: self.__get_fumble(x, ptype="rush"), axis=1
+
+        # weekly roster and player meta info
+        games = games.merge(
+            roster_games[["player_id", "game_id", "week", "position", "player_name", "team", "season"]],
+            on=["player_id", "game_id", "week"],
+            how="left",
         )
-        self.pbp_data["passer_fumble_lost"] = self.pbp_data.apply(
-            lambda x: self.__get_fumble(x, ptype="pass"), axis=1
+        games = games.merge(
+            self.id_map[["gsis_id", "birthdate", "age", "draft_year", "draft_round", "draft_pick", "draft_ovr", "twitter_username", "height", "weight", "college"]]
+            .dropna(subset="gsis_id")
+            .rename({"gsis_id": "player_id"}, axis=1)
+            .drop_duplicates(subset="player_id", keep="first"),
+            on="player_id",
+            how="left",
         )
 
-    def __get_fumbles(self, x, ptype="rec"):
-
-        if ptype == "rec":
-            rpid = x["receiver_player_id"]
-        elif ptype == "rush":
-            rpid = x["rusher_player_id"]
-        elif ptype == "pass":
-            rpid = x["passer_player_id"]
-
-        fpid1 = x["fumbled_1_player_id"].values[0]
-        fpid2 = x["fumbled_2_player_id"].values[0]
-        fteam1 = x["fumbled_1_team"]
-        fteam2 = x["fumbled_2_team"]
-
-        if fpid1 is None:
-            fpid1 = ""
-
-        if fpid2 is None:
-            fpid2 = ""
-
-        if fteam1 is None:
-            fteam1 = ""
-
-        if fteam2 is None:
-            fteam2 = ""
-
-        offense = x["posteam"]
-        # if there was a fumble and the receiver we are looking at was one of the fumble players
-        if x["fumble_lost"] == 1 and (fpid1 == rpid or fpid2 == rpid):
-            # the only time this is not a fumble for the player in consideration is when
-            # there are two fumbles by the offense and the second player is not the first player.
-            # e.g. player 1 fumbled and it was picked up by teammate player 2, then player 2 fumbles
-            # and it is recovered by the defense
-            if (fpid1 == rpid and fpid2 != rpid) and (
-                fteam1 == offense and fteam2 == offense
-            ):
-                return 0
-            else:
-                return 1
+        # share stats, all divided by the totals of the players team in one go
+        games = games.merge(aggregate_team_games(self.pbp_data), on=["game_id", "team"], how="left")
+        for d in downs:
+            games[f"snap_percentage_{d}"] = games[f"snap_count_{d}"] / games[f"tsnap_count_{d}"]
+        games["snap_percentage"] = games["total_relevant_snaps"] / games["ttotal_relevant_snaps"]
+        for d in downs:
+            games[f"target_share_{d}"] = games[f"targets_{d}"] / games[f"ttargets_{d}"]
+        games["target_share"] = games["total_targets"] / games["ttotal_targets"]
+        games["air_yards_share"] = games["air_yards"] / games["team_air_yards"]
+
+        # players can be listed at multiple positions. so we only want to keep the main position for that player
+        dc = self._depth_charts_og
+        dc = dc[(dc["formation"] == "Offense") & (dc["game_type"] == "REG") & (dc["position"] == dc["depth_position"])]
+        dc = dc.groupby(["game_id", "gsis_id"], as_index=False)["depth_team"].min().rename({"gsis_id": "player_id"}, axis=1)
+        games = games.merge(dc, on=["game_id", "player_id"], how="left")
+
+        # computing wopr: 1.5*target_share + 0.7*air_yards_share
+        games["wopr"] = 1.5 * games["target_share"] + 0.7 * games["air_yards_share"]
+
+        # the other team in each game
+        games = games.merge(team_games(self.games)[["game_id", "team", "opp_team"]], on=["game_id", "team"], how="left")
+
+        if projections is not None:
+            if "gsis_id" not in projections.columns:
+                # straight from the espn scrape: espn ids, or the name when the id map has no espn id for the player
+                keys = player_keys(projections["playerId"], "espn", self.players)
+                keys = np.where(keys < 0, player_keys(projections["Player"], "name", self.players), keys)
+                projections = projections[keys >= 0].assign(gsis_id=player_ids(keys[keys >= 0], self.players))
+            games = games.merge(
+                projections[["season", "Week", "gsis_id", "Proj"]].rename({"Week": "week", "gsis_id": "player_id", "Proj": "ESPN_projection"}, axis=1),
+                on=["season", "week", "player_id"],
+                how="left",
+            )
         else:
-            return 0
+            games["ESPN_projection"] = np.nan
+
+        self.agg_receiving = games[receiving_columns]
+        return self.agg_receiving
+
+    def build_seasons(self, workers=None, max_memory=None, store=STORE_PATH, rules="ppr", projections=None):
+        """ season sharded engineer_features, aggregate_receiving and aggregate_fantasy_points. every season is engineered
+        and aggregated into partial tables in its own worker process (workers of them at a time, one per core by default)
+        and the partial tables are concatenated in season order, so the output doesn't depend on which worker finished first.
+        every table is per game, so the result is the same as running on all seasons at once. max_memory caps the address
+        space (not the RSS, see _limit_memory) of each worker in bytes, it is ignored on windows. needs load_data and
+        clean_data, the play-by-play data is read from store"""
+        id_map = self.id_map
+        shards = {}
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count(), initializer=_limit_memory, initargs=(max_memory,)) as pool:
+            for season in self._years:
+                frames = {name: getattr(self, name) for name in season_shard_inputs}
+                frames = {name: df[df["season"] == season] for name, df in frames.items()}
+                frames["id_map"] = id_map
+                frames["players"] = self.players
+                shards[season] = pool.submit(_aggregate_season, season, frames, store, rules, projections)
+
+            # reduce: the partial tables of every season, in the order of self._years
+            results = [shards[season].result() for season in self._years]
+        for name in season_shard_outputs:
+            setattr(self, name, pd.concat([r[name] for r in results], ignore_index=True))
+        return self.agg_receiving
+
+    def ingest(self, tables=None, store=GAME_TABLES_PATH, lookback_weeks=1, workers=8):
+        """ incremental refresh of the per game tables in ingest_tables (all of them by default). it loads and cleans only
+        the seasons of self._years that the store doesn't have in full, and of those only the weeks from the high-water
+        week on (lookback_weeks - 1 weeks before it, stat corrections land within a week): earlier weeks are taken as
+        settled. every dataset is cut down to that window as it is loaded (load_data), the play-by-play data is read
+        from the store with a week filter and a season that has to be downloaded again only has its window cleaned.
+        the sources publish whole seasons, so that download is the one part that isn't incremental. every game in that window gets a fingerprint of its inputs and only the games that are new or changed
+        since the last run are aggregated and upserted, so an in-season refresh rewrites the partitions of the latest
+        week and nothing else. the high-water mark is written after the tables, an interrupted run just does the same
+        games again. returns {table: games upserted}"""
+        tables = list(tables or ingest_tables)
+        states = {name: read_ingest_state(name, store) for name in tables}
+        start_weeks = self._ingest_start_weeks(states, lookback_weeks)
+        if not start_weeks:
+            return {name: 0 for name in tables}
+
+        years, self._years = self._years, sorted(start_weeks)
+        try:
+            # only the weeks of the window are read, cleaned and engineered
+            self.load_data(workers=workers, window=start_weeks)
+            self.clean_data()
+            self.engineer_features()
+        finally:
+            self._years = years
+        window = self.games.loc[self.games["week"] >= self.games["season"].map(start_weeks), "game_id"]
+
+        fingerprints, changed = {}, {}
+        for name in tables:
+            seen = pd.Series({g: f for season in states[name].values() for g, f in season["games"].items()}, dtype=object)
+            inputs = [getattr(self, i) for i in ingest_tables[name]["inputs"]]
+            inputs = [(i() if callable(i) else i).rename({"game_id_x": "game_id"}, axis=1) for i in inputs]
+            fingerprints[name] = game_fingerprints(inputs).reindex(window).dropna()
+            changed[name] = fingerprints[name].index[fingerprints[name].ne(seen.reindex(fingerprints[name].index))]
+
+        # every build runs once, on the plays of the games any of its tables needs
+        builds = {}
+        for name in tables:
+            builds.setdefault(ingest_tables[name]["build"], set()).update(changed[name])
+        built = {}
+        for build, game_ids in builds.items():
+            if game_ids:
+                built.update(self._build_for_games(build, game_ids, [ingest_tables[n]["attribute"] for n in tables if ingest_tables[n]["build"] == build]))
+
+        upserted = {}
+        for name in tables:
+            game_ids = changed[name]
+            upserted[name] = len(game_ids)
+            if not len(game_ids):
+                continue
+            table = built[ingest_tables[name]["attribute"]]
+            upsert_games(table[table["game_id"].isin(game_ids)], name, game_ids, self.games, ingest_tables[name]["key"], store=store)
+
+            marks = attach_games(pd.DataFrame({"game_id": game_ids}), self.games, columns=["season", "week"])
+            for season, weeks in marks.groupby("season"):
+                state = states[name].setdefault(str(season), {"week": 0, "games": {}})
+                state["week"] = max(state["week"], int(weeks["week"].max()))
+                state["games"].update(fingerprints[name][weeks["game_id"]].to_dict())
+            write_ingest_state(name, states[name], store=store)
+            print(f"Upserted {name}: {len(game_ids)} games")
+        return upserted
+
+    def to_database(self, path=DB_PATH):
+        """ bulk loads what has been built so far into the database (database.TABLES): the players of the id map, the
+        teams, the games and whichever of the game tables exist. rows are upserted on their key, so reloading is fine"""
+        players = (
+            self.id_map.dropna(subset="gsis_id")
+            .drop_duplicates(subset="gsis_id", keep="first")
+            .rename({"gsis_id": "player_id", "name": "player_name"}, axis=1)
+        )
+        load_frames(
+            {
+                "players": players[[c for c in ["player_id", "player_name", "position", "birthdate", "draft_year", "draft_round", "draft_pick", "draft_ovr", "height", "weight", "college"] if c in players.columns]],
+                "teams": team_dimension(),
+                "games": self.games,
+                "receiving": getattr(self, "agg_receiving", None),
+                "def_points": getattr(self, "def_fpoints", None),
+                "def_injuries": getattr(self, "def_injuries", None),
+                "qb_stats": getattr(self, "qb_stats", None),
+                "qb_starters": getattr(self, "qb_starters", None),
+            },
+            path=path,
+        )
+
+    def _ingest_start_weeks(self, states, lookback_weeks):
+        """ {season: first week ingest looks at} for the seasons of self._years that are not in the store in full: the
+        live season, and earlier ones whose high-water week (the lowest over the tables) isn't their last week yet.
+        only the schedules are loaded for this"""
+        schedules = pd.concat([self._datasets.get("matchup_data", raw_datasets["matchup_data"], season) for season in self._years], ignore_index=True)
+        last_weeks = season_weeks(build_games(schedules))
+        start_weeks = {}
+        for season in self._years:
+            high_water = min(state.get(str(season), {"week": 0})["week"] for state in states.values())
+            if season < current_season() and high_water >= last_weeks.get(season, 0):
+                continue
+            start_weeks[season] = max(1, high_water - lookback_weeks + 1)
+        return start_weeks
+
+    def _build_for_games(self, build, game_ids, attributes):
+        """ runs a build method on the plays and roster rows of game_ids only and returns the attributes it filled. the
+        full play-by-play data, participation matrix, game id map and the attributes are put back afterwards"""
+        saved = {a: getattr(self, a, None) for a in ["pbp_data", "participation", "game_id_map"] + attributes}
+        plays = np.flatnonzero(self.pbp_data["game_id"].isin(game_ids).to_numpy())
+        self.pbp_data = self.pbp_data.iloc[plays].reset_index(drop=True)
+        # the matrix columns are the plays, so the same plays are picked out of it
+        self.participation = self.participation[:, plays]
+        # the rosters are put on games through the game id map (_roster_games), so this keeps their rows to game_ids too
+        self.game_id_map = self.game_id_map[self.game_id_map["game_id"].isin(game_ids)]
+        try:
+            getattr(self, build)()
+            return {a: getattr(self, a) for a in attributes}
+        finally:
+            for a, value in saved.items():
+                setattr(self, a, value)
@@ -0,0 +1,230 @@
+import os
+import sqlite3
+import time
+
+import pandas as pd
+
+from feature_store import STRING_COLUMNS
+
+DB_PATH = './data/fantasy.db'
+
+# the tables of the database. columns are the ones every table has (with their sqlite type), key is the primary key
+# loads upsert on. the stat columns change with the pipeline, so any other column of a loaded frame is added the first
+# time it shows up, typed like the feature store types it. team, player and position name the columns the team/player/
+# position filters use, a table without one can't be filtered on it
+TABLES = {
+    'players': {
+        'columns': {'player_id': 'TEXT', 'player_name': 'TEXT', 'position': 'TEXT'},
+        'key': ['player_id'],
+        'player': 'player_id',
+        'position': 'position',
+        'indexes': [],
+    },
+    'teams': {
+        'columns': {'code': 'TEXT', 'team_id': 'INTEGER', 'team': 'TEXT'},
+        'key': ['code'],
+        'team': 'team',
+        'indexes': [],
+    },
+    'games': {
+        'columns': {'game_id': 'TEXT', 'season': 'INTEGER', 'week': 'INTEGER', 'game_type': 'TEXT', 'home_team': 'TEXT', 'away_team': 'TEXT'},
+        'key': ['game_id'],
+        'indexes': [['season', 'week']],
+    },
+    # the player-game receiving table (agg_wr_final)
+    'receiving': {
+        'columns': {'game_id': 'TEXT', 'player_id': 'TEXT', 'season': 'INTEGER', 'week': 'INTEGER', 'team': 'TEXT', 'opp_team': 'TEXT', 'position': 'TEXT'},
+        'key': ['game_id', 'player_id'],
+        'team': 'team',
+        'player': 'player_id',
+        'position': 'position',
+        'indexes': [['player_id', 'season', 'week'], ['team', 'season', 'week'], ['position', 'season']],
+    },
+    'def_points': {
+        'columns': {'game_id': 'TEXT', 'defteam': 'TEXT', 'season': 'INTEGER', 'week': 'INTEGER'},
+        'key': ['game_id', 'defteam'],
+        'team': 'defteam',
+        'indexes': [['defteam', 'season', 'week']],
+    },
+    'def_injuries': {
+        'columns': {'game_id': 'TEXT', 'team': 'TEXT', 'season': 'INTEGER', 'week': 'INTEGER'},
+        'key': ['game_id', 'team'],
+        'team': 'team',
+        'indexes': [['team', 'season', 'week']],
+    },
+    'qb_stats': {
+        'columns': {'game_id': 'TEXT', 'posteam': 'TEXT', 'passer_player_id': 'TEXT', 'season': 'INTEGER', 'week': 'INTEGER'},
+        'key': ['game_id', 'passer_player_id'],
+        'team': 'posteam',
+        'player': 'passer_player_id',
+        'indexes': [['passer_player_id', 'season', 'week'], ['posteam', 'season', 'week']],
+    },
+    # the starting QB of every team game (DataCreator.aggregate_qb_stats)
+    'qb_starters': {
+        'columns': {'game_id': 'TEXT', 'team': 'TEXT', 'season': 'INTEGER', 'week': 'INTEGER', 'player_id': 'TEXT', 'is_new_qb_starter': 'INTEGER'},
+        'key': ['game_id', 'team'],
+        'team': 'team',
+        'player': 'player_id',
+        'indexes': [['team', 'season', 'week']],
+    },
+}
+
+
+def connect(path = DB_PATH):
+    """ opens the database and makes sure the schema is there. WAL lets the dash app read while a load is running"""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok = True)
+    con = sqlite3.connect(path)
+    con.execute('PRAGMA journal_mode = WAL')
+    con.execute('PRAGMA synchronous = NORMAL')
+    create_schema(con)
+    return con
+
+
+def create_schema(con):
+    """ creates the tables and indexes in TABLES that don't exist yet, plus the load log"""
+    with con:
+        for name, spec in TABLES.items():
+            columns = ', '.join(f'"{c}" {t}' for c, t in spec['columns'].items())
+            key = ', '.join(f'"{c}"' for c in spec['key'])
+            con.execute(f'CREATE TABLE IF NOT EXISTS {name} ({columns}, PRIMARY KEY ({key}))')
+            for index in spec['indexes']:
+                con.execute(f'CREATE INDEX IF NOT EXISTS ix_{name}_{"_".join(index)} ON {name} ({", ".join(index)})')
+        con.execute('CREATE TABLE IF NOT EXISTS loads (load_id INTEGER PRIMARY KEY, tbl TEXT, rows INTEGER, loaded_at TEXT)')
+
+
+def _columns(con, name):
+    return [row[1] for row in con.execute(f'PRAGMA table_info({name})')]
+
+
+def table_columns(name, path = DB_PATH):
+    """ the columns a table of the database has right now"""
+    con = sqlite3.connect(path)
+    try:
+        return _columns(con, name)
+    finally:
+        con.close()
+
+
+def _sql_type(column, dtype):
+    if column in STRING_COLUMNS or dtype == object or isinstance(dtype, pd.CategoricalDtype) or pd.api.types.is_datetime64_any_dtype(dtype):
+        return 'TEXT'
+    if pd.api.types.is_bool_dtype(dtype) or pd.api.types.is_integer_dtype(dtype):
+        return 'INTEGER'
+    return 'REAL'
+
+
+def load_table(con, name, df):
+    """ bulk upserts df into a table of TABLES, in one transaction. rows whose key is already there are updated, so
+    loading the same games again is harmless. tables keyed by game that come without a season get it from the game id"""
+    spec = TABLES[name]
+    if 'season' in spec['columns'] and 'season' not in df.columns:
+        df = df.assign(season = df['game_id'].str[:4].astype(int))
+
+    existing = _columns(con, name)
+    columns = list(df.columns)
+    values = df.copy()
+    for c in columns:
+        sql_type = spec['columns'].get(c) or _sql_type(c, df[c].dtype)
+        if sql_type == 'TEXT':
+            # the fillna(0)'s in the pipeline leave 0's in some text columns (status, ...)
+            values[c] = df[c].astype(str).where(df[c].notna())
+        if c not in existing:
+            con.execute(f'ALTER TABLE {name} ADD COLUMN "{c}" {sql_type}')
+    rows = values.astype(object).where(values.notna(), None).itertuples(index = False, name = None)
+
+    quoted = ', '.join(f'"{c}"' for c in columns)
+    updates = ', '.join(f'"{c}" = excluded."{c}"' for c in columns if c not in spec['key'])
+    on_conflict = f'DO UPDATE SET {updates}' if updates else 'DO NOTHING'
+    with con:
+        con.executemany(f'INSERT INTO {name} ({quoted}) VALUES ({", ".join("?" * len(columns))}) '
+                        f'ON CONFLICT ({", ".join(spec["key"])}) {on_conflict}', rows)
+        con.execute('INSERT INTO loads (tbl, rows, loaded_at) VALUES (?, ?, ?)', (name, len(df), time.strftime('%Y-%m-%d %H:%M:%S')))
+    return len(df)
+
+
+def load_frames(frames, path = DB_PATH):
+    """ loads {table name: DataFrame} into the database, frames that are None are skipped"""
+    con = connect(path)
+    try:
+        for name, df in frames.items():
+            if df is not None:
+                print(f"Loaded {name}: {load_table(con, name, df)} rows")
+    finally:
+        con.close()
+
+
+def last_load(path = DB_PATH):
+    """ the id of the last load, it changes whenever the database does. None when there is no database"""
+    if not os.path.exists(path):
+        return None
+    con = sqlite3.connect(path)
+    try:
+        return con.execute('SELECT max(load_id) FROM loads').fetchone()[0]
+    finally:
+        con.close()
+
+
+def _where(name, seasons = None, weeks = None, positions = None, teams = None, players = None):
+    """ the WHERE clause (and its parameters) for the usual filters, every filter is a list of values"""
+    spec = TABLES[name]
+    # the season/week filters need the columns too (players and teams have neither)
+    season, week = [c if c in spec['columns'] else None for c in ['season', 'week']]
+    filters = [(season, seasons), (week, weeks), (spec.get('position'), positions), (spec.get('team'), teams), (spec.get('player'), players)]
+    clauses, params = [], []
+    for column, values in filters:
+        if values is None:
+            continue
+        if column is None:
+            raise ValueError(f'{name} can not be filtered on that')
+        values = list(values)
+        clauses.append(f'"{column}" IN ({", ".join("?" * len(values))})')
+        params += values
+    return (' WHERE ' + ' AND '.join(clauses) if clauses else ''), params
+
+
+def _check_columns(con, name, columns):
+    unknown = set(columns) - set(_columns(con, name))
+    if unknown:
+        raise KeyError(f'{sorted(unknown)} not in {name}')
+
+
+def read_rows(name, columns = None, path = DB_PATH, **filters):
+    """ the rows of a table matching filters (seasons, weeks, positions, teams, players), only the columns asked for.
+    the filters go to sqlite, so only the matching rows ever reach pandas"""
+    con = sqlite3.connect(path)
+    try:
+        if columns is not None:
+            _check_columns(con, name, columns)
+        select = ', '.join(f'"{c}"' for c in columns) if columns is not None else '*'
+        where, params = _where(name, **filters)
+        return pd.read_sql_query(f'SELECT {select} FROM {name}{where}', con, params = params)
+    finally:
+        con.close()
+
+
+def player_games(player_id, name = 'receiving', columns = None, seasons = None, path = DB_PATH):
+    """ every game of one player, a lookup on the (player, season, week) index"""
+    return read_rows(name, columns = columns, path = path, players = [player_id], seasons = seasons)
+
+
+def aggregate(name, sums, by, order_by = None, limit = None, path = DB_PATH, **filters):
+    """ sums columns of a table per group, e.g. aggregate('receiving', {'receiving_yards': 'receiving_yards'},
+    by = ['player_id', 'player_name', 'team'], teams = ['KC'], order_by = 'receiving_yards', limit = 20).
+    sums maps the output name to the column summed, with no sums we just get the distinct groups back. the grouping
+    happens in sqlite and only the groups come back"""
+    con = sqlite3.connect(path)
+    try:
+        _check_columns(con, name, list(by) + list(sums.values()))
+        if order_by is not None and order_by not in set(by) | set(sums):
+            raise KeyError(f'can not order by {order_by}')
+        group = ', '.join(f'"{c}"' for c in by)
+        columns = ', '.join([group] + [f'SUM("{c}") AS "{alias}"' for alias, c in sums.items()])
+        where, params = _where(name, **filters)
+        sql = f'SELECT {columns} FROM {name}{where} GROUP BY {group}'
+        if order_by is not None:
+            sql += f' ORDER BY "{order_by}" DESC'
+        if limit is not None:
+            sql += f' LIMIT {int(limit)}'
+        return pd.read_sql_query(sql, con, params = params)
+    finally:
+        con.close()
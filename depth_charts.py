@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+
+from players import player_keys
+from teams import TEAM_DTYPE, team_ids
+
+# the depth chart formations we track starters for, and the injured starter column each one ends up in.
+# num_injured_starters (the defense) keeps the name it had in inj_defense
+STARTER_FORMATIONS = {'Offense': 'num_injured_offense_starters', 'Defense': 'num_injured_starters'}
+
+# every team week key is packed into one int64: team id, season, week and formation, then the player key
+_WEEKS = 32
+_PLAYERS = 2**24
+
+
+def _team_week_key(teams, seasons, weeks):
+    """ one int64 per (team, season, week), ordered by week within a team season"""
+    team = team_ids(pd.Series(teams).astype(TEAM_DTYPE)).astype(np.int64)
+    return (team * 10000 + np.asarray(seasons, dtype = np.int64)) * _WEEKS + np.asarray(weeks, dtype = np.int64)
+
+
+def _player_key(team_weeks, formations, keys):
+    """ one int64 per (team, season, week, formation, player)"""
+    return (team_weeks * len(STARTER_FORMATIONS) + formations) * _PLAYERS + np.asarray(keys, dtype = np.int64)
+
+
+def build_depth_index(depth_charts, players):
+    """ the depth chart index: for every team, season, week, formation and position the players ranked by depth
+    (rank 1 is the first one listed). only regular season charts at the position a player is listed at
+    (position == depth_position) count and a player listed more than once keeps their best depth.
+    sorted by team, season, week, formation, position and rank"""
+    dc = depth_charts[(depth_charts['game_type'] == 'REG')
+                      & (depth_charts['position'] == depth_charts['depth_position'])
+                      & depth_charts['formation'].isin(list(STARTER_FORMATIONS))]
+    dc = dc[['team', 'season', 'week', 'formation', 'position', 'gsis_id', 'depth_team']].assign(
+        depth_team = pd.to_numeric(dc['depth_team'], errors = 'coerce'),
+        player_key = player_keys(dc['gsis_id'], 'gsis', players),
+    )
+    dc = dc[(dc['player_key'] >= 0) & dc['depth_team'].notna()]
+
+    # the best depth of every player per team week and formation, a sort and a drop_duplicates instead of a groupby
+    dc = dc.sort_values(['team', 'season', 'week', 'formation', 'player_key', 'depth_team'])
+    dc = dc.drop_duplicates(subset = ['team', 'season', 'week', 'formation', 'player_key'])
+
+    dc = dc.sort_values(['team', 'season', 'week', 'formation', 'position', 'depth_team', 'player_key'], ignore_index = True)
+    dc['rank'] = dc.groupby(['team', 'season', 'week', 'formation', 'position'], observed = True, sort = False).cumcount() + 1
+    dc['team_week'] = _team_week_key(dc['team'], dc['season'], dc['week'])
+    return dc
+
+
+def _chart_weeks(team_weeks, chart_team_weeks):
+    """ the latest depth chart at or before every team week (as a team week key), -1 when the team has none yet"""
+    charts = np.unique(chart_team_weeks)
+    position = np.searchsorted(charts, team_weeks, side = 'right') - 1
+    chart = charts[np.maximum(position, 0)]
+    # the chart has to be from the same team season, not the previous one
+    same_season = (position >= 0) & (chart // _WEEKS == team_weeks // _WEEKS)
+    return np.where(same_season, chart, -1)
+
+
+def injured_starters(injuries, depth_index, players, team_games):
+    """ the number of starters (depth 1) ruled Out per team game, for the offense and the defense (STARTER_FORMATIONS).
+    a player's depth is taken from the team's latest depth chart as of the week of the injury report, so a week
+    without a new chart uses the one before it. every lookup is on packed integer keys. team_games (game_id, team,
+    season, week) is the output grid, team games without injured starters get 0"""
+    out = injuries[(injuries['report_status'] == 'Out') & (injuries['game_type'] == 'REG')]
+    out = out.drop_duplicates(subset = ['season', 'week', 'team', 'gsis_id'])
+    keys = player_keys(out['gsis_id'], 'gsis', players)
+    out, keys = out[keys >= 0], keys[keys >= 0]
+
+    chart = _chart_weeks(_team_week_key(out['team'], out['season'], out['week']), depth_index['team_week'].to_numpy())
+    index_keys = pd.Index(_player_key(depth_index['team_week'].to_numpy(), depth_index['formation'].map({f: i for i, f in enumerate(STARTER_FORMATIONS)}).to_numpy(), depth_index['player_key'].to_numpy()))
+    depth = depth_index['depth_team'].to_numpy()
+
+    grid = team_games[['game_id', 'team', 'season', 'week']].reset_index(drop = True)
+    grid_keys = pd.Index(_team_week_key(grid['team'], grid['season'], grid['week']))
+    report_weeks = grid_keys.get_indexer(_team_week_key(out['team'], out['season'], out['week']))
+    for i, (formation, column) in enumerate(STARTER_FORMATIONS.items()):
+        rows = index_keys.get_indexer(_player_key(chart, i, keys))
+        starter = (rows >= 0) & (chart >= 0) & (depth[np.maximum(rows, 0)] == 1) & (report_weeks >= 0)
+        grid[column] = np.bincount(report_weeks[starter], minlength = len(grid))
+    return grid
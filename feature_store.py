@@ -0,0 +1,225 @@
+import glob
+import json
+import os
+import time
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from season_calendar import attach_games
+
+STORE_PATH = './data/store/'
+
+# the per game tables the incremental refresh keeps up to date, see upsert_games
+GAME_TABLES_PATH = './data/store/games/'
+
+# how each input table is laid out in the store. tables without a season column get one derived from the game id
+# for partitioning, it is dropped again when the table is read so the frames look the same as the csv's
+DATASETS = {
+    'receiving': {'partitioning': ['season', 'position']},
+    'def_points': {'partitioning': ['season']},
+    'def_injuries': {'partitioning': ['season']},
+    'qb_stats': {'partitioning': ['season']},
+}
+
+# these look numeric in places (or are all null in a slice) but are always identifiers/labels
+STRING_COLUMNS = ['player_id', 'game_id', 'status', 'position', 'player_name', 'team', 'opp_team', 'college',
+                  'twitter_username', 'defteam', 'posteam', 'passer_player_id']
+
+
+def _arrow_schema(df):
+    """ pins a type for every column so all partitions (and all versions) agree, no matter what a slice looks like"""
+    fields = []
+    for c, dtype in df.dtypes.items():
+        if c in STRING_COLUMNS or dtype == object:
+            fields.append(pa.field(c, pa.string()))
+        elif pd.api.types.is_bool_dtype(dtype):
+            fields.append(pa.field(c, pa.bool_()))
+        elif pd.api.types.is_integer_dtype(dtype):
+            fields.append(pa.field(c, pa.int64()))
+        else:
+            fields.append(pa.field(c, pa.float64()))
+    return pa.schema(fields)
+
+
+def _to_arrow(df):
+    """ df as an arrow table with the _arrow_schema types. the string columns are made strings first, a fillna(0)
+    leaves 0's in some of them (status, ...)"""
+    schema = _arrow_schema(df)
+    strings = {f.name: df[f.name].astype(str).where(df[f.name].notna()) for f in schema if f.type == pa.string()}
+    return pa.Table.from_pandas(df.assign(**strings), schema = schema, preserve_index = False)
+
+
+def read_manifest(store = STORE_PATH):
+    """ returns the store manifest, or None when nothing has been built yet"""
+    manifest_path = os.path.join(store, 'manifest.json')
+    if not os.path.exists(manifest_path):
+        return None
+    with open(manifest_path) as f:
+        return json.load(f)
+
+
+def build_store(files, path = './data/', store = STORE_PATH, version = None):
+    """ converts the csv exports in files ({dataset name: file name}) into a new version of the store and makes it current.
+    every dataset is written as parquet partitioned by DATASETS[name]['partitioning'] with an explicit schema"""
+    manifest = read_manifest(store) or {'current': None, 'versions': {}}
+    version = version or time.strftime('%Y%m%d%H%M%S')
+
+    datasets = {}
+    for name, file in files.items():
+        df = pd.read_csv(os.path.join(path, file), dtype = {c: str for c in STRING_COLUMNS})
+        derived = 'season' not in df.columns
+        if derived:
+            df['season'] = df['game_id'].str[:4].astype(int)
+        schema = _arrow_schema(df)
+
+        partitioning = DATASETS[name]['partitioning']
+        part_schema = pa.schema([schema.field(c) for c in partitioning])
+        ds.write_dataset(pa.Table.from_pandas(df, schema = schema, preserve_index = False),
+                         os.path.join(store, version, name),
+                         format = 'parquet',
+                         partitioning = ds.partitioning(part_schema, flavor = 'hive'),
+                         existing_data_behavior = 'delete_matching')
+
+        datasets[name] = {'source': file,
+                          'rows': len(df),
+                          'partitioning': partitioning,
+                          'derived_season': derived,
+                          'schema': {f.name: str(f.type) for f in schema}}
+        print(f"Stored {name}: {len(df)} rows")
+
+    manifest['versions'][version] = {'created': time.strftime('%Y-%m-%d %H:%M:%S'), 'datasets': datasets}
+    manifest['current'] = version
+    with open(os.path.join(store, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent = 2)
+    return version
+
+
+def read_table(name, columns = None, seasons = None, positions = None, store = STORE_PATH, version = None):
+    """ reads one dataset of the store. only the requested columns are decoded and only the partitions matching
+    seasons/positions are opened, so the cost scales with the slice rather than the whole table"""
+    manifest = read_manifest(store)
+    version = version or manifest['current']
+    meta = manifest['versions'][version]['datasets'][name]
+
+    schema = pa.schema([pa.field(c, pa.type_for_alias(t)) for c, t in meta['schema'].items()])
+    part_schema = pa.schema([schema.field(c) for c in meta['partitioning']])
+    dataset = ds.dataset(os.path.join(store, version, name),
+                         schema = schema,
+                         format = 'parquet',
+                         partitioning = ds.partitioning(part_schema, flavor = 'hive'))
+
+    # the derived season only exists for partitioning
+    keep = [c for c in schema.names if not (meta['derived_season'] and c == 'season')]
+    if columns is not None:
+        keep = [c for c in keep if c in set(columns)]
+
+    filters = []
+    if seasons is not None:
+        filters.append(ds.field('season').isin(list(seasons)))
+    if positions is not None and 'position' in meta['partitioning']:
+        filters.append(ds.field('position').isin(list(positions)))
+    expression = None
+    for f in filters:
+        expression = f if expression is None else expression & f
+
+    return dataset.to_table(columns = keep, filter = expression).to_pandas()
+
+
+def write_season(df, name, season, store = STORE_PATH):
+    """ writes one season of a dataset we stream in season by season to {store}/{name}/season={season}/.
+    the season is replaced as a whole, so writing it again (a re-run, a refreshed live season) is harmless"""
+    path = os.path.join(store, name, f'season={season}')
+    os.makedirs(path, exist_ok = True)
+    df.drop(columns = 'season', errors = 'ignore').to_parquet(os.path.join(path, 'part-0.parquet'), index = False)
+
+
+def read_seasons(name, seasons = None, columns = None, store = STORE_PATH, start_weeks = None):
+    """ reads back a dataset written with write_season. a column can be all null (or int instead of float) in one
+    season, so the season schemas are unified before reading. start_weeks ({season: first week}) reads only the
+    weeks from there on, the filter is pushed down to the parquet row groups"""
+    path = os.path.join(store, name)
+    partitioning = ds.partitioning(pa.schema([pa.field('season', pa.int64())]), flavor = 'hive')
+    dataset = ds.dataset(path, format = 'parquet', partitioning = partitioning)
+    schema = pa.unify_schemas([f.physical_schema.remove_metadata() for f in dataset.get_fragments()], promote_options = 'permissive')
+    dataset = ds.dataset(path, schema = schema.append(pa.field('season', pa.int64())), format = 'parquet', partitioning = partitioning)
+
+    expression = ds.field('season').isin(list(seasons)) if seasons is not None else None
+    if start_weeks:
+        weeks = None
+        for season, week in start_weeks.items():
+            season_weeks = (ds.field('season') == season) & (ds.field('week') >= week)
+            weeks = season_weeks if weeks is None else weeks | season_weeks
+        expression = weeks if expression is None else expression & weeks
+    return dataset.to_table(columns = columns, filter = expression).to_pandas()
+
+
+def game_fingerprints(frames):
+    """ a fingerprint (hex string) of every game id in frames, a hash over all the rows of the game. it changes when
+    any row of the game does (a stat correction, a late ngs upload) and not when the rows are just reordered"""
+    hashes = []
+    for df in frames:
+        rows = pd.util.hash_pandas_object(df, index = False).to_numpy()
+        hashes.append(pd.Series(rows, index = df['game_id'].to_numpy()))
+    # the row hashes are summed (mod 2**64) so the order of the rows and frames doesn't matter
+    combined = pd.concat(hashes).groupby(level = 0).sum()
+    return combined.map('{:016x}'.format)
+
+
+def _game_partition(name, season, week, store):
+    return os.path.join(store, name, f'season={season}', f'week={week}', 'part-0.parquet')
+
+
+def upsert_games(df, name, game_ids, games, key, store = GAME_TABLES_PATH):
+    """ replaces the rows of game_ids in a per game table of the store, {store}/{name}/season=/week=/. whatever the
+    table held for those games is dropped and the rows of df take their place, so upserting a game twice leaves the
+    same table as doing it once. only the partitions of game_ids are rewritten. returns the (season, week) written"""
+    weeks = attach_games(df[['game_id']], games, columns = ['season', 'week'])
+    affected = attach_games(pd.DataFrame({'game_id': list(game_ids)}), games, columns = ['season', 'week']).dropna()
+
+    written = []
+    for (season, week), part_games in affected.groupby(['season', 'week'])['game_id']:
+        season, week = int(season), int(week)
+        path = _game_partition(name, season, week, store)
+        rows = df[((weeks['season'] == season) & (weeks['week'] == week)).to_numpy()]
+        if os.path.exists(path):
+            stored = pd.read_parquet(path)
+            rows = pd.concat([stored[~stored['game_id'].isin(part_games)], rows], ignore_index = True)
+        rows = rows.drop_duplicates(subset = key, keep = 'last')
+
+        # written next to the partition and moved over it, so a partition is never half written
+        os.makedirs(os.path.dirname(path), exist_ok = True)
+        pq.write_table(_to_arrow(rows), path + '.tmp')
+        os.replace(path + '.tmp', path)
+        written.append((season, week))
+    return written
+
+
+def read_games(name, seasons = None, columns = None, store = GAME_TABLES_PATH):
+    """ reads back a table written with upsert_games, all of it or just some seasons"""
+    files = glob.glob(os.path.join(store, name, 'season=*', 'week=*', 'part-0.parquet'))
+    partitions = [tuple(int(d.split('=')[1]) for d in f.split(os.sep)[-3:-1]) for f in files]
+    files = [f for _, f in sorted(zip(partitions, files)) if seasons is None or _[0] in set(seasons)]
+    if not files:
+        return pd.DataFrame(columns = columns)
+    return pd.concat([pd.read_parquet(f, columns = columns) for f in files], ignore_index = True)
+
+
+def read_ingest_state(name, store = GAME_TABLES_PATH):
+    """ the high-water mark of a per game table: for every season the last week stored and the fingerprint of
+    every game as it was when it was upserted"""
+    path = os.path.join(store, name, '_state.json')
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def write_ingest_state(name, state, store = GAME_TABLES_PATH):
+    path = os.path.join(store, name, '_state.json')
+    os.makedirs(os.path.dirname(path), exist_ok = True)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(state, f, indent = 2)
+    os.replace(path + '.tmp', path)
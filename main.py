@@ -1,3 +1,5 @@
+import os
+
 from dash import Dash
 from dash_bootstrap_components.themes import BOOTSTRAP
 
@@ -7,12 +9,15 @@ from src.data.loader import load_fantasy_data
 
 # walkthrough: https://www.youtube.com/watch?v=GlRauKqI08Y
 PATH = "./data/final_gbg_rr.xlsx"
+# the database DataCreator.to_database loads, the app reads from it instead of the xlsx when it is there
+DATABASE = "./data/fantasy.db"
 
 def main() -> None:
-    data = load_fantasy_data(PATH)
+    database = DATABASE if os.path.exists(DATABASE) else None
+    data = load_fantasy_data(database or PATH)
     app = Dash(external_stylesheets=[BOOTSTRAP])
     app.title = "Fantasy Football Dashboard"
-    app.layout = create_layout(app, data)
+    app.layout = create_layout(app, data, database)
     app.run()
 
 
@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from scipy import sparse
+
+# what kind of play every row of the pbp data is. only snaps count toward snap counts/percentages:
+#   snap: the offense lined up to run a play (including plays called back)
+#   special_teams: kicks, punts and anything out of a punt/kick formation
+#   no_down: everything else without a down (two point tries, timeouts, end of quarter, ...)
+PLAY_CLASSES = pd.CategoricalDtype(['snap', 'special_teams', 'no_down'])
+
+
+def classify_plays(pbp_data):
+    """ the play_class of every play, see PLAY_CLASSES. the description scans run once here, when the data comes in"""
+    special_teams = (
+        pbp_data['play_type'].isin(['kickoff', 'extra_point', 'field_goal', 'punt'])
+        | pbp_data['desc'].str.contains('Punt formation|Kick formation| punts ', na = False)
+    ).to_numpy()
+    no_down = pbp_data['down'].isna().to_numpy()
+    codes = np.where(special_teams, 1, np.where(no_down, 2, 0))
+    return pd.Categorical.from_codes(codes, dtype = PLAY_CLASSES)
+
+
+def _split_ids(on_field):
+    """ splits ';' separated id strings with arrow. returns the ids (dictionary encoded) and the row each came from"""
+    on_field = pc.split_pattern(pa.array(on_field, type = pa.string(), from_pandas = True), ';')
+    ids = pc.list_flatten(on_field)
+    rows = pc.list_parent_indices(on_field)
+    keep = pc.not_equal(ids, '')
+    return ids.filter(keep).dictionary_encode(), rows.filter(keep).to_numpy()
+
+
+def participation_matrix(pbp_data, players, chunk_size = 200000):
+    """ the sparse players x plays incidence of offense_players (';' separated ids), a 1 wherever a player was on the
+    field for a play. rows follow players (an Index of player ids, normally the id map), ids we have never seen are
+    appended to it. the strings are split by arrow chunk_size plays at a time, so there is never a python object
+    per player-play and the temporary arrays stay small. returns (CSR matrix, players)"""
+    on_field = pbp_data['offense_players'].to_numpy(dtype = object)
+    codes, plays = [np.array([], dtype = np.int32)], [np.array([], dtype = np.int32)]
+    for start in range(0, len(on_field), chunk_size):
+        ids, rows = _split_ids(on_field[start:start + chunk_size])
+        # the ids are hashed once, then only the distinct ones are looked up in players
+        uniques = pd.Index(ids.dictionary.to_pandas())
+        player_codes = players.get_indexer(uniques)
+        if (player_codes < 0).any():
+            players = players.append(uniques[player_codes < 0])
+            player_codes = players.get_indexer(uniques)
+        codes.append(player_codes.astype(np.int32)[ids.indices.to_numpy()])
+        plays.append((rows + start).astype(np.int32))
+
+    codes, plays = np.concatenate(codes), np.concatenate(plays)
+    matrix = sparse.csr_matrix((np.ones(len(codes), dtype = np.int32), (codes, plays)), shape = (len(players), len(pbp_data)))
+    return matrix, players
+
+
+def snap_counts(matrix, players, pbp_data, downs = (1, 2, 3, 4)):
+    """ snaps per down for every player and game, counting the plays with play_class snap. this is one sparse product
+    of the incidence matrix with a plays x (game, down) indicator, so nothing is exploded. returns game_id,
+    player_id and snap_count_{down} for every player with at least one snap"""
+    game_codes, game_ids = pd.factorize(pbp_data['game_id'])
+    down = pbp_data['down'].to_numpy(dtype = float)
+    down_codes = pd.Index(downs, dtype = float).get_indexer(down)
+    snap = (pbp_data['play_class'] == 'snap').to_numpy() & (down_codes >= 0) & (game_codes >= 0)
+
+    columns = game_codes * len(downs) + down_codes
+    indicator = sparse.csr_matrix((np.ones(snap.sum(), dtype = np.int32), (np.flatnonzero(snap), columns[snap])),
+                                  shape = (len(pbp_data), len(game_ids) * len(downs)))
+    per_game_down = (matrix @ indicator).tocoo()
+
+    # every (player, game) pair that has a snap becomes a row, its downs the columns
+    pairs, row = np.unique(per_game_down.row.astype(np.int64) * len(game_ids) + per_game_down.col // len(downs), return_inverse = True)
+    counts = np.zeros((len(pairs), len(downs)), dtype = np.int64)
+    counts[row, per_game_down.col % len(downs)] = per_game_down.data
+
+    snaps = pd.DataFrame(counts, columns = [f'snap_count_{d}' for d in downs])
+    snaps.insert(0, 'player_id', players[pairs // len(game_ids)])
+    snaps.insert(0, 'game_id', game_ids[pairs % len(game_ids)])
+    return snaps
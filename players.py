@@ -0,0 +1,102 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+PLAYER_INDEX_PATH = './data/player_index.parquet'
+
+# the id columns of nfl.import_ids we resolve, by source. a player keeps their player_key as long as any of these
+# still matches, in this order
+ID_SOURCES = {
+    'gsis': 'gsis_id',
+    'pfr': 'pfr_id',
+    'espn': 'espn_id',
+    'sleeper': 'sleeper_id',
+}
+
+# known collisions in the id map, applied before the index is built: id column -> {wrong id: right id}.
+# the replacements happen at the same time, so an id can be moved and reused in one go
+ID_CORRECTIONS = {
+    # Conklin/Izzo: the id map has Conklin under Izzo's gsis id, Izzo gets a placeholder
+    # TODO: Do we still need to do this? We could probably just drop these players? What happens for older years, is this still an issue?
+    'gsis_id': {'00-0034439': '00-0034270', '00-0034270': '11-1111111'},
+}
+
+
+def correct_player_ids(id_map):
+    """ applies ID_CORRECTIONS to the id map in place"""
+    for column, corrections in ID_CORRECTIONS.items():
+        if column in id_map.columns:
+            id_map[column] = id_map[column].replace(corrections)
+
+
+def _id_strings(values):
+    """ ids as strings, the numeric ones (espn, sleeper) come as floats from the id map and as ints elsewhere"""
+    values = pd.Series(values)
+    if pd.api.types.is_numeric_dtype(values):
+        values = values.astype('Int64')
+    return values.astype('string').astype(object).where(values.notna(), None)
+
+
+def _lookup(index, source, values):
+    """ the row of index for every value, -1 when the id is unknown. an id shared by several players resolves to the
+    first one, ID_CORRECTIONS is where collisions get fixed"""
+    ids = index[ID_SOURCES.get(source, source)].dropna()
+    ids = ids[~ids.duplicated()]
+    rows = pd.Index(ids.to_numpy()).get_indexer(_id_strings(values))
+    return np.where(rows >= 0, ids.index.to_numpy()[np.maximum(rows, 0)], -1)
+
+
+def build_player_index(id_map, path = PLAYER_INDEX_PATH):
+    """ the player identity index: one row per player with a compact integer player_key and the player's ids
+    (ID_SOURCES) and name. the index is persisted at path and players keep their key across rebuilds, new players
+    are appended and players that dropped out of the id map stay, so a key is never reused. the key of a player is
+    also their row in the index"""
+    columns = [c for c in list(ID_SOURCES.values()) + ['name'] if c in id_map.columns]
+    current = id_map[columns].copy()
+    for c in columns:
+        current[c] = _id_strings(current[c])
+    current = current.dropna(how = 'all', subset = [c for c in columns if c != 'name']).reset_index(drop = True)
+
+    stored = pd.read_parquet(path) if path is not None and os.path.exists(path) else None
+    if stored is None:
+        index = current
+    else:
+        keys = np.full(len(current), -1)
+        for source, column in ID_SOURCES.items():
+            if column in columns:
+                keys = np.where(keys < 0, _lookup(stored, source, current[column]), keys)
+        # a stored player matched twice keeps their key for the first match only
+        keys = np.where(pd.Series(keys).duplicated().to_numpy() & (keys >= 0), -1, keys)
+        found = keys >= 0
+        index = stored.drop(columns = 'player_key').astype(object)
+        # the ids of a player we already know are refreshed (a new pfr id, ...)
+        shared = [c for c in columns if c in index.columns]
+        index.loc[keys[found], shared] = current.loc[found, shared].to_numpy()
+        index = pd.concat([index, current[~found]], ignore_index = True)
+
+    index.insert(0, 'player_key', np.arange(len(index), dtype = np.int32))
+    if path is not None:
+        os.makedirs(os.path.dirname(path) or '.', exist_ok = True)
+        index.to_parquet(path + '.tmp', index = False)
+        os.replace(path + '.tmp', path)
+    return index
+
+
+def player_keys(values, source, index):
+    """ the player_key of every id in values, -1 when unknown. source is one of ID_SOURCES (or 'name' for a last
+    resort match on the name). the ids are hashed once, everything else is array indexing"""
+    return _lookup(index, source, values).astype(np.int32)
+
+
+def player_ids(keys, index, source = 'gsis'):
+    """ the ids (of source) of player keys, None for -1"""
+    ids = index[ID_SOURCES.get(source, source)].to_numpy(dtype = object)
+    return np.where(keys >= 0, ids[np.maximum(keys, 0)], None)
+
+
+def attach_player_ids(df, column, source, index):
+    """ the rows of df whose column (ids of source) is in the index, with their player_key and gsis player_id added"""
+    keys = player_keys(df[column], source, index)
+    found = keys >= 0
+    return df[found].assign(player_key = keys[found], player_id = player_ids(keys[found], index))
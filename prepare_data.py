@@ -1,12 +1,26 @@
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
 import pandas as pd
 import numpy as np
+import pyarrow as pa
 import nfl_data_py as nfl
 from sklearn.preprocessing import StandardScaler
 from sklearn.model_selection import train_test_split
 
 from utils import viz_distro
+from stage_cache import fingerprint_files, frame_fingerprint, stage_key
+from feature_store import STORE_PATH, read_manifest, read_table
+from database import last_load, read_rows, table_columns
+from season_calendar import attach_games, build_games, current_season, season_weeks, team_games
+from teams import normalize_teams
+from qb_stats import qb_starters
+from scoring import SCORING_RULES
 
 DATA_PATH = './data/'
+ROSTER_PATH = DATA_PATH + 'rosters/'
 DATA_FILES = {
     'receiving':'agg_wr_final_10082024.csv',
     'def_points':'def_fpoints_10082024.csv',
@@ -14,6 +28,11 @@ DATA_FILES = {
     'qb_stats':'qb_stats_10082024.csv'
 }
 
+# the starting QB table, one row per team game (see qb_stats.qb_starters)
+QB_STARTER_COLUMNS = ['game_id', 'team', 'player_id', 'season', 'week', 'is_new_qb_starter']
+# the frames read_data produces, everything after it is built from these
+RAW_FRAMES = ['_raw_wr_stats', '_raw_def_points_allowed', '_raw_def_injuries', '_raw_qb_stats', '_raw_qb_starters']
+
 DROP_COLUMNS = [
     'avg_cushion', 
     'avg_separation', 
@@ -65,32 +84,10 @@ non_numeric = [
     'player_name',
     'team',
     'twitter_username', 
-    'college'
+    'college',
     'opp_team'
 ]
 
-common_club_code_map =     {
-        "LVR": "LV",
-        "KCC": "KC",
-        "NOS": "NO",
-        "TBB": "TB",
-        "SFO": "SF",
-        "NEP": "NE",
-        "GBP": "GB",
-        "JAC": "JAX",
-        "OAK":"LV",
-        "STL":"LAR",
-        "SL":"LAR",
-        "SD":"LAC",
-        "SDC":"LAC",
-        "RAM":"LAR",
-        "LA":"LAR",
-        "BLT":"BAL",
-        "HST":"HOU",
-        "CLV":"CLE",
-        "ARZ":"ARI"
-    }
-
 non_scale_list = [
     "depth_team",
     "snap_percentage_1",
@@ -119,49 +116,114 @@ drop_list = ['receiving_fpoints',
             'total_qb_fpoints_given_up',
             'qb_player_id']
 
+# the QB rows come out of the qb table (qb_stats) instead, see qb_position_frame. pass_fpoints is the passing part of
+# the ppr rules (scoring.SCORING_RULES), the qb table has no fumbles or two point tries
+qb_lag_columns = ['player_id', 'game_id', 'season', 'week', 'completions', 'attempts', 'passing_yards', 'touchdowns',
+       'interceptions', 'completion_percentage', 'yards_per_attempt', 'td_percentage', 'interception_percentage', 'QBR',
+       'qb_num_snaps', 'pass_fpoints']
+
+qb_non_lag_columns = ['player_id', 
+                      'game_id', 
+                      'team', 
+                      'week', 
+                      'season',
+                      'position', 
+                      'pass_fpoints', 
+                      'opp_team']
+
+qb_non_scale_list = [
+    "def_inj_starters",
+    'hist_qb_completion_percentage',
+    'hist_qb_td_percentage',
+    'hist_qb_interception_percentage',
+]
+
+# unlike the other positions, the points the defense gave up to QB's are the feature we keep
+qb_drop_list = ['pass_fpoints', 
+               'new_week',
+               'player_id', 
+               'game_id', 
+               'team', 
+               'opp_team', 
+               'position', 
+               'qb_player_id']
+
 years = [2015, 2016, 2017, 2018, 2019, 2020, 2021, 2022, 2023, 2024]
 
-def get_rosters(years):
-    """ TODO: Include this in the data step... should not be here"""
+# everything PrepData needs to know about a position. WR, TE and RB all come out of the receiving table, so they share
+# the column sets and only differ in how many players a week we keep and which defensive points allowed we merge in.
+# QB's are not in the receiving table (only as receivers), their rows are built from the qb table
+POSITION_SPECS = {
+    'WR': {
+        'table': 'receiving',
+        'target': 'receiving_fpoints',
+        'top_n': 40,
+        'lag_columns': lag_columns,
+        'non_lag_columns': non_lag_columns,
+        'non_scale_list': non_scale_list,
+        'drop_list': drop_list,
+        'def_fpoints': 'total_wr_fpoints_given_up',
+    },
+    'TE': {
+        'table': 'receiving',
+        'target': 'receiving_fpoints',
+        'top_n': 20,
+        'lag_columns': lag_columns,
+        'non_lag_columns': non_lag_columns,
+        'non_scale_list': non_scale_list,
+        'drop_list': drop_list,
+        'def_fpoints': 'total_te_fpoints_given_up',
+    },
+    'RB': {
+        'table': 'receiving',
+        'target': 'receiving_fpoints',
+        'top_n': 30,
+        'lag_columns': lag_columns,
+        'non_lag_columns': non_lag_columns,
+        'non_scale_list': non_scale_list,
+        'drop_list': drop_list,
+        'def_fpoints': 'total_rb_fpoints_given_up',
+    },
+    'QB': {
+        'table': 'qb_stats',
+        'target': 'pass_fpoints',
+        'top_n': 32,
+        'lag_columns': qb_lag_columns,
+        'non_lag_columns': qb_non_lag_columns,
+        'non_scale_list': qb_non_scale_list,
+        'drop_list': qb_drop_list,
+        'def_fpoints': 'total_qb_fpoints_given_up',
+    },
+}
+
+def build_games_season(yr):
+    """ the game dimension (season_calendar.build_games) of a single season with our club codes"""
+    matchup_data = nfl.import_schedules([yr])
+    normalize_teams(matchup_data, ["away_team", "home_team"])
+    return build_games(matchup_data)
+
+
+def build_roster_season(yr):
+    """ rosters for a single season joined to the game ids and the offensive depth charts. this is the expensive part
+    (three downloads), get_rosters stores the result so it only runs when a season is missing or still changing"""
     r_col_list = ["week", "position", "player_name", "player_id", "team", "status"]
-    rosters = pd.DataFrame(columns=r_col_list)
     # this is due to a bug in the NFL data API. This function does not work when you pass it multiple years all at once
-    for yr in years:
-        t_roster = nfl.import_weekly_rosters(years=[yr])[r_col_list]
-        t_roster["season"] = yr
-        if yr < 2021:
-            t_roster = t_roster[t_roster.week <= 17]
-        else:
-            t_roster = t_roster[t_roster.week <= 18]
-        rosters = pd.concat([rosters, t_roster], ignore_index=True)
-
-    rosters['team'] = rosters['team'].replace(common_club_code_map)
-
-    # we need matchup data as well
-    matchup_data = nfl.import_schedules(years)
-    matchup_data["away_team"] = matchup_data["away_team"].replace(common_club_code_map)
-    matchup_data["home_team"] = matchup_data["home_team"].replace(common_club_code_map)
-
-    # here we grab unique game id's and home/away teams for each game in the season
-    game_id_map = pd.concat(
-        [
-            matchup_data[["game_id", "home_team", "week", "season"]].rename(
-                {"home_team": "team_abbr"}, axis=1
-            ),
-            matchup_data[["game_id", "away_team", "week", "season"]].rename(
-                {"away_team": "team_abbr"}, axis=1
-            ),
-        ],
-        ignore_index=False,
-    )
+    # we need matchup data as well, it knows the last regular season week and the game id of every team each week
+    games = build_games_season(yr)
+    game_id_map = team_games(games)[["game_id", "team", "week", "season"]].rename({"team": "team_abbr"}, axis=1)
+
+    rosters = nfl.import_weekly_rosters(years=[yr])[r_col_list]
+    rosters["season"] = yr
+    rosters = rosters[rosters.week <= season_weeks(games)[yr]]
+    normalize_teams(rosters, ['team'])
 
     # we need depth charts data as well
-    depth_charts = nfl.import_depth_charts(years=years)
-    depth_charts["club_code"] = depth_charts["club_code"]
+    depth_charts = nfl.import_depth_charts(years=[yr])
     depth_charts["depth_team"] = depth_charts["depth_team"].fillna(4)
     depth_charts["depth_team"] = depth_charts["depth_team"].astype(int)
     depth_charts = depth_charts[depth_charts['formation'] == 'Offense'].copy()
-    depth_charts['depth_position'] = depth_charts.apply(lambda x: x['position'] if x['depth_position'].strip() == '' else x['depth_position'], axis = 1)
+    # a blank depth position means the player is listed at their roster position
+    depth_charts['depth_position'] = depth_charts['depth_position'].where(depth_charts['depth_position'].str.strip() != '', depth_charts['position'])
 
     # merges the depth chart data with the game id data from above
     depth_charts = depth_charts.merge(
@@ -187,151 +249,474 @@ def get_rosters(years):
 
     temp = depth_charts[['position', 'depth_position', 'depth_team', 'game_id', 'gsis_id']].rename({'gsis_id':'player_id', 'position':'dc_position'}, axis=1)
     final = rosters.merge(temp, on = ['game_id', 'player_id'], how = 'left')
-    # some extra filling
-    final['depth_position'] = final.apply(lambda x: x['position'] if (x['depth_position'] != x['depth_position'] or x['depth_position'] is None) else x['depth_position'], axis = 1)
+    # some extra filling, players without a depth chart entry keep their roster position
+    final['depth_position'] = final['depth_position'].fillna(final['position'])
     final["depth_team"] = final["depth_team"].fillna(4)
 
     return final.sort_values(['game_id', 'team', 'position', 'depth_team', 'player_id'])
-        
+
+
+def _season_files(name, build, years, path, refresh, max_age):
+    """ the parquet file of every season ({name}_{yr}.parquet under path), building the missing ones with build(yr).
+    finished seasons are built once and then only read. the season in progress is rebuilt when its file is older
+    than max_age seconds, and refresh = True rebuilds everything"""
+    os.makedirs(path, exist_ok = True)
+    live_season = current_season()
+
+    files = []
+    for yr in sorted(years):
+        file_path = os.path.join(path, f'{name}_{yr}.parquet')
+        stale = (not os.path.exists(file_path)
+                 or refresh
+                 or (yr >= live_season and time.time() - os.path.getmtime(file_path) > max_age))
+        if stale:
+            print(f"Building the {yr} {name}")
+            build(yr).to_parquet(file_path, index = False)
+        files.append(file_path)
+
+    return files
+
+
+def _read_seasons(name, build, years, path, refresh, max_age):
+    """ reads the season files of _season_files into one frame"""
+    return pd.concat([pd.read_parquet(f) for f in _season_files(name, build, years, path, refresh, max_age)], ignore_index = True)
+
+
+def get_rosters(years, path = ROSTER_PATH, refresh = False, max_age = 24 * 3600):
+    """ the roster/depth chart dimension for years, stored as one parquet file per season under path"""
+    rosters = _read_seasons('rosters', build_roster_season, years, path, refresh, max_age)
+    return rosters.sort_values(['game_id', 'team', 'position', 'depth_team', 'player_id'])
+
+
+def get_games(years, path = ROSTER_PATH, refresh = False, max_age = 24 * 3600):
+    """ the game dimension for years, stored next to the rosters"""
+    return _read_seasons('games', build_games_season, years, path, refresh, max_age)
+
+
+def dimension_files(years, rosters = True, path = ROSTER_PATH):
+    """ the game (and roster) season files get_games/get_rosters read, built if they are missing or stale. their
+    fingerprints key the stages that use them"""
+    files = _season_files('games', build_games_season, years, path, False, 24 * 3600)
+    if rosters:
+        files += _season_files('rosters', build_roster_season, years, path, False, 24 * 3600)
+    return files
+
+
+def qb_position_frame(qb_stats):
+    """ the rows PrepData works on for QB's, one per passer and game of the qb table. passer_player_id and posteam become
+    player_id and team like in the receiving table, the opponent is the other team of the game id (season_week_away_home)
+    and pass_fpoints scores the passing stats with the ppr rules"""
+    qbs = qb_stats.rename({'passer_player_id': 'player_id', 'posteam': 'team'}, axis = 1)
+    if 'season' not in qbs.columns:
+        qbs['season'] = qbs['game_id'].str[:4].astype(int)
+    qbs['position'] = 'QB'
+
+    # the game ids use the provider codes (LA, ...), so both sides are put on our codes before comparing
+    sides = qbs['game_id'].str.split('_', expand = True)[[2, 3]].set_axis(['away_team', 'home_team'], axis = 1).assign(team = qbs['team'].astype(object))
+    normalize_teams(sides, ['away_team', 'home_team', 'team'])
+    sides = sides.astype(object)
+    qbs['opp_team'] = sides['home_team'].where(sides['team'] != sides['home_team'], sides['away_team'])
+
+    points = SCORING_RULES['ppr']['pass']
+    qbs['pass_fpoints'] = (qbs['passing_yards'] * points['passing_yards']
+                           + qbs['touchdowns'] * points['pass_touchdown']
+                           + qbs['interceptions'] * points['interception'])
+    return qbs
+
+
+def align_prior_week(rolling, targets, keys, week = 'week'):
+    """ for every row in targets, finds the most recent earlier week in rolling with the same keys (e.g. player and season)
+    and returns a new_week series for rolling holding the target week each historical row should be associated with.
+    when several target weeks share the same earlier week the latest one wins, just like writing them in week order."""
+    # the key frames are small, so we just sort them once and let merge_asof do the searching. merge_asof wants the
+    # same key dtypes on both sides, so categorical keys (compact mode) go back to plain values here
+    plain = {k: object for k in keys}
+    left = targets[keys + [week]].dropna().drop_duplicates().astype(plain).rename({week: 'new_week'}, axis=1)
+    left['new_week'] = left['new_week'].astype(float)
+    right = rolling[keys + [week]].dropna().drop_duplicates().astype(plain).rename({week: 'prior_week'}, axis=1)
+    right['prior_week'] = right['prior_week'].astype(float)
+
+    matched = pd.merge_asof(left.sort_values('new_week'),
+                            right.sort_values('prior_week'),
+                            left_on = 'new_week',
+                            right_on = 'prior_week',
+                            by = keys,
+                            allow_exact_matches = False,
+                            direction = 'backward').dropna(subset = ['prior_week'])
+    new_week = matched.groupby(keys + ['prior_week'])['new_week'].max()
+
+    # now look up every historical row (including duplicates) in one go
+    rolling_keys = pd.MultiIndex.from_frame(rolling[keys + [week]].astype({**plain, week: float}))
+    return pd.Series(new_week.reindex(rolling_keys).to_numpy(), index = rolling.index, name = 'new_week')
+
+
+
+def group_mode(df, keys, col):
+    """ the most common value of col within each group of keys, aligned to the rows of df. ties go to the smallest value,
+    the same as taking Series.mode()[0]."""
+    counts = df.groupby(keys + [col], observed = True).size().rename('count').reset_index()
+    counts = counts.sort_values(keys + ['count', col], ascending = [True] * len(keys) + [False, True]).drop_duplicates(subset = keys)
+    return pd.Series(df[keys].merge(counts, on = keys, how = 'left')[col].to_numpy(), index = df.index, name = col)
+
+
+def fill_by_group(df, columns, levels):
+    """ fills nulls in columns with the group mean at each level in turn, every level sees the values filled by the
+    ones before it. an empty level means the whole frame. returns how many values each level filled per column."""
+    report = {}
+    for level in levels:
+        if level:
+            means = df.groupby(level, observed = True)[columns].transform('mean')
+        else:
+            means = df[columns].mean()
+        before = df[columns].isna().sum()
+        df[columns] = df[columns].fillna(means)
+        report['_'.join(level) if level else 'global'] = before - df[columns].isna().sum()
+    return pd.DataFrame(report)
+
+
+def compact_frame(df):
+    """ a smaller copy of df: strings become categoricals, columns holding whole numbers (and no nulls) become the
+    smallest int that fits and every other float column becomes float32"""
+    out = {}
+    for c, dtype in df.dtypes.items():
+        col = df[c]
+        if isinstance(dtype, pd.CategoricalDtype) or pd.api.types.is_bool_dtype(dtype):
+            out[c] = col
+        elif pd.api.types.is_integer_dtype(dtype):
+            out[c] = pd.to_numeric(col, downcast = 'integer')
+        elif pd.api.types.is_float_dtype(dtype):
+            values = col.to_numpy()
+            whole = len(values) > 0 and not np.isnan(values).any() and np.abs(values).max() < 2**31 and np.array_equal(values, np.round(values))
+            out[c] = pd.to_numeric(col.astype(np.int64), downcast = 'integer') if whole else col.astype(np.float32)
+        elif pd.api.types.is_object_dtype(dtype) or pd.api.types.is_string_dtype(dtype):
+            out[c] = col.astype('category')
+        else:
+            out[c] = col
+    return pd.DataFrame(out, index = df.index)
+
+
+def full_bytes(df):
+    """ what df would take up with 64 bit numbers and plain python strings, i.e. without compact_frame"""
+    total = df.index.memory_usage(deep = True)
+    for c, dtype in df.dtypes.items():
+        if isinstance(dtype, pd.CategoricalDtype):
+            total += df[c].astype(object).memory_usage(deep = True, index = False)
+        elif pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype):
+            total += 8 * len(df)
+        else:
+            total += df[c].memory_usage(deep = True, index = False)
+    return total
+
+
+def rolling_features(df, keys, value_cols, window, extra_windows = (), ewm_spans = ()):
+    """ rolling means of value_cols within each group of keys. df must already be sorted by the keys and then by time.
+    the main window keeps the column names and needs a full window, like rolling(window, min_periods=window), window=None
+    skips it. extra windows are suffixed _roll{w} and average whatever games are available, ewm spans are suffixed
+    _ewm{span}. everything comes from one pass of per-group cumulative sums, a window is just the difference of two of them."""
+    values = df[value_cols].to_numpy(dtype = float)
+    missing = np.isnan(values)
+    filled = pd.DataFrame(np.where(missing, 0, values), index = df.index)
+    group_keys = [df[k].to_numpy() for k in keys]
+
+    # cumulative sums and observation counts restart for every group
+    grouped = pd.concat([filled, pd.DataFrame(~missing, index = df.index).astype(float)], axis = 1, ignore_index = True).groupby(group_keys, sort = False)
+    cumulative = grouped.cumsum().to_numpy()
+    csum, ccount = cumulative[:, :len(value_cols)], cumulative[:, len(value_cols):]
+    pos = grouped.cumcount().to_numpy()
+
+    def window_totals(w):
+        # sums and counts over the last w rows of each group (fewer at the start of a group)
+        back = np.arange(len(df)) - w
+        full = pos >= w
+        prev_sum = np.where(full[:, None], csum[back.clip(0)], 0)
+        prev_count = np.where(full[:, None], ccount[back.clip(0)], 0)
+        return csum - prev_sum, ccount - prev_count
+
+    out = {}
+    with np.errstate(invalid = 'ignore', divide = 'ignore'):
+        if window is not None:
+            total, count = window_totals(window)
+            out.update(zip(value_cols, np.where(count == window, total / window, np.nan).T))
+
+        for w in extra_windows:
+            total, count = window_totals(w)
+            out.update(zip([f"{c}_roll{w}" for c in value_cols], np.where(count > 0, total / count, np.nan).T))
+
+        for span in ewm_spans:
+            if span <= 1:
+                raise ValueError(f"ewm spans must be greater than 1, got {span}")
+            # the adjusted ewm weights every past game by (1 - alpha)^(games ago). scaling everything by (1 - alpha)^-pos
+            # turns that into a ratio of two running sums
+            scale = (1 - 2 / (span + 1)) ** -pos.astype(float)
+            ewm = pd.DataFrame(np.hstack([filled.to_numpy() * scale[:, None], (~missing) * scale[:, None]]), index = df.index).groupby(group_keys, sort = False).cumsum().to_numpy()
+            weight = ewm[:, len(value_cols):]
+            out.update(zip([f"{c}_ewm{span}" for c in value_cols], np.where(weight > 0, ewm[:, :len(value_cols)] / weight, np.nan).T))
+
+    return pd.DataFrame(out, index = df.index)
+
 
 class PrepData():
 
-    def __init__(self, window = True, time_series = False):
+    def __init__(self, window = True, time_series = False, cache = None, roll_windows = None, ewm_spans = None, compact = False, position = 'WR'):
         
         self._window = window
         self._time_series = time_series
 
-    def read_data(self, path = DATA_PATH, files = DATA_FILES):
-        # load in the datasets
-        self._raw_wr_stats = pd.read_csv(path + files['receiving'])
-        self._raw_def_points_allowed = pd.read_csv(path + files['def_points'])
-        self._raw_def_injuries = pd.read_csv(path + files['def_injuries'])
-        self._raw_qb_stats = pd.read_csv(path + files['qb_stats'])
-
-    def _subset(self, position = 'WR'):
-        self._raw_wr_stats = self._raw_wr_stats[self._raw_wr_stats['position'] == position]
+        if position not in POSITION_SPECS:
+            raise ValueError(f"no position spec for {position}, pick one of {list(POSITION_SPECS)}")
+        self._position = position
+        self._spec = POSITION_SPECS[position]
+
+        # compact mode keeps every frame in categoricals/small ints/float32 (see compact_frame), _memory holds the
+        # bytes of each frame before and after
+        self._compact = compact
+        self._memory = {}
+
+        # extra rolling window lengths and exponentially weighted spans. unlike the main roll_window they come from the
+        # whole history and average whatever games are available (see window_data)
+        self._roll_windows = list(roll_windows) if roll_windows is not None else []
+        self._ewm_spans = list(ewm_spans) if ewm_spans is not None else []
+
+        # an optional stage_cache.StageCache, every stage is keyed on its parameters and the key of the stage before it
+        self._cache = cache
+        self._stage_key = None
+
+    def _load_stage(self, stage, params, outputs):
+        """ moves the stage key along and, if the cache already holds this stage for the same inputs, loads its frames"""
+        if self._stage_key is None and stage != 'read_data':
+            # the raw frames were set by hand rather than read, so the chain starts from their contents
+            self._stage_key = frame_fingerprint({name: getattr(self, name) for name in RAW_FRAMES if hasattr(self, name)})
+        self._stage_key = stage_key(self._stage_key, stage, params)
+        if self._cache is None:
+            return False
+
+        frames = self._cache.get(self._stage_key)
+        if frames is None:
+            return False
+
+        for name in outputs:
+            setattr(self, name, frames[name])
+        print(f"Loaded {stage} from the cache")
+        return True
+
+    def _save_stage(self, stage, outputs):
+        """ compacts the outputs of a stage (in compact mode) and stores them in the cache"""
+        for name in outputs:
+            df = getattr(self, name)
+            before = full_bytes(df)
+            if self._compact:
+                df = compact_frame(df)
+                setattr(self, name, df)
+            self._memory[name] = [before, df.memory_usage(deep = True).sum()]
+
+        if self._cache is not None:
+            self._cache.put(self._stage_key, {name: getattr(self, name) for name in outputs}, stage = stage)
+
+    def memory_report(self):
+        """ bytes held by each frame (and the scaled arrays) before and after compaction. frames loaded from the cache
+        have no before number"""
+        report = pd.DataFrame(self._memory, index = ['bytes_before', 'bytes_after']).T
+        report.loc['total'] = report.sum(min_count = 1)
+        report['ratio'] = report['bytes_after'] / report['bytes_before']
+        return report
+
+    def read_data(self, path = DATA_PATH, files = DATA_FILES, columns = None, positions = None, seasons = None, store = STORE_PATH, database = None):
+        """ loads the four input tables. columns projects the receiving table (by default everything but DROP_COLUMNS),
+        positions filters the receiving table and seasons filters all of them. when a database is given (database.py) or
+        the feature store has been built (feature_store.build_store) these are pushed down to it, otherwise we fall back
+        to the csv's. the database also has the starting QBs DataCreator picked (_raw_qb_starters), without it that
+        frame is empty and add_external_stats picks them from the rosters"""
+        outputs = RAW_FRAMES
+        manifest = read_manifest(store) if database is None else None
+        if database is not None:
+            inputs = {'database': database, 'load': last_load(database)}
+        elif manifest is not None:
+            inputs = {'store': store, 'version': manifest['current']}
+        else:
+            inputs = fingerprint_files([path + f for f in files.values()])
+        self._stage_key = None
+        if self._load_stage('read_data', {'inputs': inputs, 'columns': columns, 'positions': positions, 'seasons': seasons, 'compact': self._compact}, outputs):
+            return
+
+        keep_column = (lambda c: c not in DROP_COLUMNS) if columns is None else (lambda c: c in set(columns))
+        self._raw_qb_starters = pd.DataFrame(columns = QB_STARTER_COLUMNS)
+
+        if database is not None:
+            receiving_columns = [c for c in table_columns('receiving', path = database) if keep_column(c)]
+            self._raw_wr_stats = read_rows('receiving', columns = receiving_columns, seasons = seasons, positions = positions, path = database)
+            self._raw_def_points_allowed = read_rows('def_points', seasons = seasons, path = database)
+            self._raw_def_injuries = read_rows('def_injuries', seasons = seasons, path = database)
+            self._raw_qb_stats = read_rows('qb_stats', seasons = seasons, path = database)
+            if 'is_new_qb_starter' in table_columns('qb_starters', path = database):
+                self._raw_qb_starters = read_rows('qb_starters', columns = QB_STARTER_COLUMNS, seasons = seasons, path = database)
+        elif manifest is not None:
+            receiving_columns = [c for c in manifest['versions'][manifest['current']]['datasets']['receiving']['schema'] if keep_column(c)]
+            self._raw_wr_stats = read_table('receiving', columns = receiving_columns, seasons = seasons, positions = positions, store = store)
+            self._raw_def_points_allowed = read_table('def_points', seasons = seasons, store = store)
+            self._raw_def_injuries = read_table('def_injuries', seasons = seasons, store = store)
+            self._raw_qb_stats = read_table('qb_stats', seasons = seasons, store = store)
+        else:
+            # load in the datasets
+            self._raw_wr_stats = pd.read_csv(path + files['receiving'], usecols = keep_column)
+            self._raw_def_points_allowed = pd.read_csv(path + files['def_points'])
+            self._raw_def_injuries = pd.read_csv(path + files['def_injuries'])
+            self._raw_qb_stats = pd.read_csv(path + files['qb_stats'])
+
+            if positions is not None:
+                self._raw_wr_stats = self._raw_wr_stats[self._raw_wr_stats['position'].isin(positions)]
+            if seasons is not None:
+                self._raw_wr_stats = self._raw_wr_stats[self._raw_wr_stats['season'].isin(seasons)]
+                for name in ['_raw_def_points_allowed', '_raw_def_injuries', '_raw_qb_stats']:
+                    df = getattr(self, name)
+                    setattr(self, name, df[df['game_id'].str[:4].astype(int).isin(seasons)])
+
+        self._save_stage('read_data', outputs)
+
+    def _subset(self, position = None):
+        position = position or self._position
+        if POSITION_SPECS[position]['table'] == 'qb_stats':
+            self._raw_wr_stats = qb_position_frame(self._raw_qb_stats)
+        else:
+            self._raw_wr_stats = self._raw_wr_stats[self._raw_wr_stats['position'] == position]
 
     def clean_data(self):
-        # subset to WR
+        outputs = ['_raw_wr_stats', '_raw_def_points_allowed']
+        if self._load_stage('clean_data', {'position': self._position}, outputs):
+            return
+
+        # subset to our position
         self._subset()
 
         # rename some columns
         self._raw_def_points_allowed.rename({'defteam':'team'}, axis=1, inplace=True)
 
         # drop columns with a lot of nulls
-        self._raw_wr_stats.drop(DROP_COLUMNS, axis=1, inplace = True)
+        self._raw_wr_stats.drop(DROP_COLUMNS, axis=1, inplace = True, errors = 'ignore')
         
         # there aren't many with missing collge/weight/height info, and they are not very impactful, I'm ok dropping them
-        self._raw_wr_stats.drop(self._raw_wr_stats[self._raw_wr_stats.college.isna()].index, inplace = True)
+        # (the qb table has no player info, so there is nothing to drop for QB's)
+        college_nulls = 0
+        if 'college' in self._raw_wr_stats.columns:
+            college_nulls = self._raw_wr_stats.college.isna().sum()
+            self._raw_wr_stats.drop(self._raw_wr_stats[self._raw_wr_stats.college.isna()].index, inplace = True)
 
         # let's also fill infinities
         self._raw_wr_stats.replace([np.inf, -np.inf], 0, inplace=True)
 
         # we just want to replace the team depth with the depth most often held by the player
-        self._raw_wr_stats["depth_team"] = self._raw_wr_stats.groupby(["player_id", "season"])["depth_team"].transform(
-            lambda x: x.fillna(x.mode()[0]) if len(x.mode()) > 0 else x.fillna(np.nan)
-        )
-
-        # the rest of these players are low on the depth chart so let's just fill with the max
-        self._raw_wr_stats["depth_team"] = self._raw_wr_stats["depth_team"].fillna(self._raw_wr_stats.depth_team.max())
+        has_depth = 'depth_team' in self._raw_wr_stats.columns
+        if has_depth:
+            depth_nulls = self._raw_wr_stats["depth_team"].isna().sum()
+            self._raw_wr_stats["depth_team"] = self._raw_wr_stats["depth_team"].fillna(group_mode(self._raw_wr_stats, ["player_id", "season"], "depth_team"))
+            depth_mode_fills = depth_nulls - self._raw_wr_stats["depth_team"].isna().sum()
 
+            # the rest of these players are low on the depth chart so let's just fill with the max
+            self._raw_wr_stats["depth_team"] = self._raw_wr_stats["depth_team"].fillna(self._raw_wr_stats.depth_team.max())
 
-        # let's fill the rest with the player average for that season!
-        null_stats = self._raw_wr_stats.isna().sum()/self._raw_wr_stats.shape[0]
-        null_cols = null_stats[null_stats>0].sort_values(ascending=False).index.tolist()
-
-        for c in null_cols:
-            if c not in ['ESPN_projection'] + non_numeric:
-                self._raw_wr_stats[c] = self._raw_wr_stats.groupby(["player_id", "season"])[c].transform(
-                    lambda x: x.fillna(x.mean())
-                )
-
-        # if not, ten the player average for their career!
-        for c in null_cols: 
-            if c != ['ESPN_projection'] + non_numeric:
-                self._raw_wr_stats[c] = self._raw_wr_stats.groupby(["player_id"])[c].transform(
-                    lambda x: x.fillna(x.mean())
-                )
-        
-        # NOTE: This is likely due to the missing 2024 information for players
+        # let's fill the rest with the player average for that season! if not, then the player average for their career!
+        # NOTE: The last (all players) level is likely due to the missing 2024 information for players
         # TODO: We could simulate this data with an LLM?
-        # if not, the average accross all players
-        for c in null_cols:
-            if c != ['ESPN_projection'] + non_numeric:
-                self._raw_wr_stats[c] = self._raw_wr_stats[c].fillna(self._raw_wr_stats[c].mean())
+        numeric_cols = self._raw_wr_stats.select_dtypes(include = 'number').columns
+        null_cols = [c for c in numeric_cols[self._raw_wr_stats[numeric_cols].isna().any()] if c not in ['ESPN_projection'] + non_numeric]
+        self._fill_report = fill_by_group(self._raw_wr_stats, null_cols, levels = [["player_id", "season"], ["player_id"], []])
+        if has_depth:
+            self._fill_report.loc["depth_team", ["player_id_season", "global"]] = [depth_mode_fills, depth_nulls - depth_mode_fills]
+        self._fill_report = self._fill_report.fillna(0).astype(int)
 
         print(f"""
-        I dropped {len(DROP_COLUMNS)} columns from the dataset.
-        I also ...
+        I dropped {len(DROP_COLUMNS)} columns and {college_nulls} rows without college info from the dataset.
+        I filled these nulls per column (depth_team uses the season mode and then the max depth):
         """)
+        print(self._fill_report.to_string())
+
+        self._save_stage('clean_data', outputs)
 
-    def get_top_n(self, n = 40, roll_window = 2, viz = True):
-        """ this function only preserves the top n players on a per week basis. helps us balance the dataset a bit better"""
+    def get_top_n(self, n = None, roll_window = 2, viz = True):
+        """ this function only preserves the top n players on a per week basis. helps us balance the dataset a bit better.
+        n defaults to the top_n of the position spec"""
+        n = n or self._spec['top_n']
+        target = self._spec['target']
         self._top_n = n
         self._roll_window = roll_window
 
         # viz distro
         if viz:
-            viz_distro(df = self._raw_wr_stats, col = 'receiving_fpoints', label = 'post-top-n-filter')
+            viz_distro(df = self._raw_wr_stats, col = target, label = 'post-top-n-filter')
 
-        # sort the df by season, week, and score. Then keep only the top n.
-        wrs = self._raw_wr_stats.sort_values(by = ['season', 'week', 'receiving_fpoints'], ascending = [True, True, False]).copy()
-        wrs = wrs.groupby(['season', 'week']).head(self._top_n)
+        if not self._load_stage('get_top_n', {'n': n, 'roll_window': roll_window}, ['_wr_stats']):
+            # sort the df by season, week, and score. Then keep only the top n.
+            wrs = self._raw_wr_stats.sort_values(by = ['season', 'week', target], ascending = [True, True, False]).copy()
+            wrs = wrs.groupby(['season', 'week']).head(self._top_n)
         
         
-        # since we are doing rolling windows, I need the previous m weeks as well, where m is the length of the rolling window
-        temp = pd.DataFrame(columns = self._raw_wr_stats.columns)
-        for idx, row in wrs.iterrows():
-            if row['week'] == 1:
-                # week 1 has no previous weeks
-                # TODO: How does this affect our model?
-                continue
-            else:
-                week = row['week']
-                # if we don't have enough previous weeks, then the first week we can append to the dataset is week 1
-                if week - roll_window < 1:
-                    final_week = 1
-                else:
-                    final_week = week - roll_window
-                for pweek in range(week-1, final_week-1, -1):
-                    # this check ensures that the week is not already in the dataet
-                    if len(wrs[(wrs['season'] == row['season']) & \
-                        (wrs['week'] == pweek) & \
-                        (wrs['player_id'] == row['player_id'])]) == 0:
-                        # otherwise, append the week from the raw stats onto the dataframe
-                        temp = pd.concat([temp, self._raw_wr_stats[(self._raw_wr_stats['season'] == row['season']) & \
-                            (self._raw_wr_stats['week'] == pweek) & \
-                            (self._raw_wr_stats['player_id'] == row['player_id'])]], 
-                            ignore_index = True)
-
-        # gather new data into a dataframe
-        self._wr_stats = pd.concat([wrs, temp], ignore_index = True).sort_values(by=['season', 'player_id', 'week']).drop_duplicates()
+            # since we are doing rolling windows, I need the previous m weeks as well, where m is the length of the rolling window
+            # we build every (player, season, week - k) key at once, row by row with k = 1..m, so the order matches walking the top n rows
+            key_cols = ['player_id', 'season', 'week']
+            lookback = wrs[key_cols].iloc[np.repeat(np.arange(len(wrs)), roll_window)]
+            lookback = lookback.assign(week = lookback['week'].to_numpy() - np.tile(np.arange(1, roll_window + 1), len(wrs)))
+
+            # week 1 has no previous weeks, and if we don't have enough previous weeks the first week we can append is week 1
+            # TODO: How does this affect our model?
+            lookback = lookback[lookback['week'] >= 1]
+
+            # this check ensures that the week is not already in the dataset
+            lookback = lookback.merge(wrs[key_cols].drop_duplicates(), on = key_cols, how = 'left', indicator = True)
+            lookback = lookback.loc[lookback['_merge'] == 'left_only', key_cols]
+
+            # otherwise, pull the week from the raw stats with a single join
+            temp = lookback.merge(self._raw_wr_stats, on = key_cols, how = 'inner')[self._raw_wr_stats.columns]
+
+            # gather new data into a dataframe
+            self._wr_stats = pd.concat([wrs, temp], ignore_index = True).sort_values(by=['season', 'player_id', 'week']).drop_duplicates()
+            self._save_stage('get_top_n', ['_wr_stats'])
 
         # viz distro
         if viz:
-            viz_distro(df = self._wr_stats, col = 'receiving_fpoints', label = 'post-top-n-filter')
+            viz_distro(df = self._wr_stats, col = target, label = 'post-top-n-filter')
 
     
     def window_data(self):
+        """ averages every lag column over the roll_window games before each week (a full window is required, like the
+        original rolling(roll_window, min_periods=roll_window)). the extra roll_windows and ewm_spans are different on
+        purpose: they come from the full history in _raw_wr_stats rather than the top n cut, so a window longer than
+        roll_window still sees every game, and like rolling(w, min_periods=1) / ewm(span) they average whatever games
+        are available. they are there to pick from, so a short history never drops a row."""
+        if self._load_stage('window_data', {'roll_windows': self._roll_windows, 'ewm_spans': self._ewm_spans}, ['_windowed_data']):
+            return
+
+        lag_columns, target = self._spec['lag_columns'], self._spec['target']
+
         # now we need to get the dataset to be averages of all datapoints aside from fantasy points before the current week.
-        new_dataset = self._wr_stats[non_lag_columns]
+        new_dataset = self._wr_stats[self._spec['non_lag_columns']]
 
         # this will grab the rolling average data for each player
+        key_cols = ['player_id', 'season', 'week', 'game_id']
+        value_cols = [c for c in lag_columns if c not in key_cols]
         rolling_av = self._wr_stats[lag_columns].sort_values(by=['player_id', 'season', 'week'])
-        rolling_av = rolling_av.set_index(['week', 'game_id']).groupby(['player_id', 'season']).rolling(self._roll_window, min_periods=self._roll_window).mean().reset_index().rename({'receiving_fpoints':'past_fpoints'}, axis=1)
+        rolling_av = pd.concat([rolling_av[key_cols],
+                                rolling_features(rolling_av, keys = ['player_id', 'season'], value_cols = value_cols, window = self._roll_window)],
+                               axis = 1).reset_index(drop = True)
+        rolling_av.columns = [c.replace(target, 'past_fpoints') for c in rolling_av.columns]
 
 
         # this ensures that the new_week stat associates a players historical stats with the "current" week
         # NOTE: Those with a NaN new week are players who did not play past that "week"
-        for idx, row in new_dataset.iterrows():
-            week = row.week
-            pid = row.player_id
-            season = row.season
-
-            # grab the most recent stats for that player, not just the previous week (sometimes players miss weeks)
-            temp_week = rolling_av[(rolling_av.season == season) & (rolling_av.player_id == pid) & (rolling_av.week < week)].week.max()
-            index = rolling_av[(rolling_av.season == season) & (rolling_av.player_id == pid) & (rolling_av.week == temp_week)].index
-            rolling_av.loc[index, 'new_week'] = week
+        # grab the most recent stats for that player, not just the previous week (sometimes players miss weeks)
+        rolling_av['new_week'] = align_prior_week(rolling_av, new_dataset, keys = ['player_id', 'season'])
+        main_cols = rolling_av.columns.tolist()
+
+        # the extra windows and ewm's run over every game the player has, every window length comes out of the same sorted pass
+        extra_windows = [w for w in self._roll_windows if w != self._roll_window]
+        if extra_windows or self._ewm_spans:
+            history = self._raw_wr_stats[lag_columns].sort_values(by=['player_id', 'season', 'week'])
+            history = pd.concat([history[['player_id', 'season', 'week']],
+                                 rolling_features(history, keys = ['player_id', 'season'], value_cols = value_cols, window = None,
+                                                  extra_windows = extra_windows, ewm_spans = self._ewm_spans)],
+                                axis = 1).reset_index(drop = True)
+            history.columns = [c.replace(target, 'past_fpoints') for c in history.columns]
+            history['new_week'] = align_prior_week(history, new_dataset, keys = ['player_id', 'season'])
+            history = history.dropna(subset = ['new_week']).drop('week', axis = 1).drop_duplicates(['player_id', 'season', 'new_week'], keep = 'last')
+            rolling_av = rolling_av.merge(history, on = ['player_id', 'season', 'new_week'], how = 'left')
 
         print(f"The length of the dataset pre-windowing is: {len(new_dataset)}")
 
@@ -341,15 +726,23 @@ class PrepData():
                                 right_on=['player_id', 'season', 'new_week'], 
                                 suffixes = ('', '_remove'))
         self._windowed_data.drop([x for x in self._windowed_data.columns if '_remove' in x], axis=1, inplace = True)
-        self._windowed_data.dropna(subset = rolling_av.columns.tolist(), inplace = True)
+        self._windowed_data.dropna(subset = main_cols, inplace = True)
         print(f"The length of the dataset post-windowing is: {len(self._windowed_data)}")
 
-    def add_external_stats(self):
+        self._save_stage('window_data', ['_windowed_data'])
 
-        # add season
-        self._raw_def_points_allowed['season'] = self._raw_def_points_allowed['game_id'].apply(lambda x: int(x[:4]))
-        self._raw_def_injuries['season'] = self._raw_def_injuries['game_id'].apply(lambda x: int(x[:4]))
-        self._raw_qb_stats['season'] = self._raw_qb_stats['game_id'].apply(lambda x: int(x[:4]))
+    def add_external_stats(self):
+        outputs = ['_windowed_data', '_raw_def_points_allowed', '_raw_def_injuries', '_raw_qb_stats']
+        # the rosters are only read when there are no starters from DataCreator
+        dimensions = fingerprint_files(dimension_files(years, rosters = not len(self._raw_qb_starters)))
+        if self._load_stage('add_external_stats', {'years': years, 'dimensions': dimensions}, outputs):
+            return
+
+        # add season from the game dimension
+        games = get_games(years)
+        self._raw_def_points_allowed = attach_games(self._raw_def_points_allowed, games, columns = ['season'])
+        self._raw_def_injuries = attach_games(self._raw_def_injuries, games, columns = ['season'])
+        self._raw_qb_stats = attach_games(self._raw_qb_stats, games, columns = ['season'])
 
         # now we need to merge in average QBR, Average Defensive Rating, and Current Defensive Injuries
         self._raw_def_points_allowed.sort_values(by=['team','season','week'], inplace=True)
@@ -358,19 +751,12 @@ class PrepData():
         # now we get rolling stat windows as we always do
         # NOTE: remember that for each week, this is an average of that week and the week before, so before we merge onto the 
         # training dataset we need to add 1 to the week stat
-        def_points_allowed_2 = self._raw_def_points_allowed.set_index(['game_id', 'week']).groupby(['team', 'season']).rolling(self._roll_window, min_periods=self._roll_window).mean().reset_index()
+        def_points_allowed_2 = self._raw_def_points_allowed.set_index(['game_id', 'week']).groupby(['team', 'season'], observed = True).rolling(self._roll_window, min_periods=self._roll_window).mean().reset_index()
 
         # because we want to correlate the average of all past performances with the current 
         # def_points_allowed_2['week'] = def_points_allowed_2['week'] + 1
-        for _, row in self._raw_def_points_allowed.iterrows():
-            week = row.week
-            team = row.team
-            season = row.season
-
-            # grab the most recent stats for that def, not just the previous week (no bye weeks)
-            temp_week = def_points_allowed_2[(def_points_allowed_2.season == season) & (def_points_allowed_2.team == team) & (def_points_allowed_2.week < week)].week.max()
-            index = def_points_allowed_2[(def_points_allowed_2.season == season) & (def_points_allowed_2.team == team) & (def_points_allowed_2.week == temp_week)].index
-            def_points_allowed_2.loc[index, 'new_week'] = week
+        # grab the most recent stats for that def, not just the previous week (no bye weeks)
+        def_points_allowed_2['new_week'] = align_prior_week(def_points_allowed_2, self._raw_def_points_allowed, keys = ['team', 'season'])
 
         # for QB's we need to do a little extra
         # 1. Similar to the WR stats before, we need to ensure that the current week is associated with the most recently available historical stat. 
@@ -380,39 +766,25 @@ class PrepData():
         #          started last week.
 
         # for every QB, this is their rolling window
-        qb_stats_2 = self._raw_qb_stats.set_index(['game_id', 'week', 'posteam']).groupby(['passer_player_id', 'season']).rolling(self._roll_window, min_periods=self._roll_window).mean().reset_index()
+        qb_stats_2 = self._raw_qb_stats.set_index(['game_id', 'week', 'posteam']).groupby(['passer_player_id', 'season'], observed = True).rolling(self._roll_window, min_periods=self._roll_window).mean().reset_index()
         qb_stats_2.rename({'passer_player_id':'player_id'}, axis=1, inplace=True)
         # for every team/week, this is their starting QB
-        # 1. raw roster data
-        rosters = get_rosters(years = years)
-        # 2. grab QB 1 per week
-        temp = rosters[rosters['depth_position'] == 'QB']
-        qb_1 = temp.loc[temp.groupby(['game_id', 'team'])['depth_team'].idxmin()][['game_id', 'team', 'player_id', 'season', 'week']]
+        # 1. the starters DataCreator picked from the depth charts (and flagged is_new_qb_starter for), when we read them
+        if len(self._raw_qb_starters):
+            qb_1 = self._raw_qb_starters[QB_STARTER_COLUMNS].copy()
+            normalize_teams(qb_1, ['team'])
+        else:
+            # 1a. otherwise from the raw roster data
+            rosters = get_rosters(years)
+            # 2. grab QB 1 per week
+            # 2a. and flag new starters (is_new_qb_starter), needs to be done before window merge
+            qb_1 = qb_starters(rosters[rosters['depth_position'] == 'QB'])[QB_STARTER_COLUMNS]
         # 3. merge onto previous data for that QB from qb_stats_2
         # this ensures that the new_week stat associates a players historical stats with the "current" week
         # NOTE: Those with a NaN new week are players who did not play past that "week"
-        for _, row in qb_1.iterrows():
-            week = row.week
-            pid = row.player_id
-            season = row.season
-
-            # grab the most recent stats for that player, not just the previous week (sometimes players miss weeks)
-            temp_week = qb_stats_2[(qb_stats_2.season == season) & (qb_stats_2.player_id == pid) & (qb_stats_2.week < week)].week.max()
-            index = qb_stats_2[(qb_stats_2.season == season) & (qb_stats_2.player_id == pid) & (qb_stats_2.week == temp_week)].index
-            qb_stats_2.loc[index, 'new_week'] = week
-
-        # 5. loop through starter data, fill is_new_qb, needs to be done before window merge
-        qb_1_temp = qb_1[['season', 'team', 'player_id', 'week']].copy()
-        # this will associate the previous starter with this weeks starter
-        qb_1_temp['week'] = qb_1_temp['week'] + 1
-        # rename so we can compare
-        qb_1_temp = qb_1_temp.rename({'player_id': 'prev_player_id'}, axis = 1)
-        # merge into current starter list
-        qb_1 = qb_1.merge(qb_1_temp, on = ['season', 'team', 'week'], how = 'left')
-        # flag new starters
-        qb_1['is_new_qb_starter'] = qb_1.apply(lambda x: 0 if ((x['player_id'] == x['prev_player_id']) or (x['week'] == 1)) else 1, axis=1)
-        qb_1.drop('prev_player_id', axis=1, inplace = True)
-        
+        # grab the most recent stats for that player, not just the previous week (sometimes players miss weeks)
+        qb_stats_2['new_week'] = align_prior_week(qb_stats_2, qb_1, keys = ['player_id', 'season'])
+
         # TODO: Fill in nulls with ALL historical av for that QB, 
         # if not, fill with season historical average for that team, if not, previous season average, if not, global average
         
@@ -435,7 +807,10 @@ class PrepData():
 
         # merge in with training data
         # FIXME: Fix merge columns, use game_id and team
-        self._windowed_data = self._windowed_data.merge(def_points_allowed_2[['new_week', 'season', 'team', 'total_qb_fpoints_given_up', 'total_wr_fpoints_given_up']], 
+        def_fpoints = self._spec['def_fpoints']
+        # for QB's the position's points allowed are the QB points allowed, the column is only merged once
+        def_columns = list(dict.fromkeys(['new_week', 'season', 'team', 'total_qb_fpoints_given_up', def_fpoints]))
+        self._windowed_data = self._windowed_data.merge(def_points_allowed_2[def_columns], 
                             how = 'left', 
                             left_on=['opp_team', 'week', 'season'],
                             right_on=['team', 'new_week', 'season'], 
@@ -464,73 +839,88 @@ class PrepData():
                        axis=1, inplace=True)
         
 
-        # now if we don't have QB info filled, we have some backup methods: 
-        for idx, row in self._windowed_data.iterrows():
-            if np.isnan(row['hist_qb_td_percentage']):
-                # try filling with global qb average that season
-                season = row['season']
-                week = row['week']
-                pid = row['qb_player_id']
-
-                # season averages (player)
-                temp_qb = self._raw_qb_stats[(self._raw_qb_stats['passer_player_id'] == pid) & (self._raw_qb_stats['season'] == season) & (self._raw_qb_stats['week'] < week)].copy()
-                temp_qb.drop(['passer_player_id', 'season', 'week', 'game_id', 'posteam'], axis=1, inplace = True)
-                
-                if not temp_qb.empty:
-                    if temp_qb.shape[0] > 1:
-                        new_qb_df = temp_qb.mean().to_frame().T
-                    else:
-                        new_qb_df = temp_qb
-                    new_qb_df.rename(qb_rename_map, axis=1, inplace = True)
-
-                    for col in list(qb_rename_map.values())[:-1]:
-                        self._windowed_data.loc[idx, col] = new_qb_df[col].values[0]
-                    continue
-                
-                # global average (player)
-                temp_qb = self._raw_qb_stats[(self._raw_qb_stats['passer_player_id'] == pid) & (self._raw_qb_stats['season'] <= season) & (self._raw_qb_stats['week'] < week)].copy()
-                temp_qb.drop(['passer_player_id', 'season', 'week', 'game_id', 'posteam'], axis=1, inplace = True)
-
-                if not temp_qb.empty:
-                    if temp_qb.shape[0] > 1:
-                        new_qb_df = temp_qb.mean().to_frame().T
-                    else:
-                        new_qb_df = temp_qb
-                    new_qb_df.rename(qb_rename_map, axis=1, inplace = True)
-
-                    for col in list(qb_rename_map.values())[:-1]:
-                        self._windowed_data.loc[idx, col] = new_qb_df[col].values[0]
-                    continue  
-
-                # season average (all players)
-                temp_qb = self._raw_qb_stats[(self._raw_qb_stats['season'] == season) & (self._raw_qb_stats['week'] < week)].copy()
-                temp_qb.drop(['passer_player_id', 'season', 'week', 'game_id', 'posteam'], axis=1, inplace = True)
-
-                if not temp_qb.empty:
-                    if temp_qb.shape[0] > 1:
-                        new_qb_df = temp_qb.mean().to_frame().T
-                    else:
-                        new_qb_df = temp_qb
-                    new_qb_df.rename(qb_rename_map, axis=1, inplace = True)
-                    for col in list(qb_rename_map.values())[:-1]:
-                        self._windowed_data.loc[idx, col] = new_qb_df[col].values[0]
-
-                    continue  
-    
+        # now if we don't have QB info filled, we have some backup methods
+        self._fill_missing_qb_stats(qb_rename_map)
 
         # now we just fill nulls since they are outliers
         self._windowed_data['total_qb_fpoints_given_up'] = self._windowed_data['total_qb_fpoints_given_up'].fillna(self._windowed_data['total_qb_fpoints_given_up'].mean())
-        self._windowed_data['total_wr_fpoints_given_up'] = self._windowed_data['total_wr_fpoints_given_up'].fillna(self._windowed_data['total_wr_fpoints_given_up'].mean())
-        # self._windowed_data['total_te_fpoints_given_up'] = self._windowed_data['total_te_fpoints_given_up'].fillna(self._windowed_data['total_te_fpoints_given_up'].mean())
-        # self._windowed_data['total_rb_fpoints_given_up'] = self._windowed_data['total_rb_fpoints_given_up'].fillna(self._windowed_data['total_rb_fpoints_given_up'].mean())
+        self._windowed_data[def_fpoints] = self._windowed_data[def_fpoints].fillna(self._windowed_data[def_fpoints].mean())
+
+        self._save_stage('add_external_stats', outputs)
+
+    def _fill_missing_qb_stats(self, qb_rename_map):
+        """ rows without a historical QB line get, in order: that QB's average so far this season, that QB's average over
+        every season up to this one (weeks before this week), or the league average so far this season."""
+        stat_cols = [c for c in qb_rename_map if c != 'player_id']
+        hist_cols = [qb_rename_map[c] for c in stat_cols]
+
+        missing = self._windowed_data['hist_qb_td_percentage'].isna().to_numpy()
+        if not missing.any():
+            return
+
+        # lay every QB game out on a dense (qb, season, week) grid. cumulative sums along the week axis then give "so far
+        # this season", and summing those along the season axis gives the career numbers for the same weeks
+        qb_codes, qb_ids = pd.factorize(self._raw_qb_stats['passer_player_id'].astype(object))
+        seasons = np.sort(self._raw_qb_stats['season'].unique())
+        season_codes = np.searchsorted(seasons, self._raw_qb_stats['season'].to_numpy())
+        week_codes = self._raw_qb_stats['week'].to_numpy(dtype=int)
+        n_weeks = week_codes.max() + 1
+        values = self._raw_qb_stats[stat_cols].to_numpy(dtype=float)
+
+        keep = qb_codes >= 0
+        cell = (qb_codes[keep], season_codes[keep], week_codes[keep])
+        shape = (len(qb_ids), len(seasons), n_weeks)
+        games = np.zeros(shape)
+        sums = np.zeros(shape + (len(stat_cols),))
+        counts = np.zeros(shape + (len(stat_cols),))
+        np.add.at(games, cell, 1)
+        np.add.at(sums, cell, np.nan_to_num(values[keep]))
+        np.add.at(counts, cell, ~np.isnan(values[keep]))
+
+        # season to date per QB, career to date per QB and season to date for the league
+        season_to_date = [games.cumsum(axis=2), sums.cumsum(axis=2), counts.cumsum(axis=2)]
+        tiers = [
+            season_to_date,
+            [a.cumsum(axis=1) for a in season_to_date],
+            [a.sum(axis=0) for a in season_to_date],
+        ]
+
+        # locate the missing rows on the grid, "before this week" is everything up to and including last week
+        rows = self._windowed_data.loc[missing]
+        qb_pos = qb_ids.get_indexer(rows['qb_player_id'].astype(object))
+        # the last season on the grid that is not after the row's season
+        season_pos = np.searchsorted(seasons, rows['season'].to_numpy(), side='right') - 1
+        any_season = season_pos >= 0
+        season_pos = season_pos.clip(0)
+        same_season = any_season & (seasons[season_pos] == rows['season'].to_numpy())
+        prior_week = (rows['week'].to_numpy(dtype=int) - 1).clip(0, n_weeks - 1)
+
+        lookups = [
+            ((qb_pos >= 0) & same_season, (qb_pos.clip(0), season_pos, prior_week)),
+            ((qb_pos >= 0) & any_season, (qb_pos.clip(0), season_pos, prior_week)),
+            (same_season, (season_pos, prior_week)),
+        ]
+        filled = np.full((len(rows), len(stat_cols)), np.nan)
+        todo = np.ones(len(rows), dtype=bool)
+        for (valid, cell), (t_games, t_sums, t_counts) in zip(lookups, tiers):
+            use = todo & valid & (t_games[cell] > 0)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                filled[use] = (t_sums[cell] / t_counts[cell])[use]
+            todo &= ~use
+
+        # rows that none of the tiers could fill are left as they were
+        fill_mask = missing.copy()
+        fill_mask[missing] = ~todo
+        self._windowed_data.loc[fill_mask, hist_cols] = filled[~todo]
 
     def split_test_train(self, rand_split = False, test_size = 0.33, random_state = 42, year_split = 2023):
         # train_test_split
+        drop_list, target = self._spec['drop_list'], self._spec['target']
 
 
         if rand_split:
             self.X_train, self.X_test, self.y_train, self.y_test = train_test_split(self._windowed_data.drop(drop_list, axis=1), 
-                                                                                    self._windowed_data['receiving_fpoints'], 
+                                                                                    self._windowed_data[target], 
                                                                                     test_size = test_size, 
                                                                                     random_state = random_state)
         else:
@@ -540,10 +930,11 @@ class PrepData():
             self.X_train = train_df.drop(drop_list, axis=1)
             self.X_test = test_df.drop(drop_list, axis=1)
 
-            self.y_train = train_df["receiving_fpoints"]
-            self.y_test = test_df["receiving_fpoints"]
+            self.y_train = train_df[target]
+            self.y_test = test_df[target]
     
     def scale_data(self):
+        drop_list, non_scale_list = self._spec['drop_list'], self._spec['non_scale_list']
         
         # columns you don't need to scale:
         scale_list = [
@@ -578,6 +969,127 @@ class PrepData():
         X_test_temp = self._test_scaler.fit_transform(X=X_test_2)
         self.X_test_scaled = np.concatenate((X_test_temp, leftover_test), axis=1)
 
+        # the scaler keeps float32 inputs as float32, the leftover columns can still be small ints so we cast the result
+        for name in ['X_train_scaled', 'X_test_scaled']:
+            arr = getattr(self, name)
+            before = arr.size * 8
+            if self._compact:
+                arr = arr.astype(np.float32, copy = False)
+                setattr(self, name, arr)
+            self._memory[name] = [before, arr.nbytes]
+
         
 
 
+
+def _text_array(values):
+    # a column that is all null has no type yet, it is stored as strings
+    array = pa.array(values, from_pandas = True)
+    return array.cast(pa.string()) if pa.types.is_null(array.type) else array
+
+
+def write_shared_frame(df, path):
+    """ writes df as an uncompressed arrow file (one record batch) for read_shared_frame. numeric columns keep their
+    NaN's as values instead of arrow nulls, so they can later be read without a copy. text and categorical columns are
+    dictionary encoded. columns arrow can't hold (mixed types) are returned, they have to be sent along some other way"""
+    arrays, names, leftover = [], [], {}
+    for c, dtype in df.dtypes.items():
+        col = df[c]
+        try:
+            if isinstance(dtype, pd.CategoricalDtype):
+                array = pa.DictionaryArray.from_arrays(pa.array(col.cat.codes.to_numpy(), mask = col.isna().to_numpy()), _text_array(col.cat.categories.to_numpy()))
+            elif pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype):
+                array = pa.array(col.to_numpy(), from_pandas = False)
+            else:
+                array = _text_array(col.to_numpy(dtype = object)).dictionary_encode()
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            leftover[c] = col
+            continue
+        arrays.append(array)
+        names.append(c)
+
+    table = pa.Table.from_arrays(arrays, names)
+    with pa.ipc.new_file(path, table.schema) as writer:
+        writer.write_table(table)
+    return leftover
+
+
+def read_shared_frame(path, categoricals = (), leftover = None):
+    """ memory maps a frame written by write_shared_frame. the numeric columns are numpy views on the mapped file, so
+    every process reading it shares the same pages and nothing is copied until a column is changed (the views are read
+    only, pandas copies them first). dictionary encoded columns come back as categoricals when they are in categoricals
+    (just the small codes array is made), the other ones as plain strings. leftover columns are added at the end"""
+    table = pa.ipc.open_file(pa.memory_map(path)).read_all()
+    columns = {}
+    for name, column in zip(table.column_names, table.columns):
+        array = column.chunk(0) if column.num_chunks == 1 else column.combine_chunks()
+        if pa.types.is_dictionary(array.type):
+            codes = array.indices.fill_null(-1) if array.null_count else array.indices
+            values = pd.Categorical.from_codes(codes.to_numpy(), array.dictionary.to_pandas())
+            columns[name] = values if name in categoricals else np.asarray(values, dtype = object)
+        else:
+            columns[name] = array.to_numpy()
+    df = pd.DataFrame(columns, copy = False)
+
+    for c, values in (leftover or {}).items():
+        df[c] = values.to_numpy()
+    return df
+
+
+def _build_position(position, frames, read_key, prep_kwargs, top_n_kwargs, split_kwargs):
+    """ runs the pipeline for one position in a worker process. frames has, for every raw frame, the arrow file the driver
+    wrote, its columns, which of them are categoricals and the columns that could not go in the file"""
+    prep = PrepData(position = position, **prep_kwargs)
+    for name, shared in frames.items():
+        df = read_shared_frame(shared['path'], shared['categoricals'], shared['leftover'])
+        setattr(prep, name, df[shared['columns']])
+    prep._stage_key = read_key
+
+    prep.clean_data()
+    prep.get_top_n(viz = False, **top_n_kwargs)
+    prep.window_data()
+    prep.add_external_stats()
+    prep.split_test_train(**split_kwargs)
+    prep.scale_data()
+
+    # the driver already has the raw frames, no need to send them back
+    for name in RAW_FRAMES:
+        setattr(prep, name, None)
+    return prep
+
+
+def build_positions(positions = None, workers = None, read_kwargs = None, top_n_kwargs = None, split_kwargs = None, **prep_kwargs):
+    """ builds a PrepData for every position in positions (default: all of POSITION_SPECS) at the same time.
+    the raw tables are read once here and written to arrow files (write_shared_frame) that every worker process memory
+    maps, so the numeric columns are shared between the workers instead of each of them getting a pickled copy. a
+    worker only materializes the rows its position keeps (clean_data subsets them first thing).
+    the *_kwargs go to read_data, get_top_n and split_test_train, anything else to PrepData.
+    returns {position: PrepData}"""
+    positions = positions or list(POSITION_SPECS)
+    read_kwargs = {'positions': positions, **(read_kwargs or {})}
+
+    prep = PrepData(**prep_kwargs)
+    prep.read_data(**read_kwargs)
+    # build any missing roster/game seasons up front, otherwise every worker would race to write them
+    get_rosters(years)
+    get_games(years)
+
+    # NOTE: the workers run without the stage cache, its index file is not safe to write from several processes
+    worker_kwargs = {**prep_kwargs, 'cache': None}
+    # the pool is shut down before the directory goes away, a mapped file can't be removed on windows
+    with tempfile.TemporaryDirectory() as tmp:
+        frames = {}
+        for name in RAW_FRAMES:
+            df = getattr(prep, name)
+            path = os.path.join(tmp, name + '.arrow')
+            frames[name] = {
+                'path': path,
+                'columns': list(df.columns),
+                'categoricals': [c for c, dtype in df.dtypes.items() if isinstance(dtype, pd.CategoricalDtype)],
+                'leftover': write_shared_frame(df, path),
+            }
+
+        with ProcessPoolExecutor(max_workers = workers or min(len(positions), os.cpu_count())) as pool:
+            futures = {position: pool.submit(_build_position, position, frames, prep._stage_key, worker_kwargs, top_n_kwargs or {}, split_kwargs or {})
+                       for position in positions}
+            return {position: future.result() for position, future in futures.items()}
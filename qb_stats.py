@@ -0,0 +1,53 @@
+import numpy as np
+
+# the keys of the qb table (qb_stats), one row per passer and game
+QB_KEYS = ['passer_player_id', 'game_id', 'posteam', 'week']
+
+
+def passer_rating(completion_percentage, yards_per_attempt, td_percentage, interception_percentage):
+    """ the NFL's classic passer rating (what the tables call QBR, ESPN never released the formula for theirs).
+    every component is capped between 0 and 2.375, the sum is scaled to 0 - 158.3. takes and returns whole columns"""
+    terms = np.column_stack([
+        5 * (np.asarray(completion_percentage, dtype = float) - 0.3),
+        0.25 * (np.asarray(yards_per_attempt, dtype = float) - 3),
+        20 * np.asarray(td_percentage, dtype = float),
+        2.375 - 25 * np.asarray(interception_percentage, dtype = float),
+    ])
+    return 100 * np.clip(terms, 0, 2.375).sum(axis = 1) / 6
+
+
+def qb_game_stats(pbp_data):
+    """ the qb table: passing totals, rate stats and passer rating (QBR) per passer and game, plus the snaps the
+    passer was on the field for a down (qb_num_snaps). same columns as qb_stats"""
+    passes = pbp_data[(pbp_data['play_type'] == 'pass').to_numpy()]
+    qb = passes.groupby(QB_KEYS, observed = True).agg(
+        completions = ('complete_pass', 'sum'),
+        attempts = ('complete_pass', 'count'),
+        passing_yards = ('passing_yards', 'sum'),
+        touchdowns = ('touchdown', 'sum'),
+        interceptions = ('interception', 'sum'),
+    ).reset_index()
+
+    qb['completion_percentage'] = qb['completions'] / qb['attempts']
+    qb['yards_per_attempt'] = qb['passing_yards'] / qb['attempts']
+    qb['td_percentage'] = qb['touchdowns'] / qb['attempts']
+    qb['interception_percentage'] = qb['interceptions'] / qb['attempts']
+    qb['QBR'] = passer_rating(qb['completion_percentage'], qb['yards_per_attempt'], qb['td_percentage'], qb['interception_percentage'])
+
+    snaps = pbp_data.groupby(QB_KEYS, observed = True)['down'].count().rename('qb_num_snaps').reset_index()
+    return qb.merge(snaps, on = QB_KEYS)
+
+
+def qb_starters(qbs):
+    """ the starting QB of every team game and whether the starter changed since the week before (is_new_qb_starter).
+    qbs has the QBs on the depth chart (game_id, team, season, week, player_id, depth_team), the starter is the
+    lowest depth, the first one listed on a tie. week 1 is never a change, a week after a bye always is"""
+    starters = qbs.sort_values('depth_team', kind = 'stable').drop_duplicates(subset = ['game_id', 'team'])
+    starters = starters.sort_values(['team', 'season', 'week'], kind = 'stable')
+
+    # the starter of the team's previous row, when that row is the week before in the same season
+    same_team = (starters['team'].to_numpy() == starters['team'].shift().to_numpy()) & (starters['season'].to_numpy() == starters['season'].shift().to_numpy())
+    previous_week = same_team & (starters['week'].to_numpy() == starters['week'].shift().to_numpy() + 1)
+    same_qb = previous_week & (starters['player_id'].to_numpy() == starters['player_id'].shift().to_numpy())
+    starters['is_new_qb_starter'] = (~same_qb & (starters['week'].to_numpy() != 1)).astype(int)
+    return starters.sort_values(['game_id', 'team'], kind = 'stable')
@@ -0,0 +1,92 @@
+import copy
+
+import numpy as np
+import pandas as pd
+
+# fantasy scoring rules. every role (the passer, rusher and receiver of a play) scores the sum of
+# points per unit * play column. yards are points per yard, so 1/25 is a point every 25 passing yards.
+# the base rules are a 4 pt passing td league
+SCORING_RULES = {
+    'ppr': {
+        'pass': {'passing_yards': 1 / 25, 'pass_touchdown': 4, 'is_two_point_conversion': 2, 'interception': -2, 'passer_fumble_lost': -2},
+        'rush': {'rushing_yards': 1 / 10, 'touchdown': 6, 'is_two_point_conversion': 2, 'rusher_fumble_lost': -2},
+        'rec': {'receiving_yards': 1 / 10, 'complete_pass': 1, 'touchdown': 6, 'is_two_point_conversion': 2, 'receiver_fumble_lost': -2},
+    },
+}
+
+# the player column each role is scored for
+ROLE_PLAYERS = {
+    'pass': 'passer_player_id',
+    'rush': 'rusher_player_id',
+    'rec': 'receiver_player_id',
+}
+
+# positions we track fantasy points allowed for
+DEFENSE_POSITIONS = ['QB', 'RB', 'WR', 'TE']
+
+
+def custom_rules(base = 'ppr', overrides = None):
+    """ a rule set that starts from one of SCORING_RULES and changes some of the points, e.g.
+    custom_rules('ppr', {'pass': {'pass_touchdown': 6}}) for a 6 pt passing td league"""
+    rules = copy.deepcopy(SCORING_RULES[base])
+    for role, points in (overrides or {}).items():
+        rules[role].update(points)
+    return rules
+
+
+SCORING_RULES['half_ppr'] = custom_rules('ppr', {'rec': {'complete_pass': 0.5}})
+SCORING_RULES['standard'] = custom_rules('ppr', {'rec': {'complete_pass': 0}})
+
+
+def _get_rules(rules):
+    return SCORING_RULES[rules] if isinstance(rules, str) else rules
+
+
+def score_plays(pbp_data, rules = 'ppr'):
+    """ fantasy points for the passer, rusher and receiver of every play (pass_fpoints, rush_fpoints, rec_fpoints).
+    each role is a single matrix product over its columns. a play with a missing value in one of the scored columns
+    gets NaN for that role, which the sums further down skip"""
+    rules = _get_rules(rules)
+    scores = {}
+    for role, points in rules.items():
+        values = pbp_data[list(points)].to_numpy(dtype = float)
+        scores[f'{role}_fpoints'] = values @ np.array(list(points.values()), dtype = float)
+    return pd.DataFrame(scores, index = pbp_data.index)
+
+
+def _role_scores(pbp_data, rules, keys):
+    """ the play scores stacked into one long frame: keys, role, player_id and fpoints, one row per play and role with a player"""
+    scores = score_plays(pbp_data, rules)
+    frames = []
+    for role, player_col in ROLE_PLAYERS.items():
+        has_player = pbp_data[player_col].notna().to_numpy()
+        frame = pbp_data.loc[has_player, keys].copy()
+        frame['role'] = role
+        frame['player_id'] = pbp_data.loc[has_player, player_col].to_numpy()
+        frame['fpoints'] = scores.loc[has_player, f'{role}_fpoints'].to_numpy()
+        frames.append(frame)
+    return pd.concat(frames, ignore_index = True)
+
+
+def player_game_fpoints(pbp_data, rules = 'ppr'):
+    """ passing, rushing and receiving fantasy points (and the total) per player and game"""
+    long = _role_scores(pbp_data, rules, keys = ['game_id'])
+    games = long.groupby(['player_id', 'game_id', 'role'])['fpoints'].sum().unstack('role', fill_value = 0)
+    games = games.reindex(columns = list(ROLE_PLAYERS), fill_value = 0).add_suffix('_fpoints')
+    games['total_fpoints'] = games.sum(axis = 1)
+    return games.reset_index().rename_axis(columns = None)
+
+
+def defense_fpoints_allowed(pbp_data, positions, rules = 'ppr'):
+    """ fantasy points each defense gave up to every position in DEFENSE_POSITIONS per game (total_qb_fpoints_given_up, ...).
+    positions maps (player_id, game_id) to the position the player was rostered at. a defense that faced no
+    plays by a position that game gets NaN for it."""
+    long = _role_scores(pbp_data, rules, keys = ['game_id', 'defteam', 'week'])
+    lookup = positions[['player_id', 'game_id', 'position']].drop_duplicates(subset = ['player_id', 'game_id'])
+    long = long.merge(lookup, on = ['player_id', 'game_id'], how = 'inner')
+    long = long[long['position'].isin(DEFENSE_POSITIONS)]
+
+    allowed = long.groupby(['game_id', 'defteam', 'week', 'position'], observed = True)['fpoints'].sum().unstack('position')
+    allowed = allowed.reindex(columns = DEFENSE_POSITIONS)
+    allowed.columns = [f'total_{p.lower()}_fpoints_given_up' for p in DEFENSE_POSITIONS]
+    return allowed.reset_index()
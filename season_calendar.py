@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+
+# the columns of the game dimension, everything we need to know about a game without touching the play-by-play data
+GAME_COLUMNS = ['game_id', 'season', 'week', 'game_type', 'home_team', 'away_team']
+
+
+def current_season(today = None):
+    """ the season that is still being played, it starts in september and runs into the next calendar year"""
+    today = today or pd.Timestamp.today()
+    return today.year if today.month >= 9 else today.year - 1
+
+
+def build_games(schedules):
+    """ the game dimension built from nfl.import_schedules, one row per game with integer season and week.
+    the row number of a game is its integer key, see game_keys"""
+    games = schedules[GAME_COLUMNS].drop_duplicates(subset = 'game_id')
+    games = games.astype({'season': int, 'week': int})
+    return games.sort_values(['season', 'week', 'game_id']).reset_index(drop = True)
+
+
+def season_weeks(games):
+    """ the last regular season week of every season, indexed by season. this is 17 up to 2020 and 18 after the
+    extra game was added in 2021, but we read it from the schedule so we never have to update it"""
+    return games[games['game_type'] == 'REG'].groupby('season')['week'].max()
+
+
+def team_games(games):
+    """ one row per team and game with the opponent and a home flag. this is what we use to put a game id on
+    anything keyed by team/season/week"""
+    home = games.rename({'home_team': 'team', 'away_team': 'opp_team'}, axis = 1).assign(is_home = 1)
+    away = games.rename({'away_team': 'team', 'home_team': 'opp_team'}, axis = 1).assign(is_home = 0)
+    return pd.concat([home, away], ignore_index = True)
+
+
+def game_keys(df, games):
+    """ the integer key (row in games) of every game id in df, -1 when the game is not on the schedule.
+    the game ids are hashed once here, after that every lookup is an array index"""
+    return pd.Index(games['game_id']).get_indexer(df['game_id'])
+
+
+def attach_games(df, games, columns = ('season', 'week', 'game_type', 'home_team', 'away_team'), keys = None):
+    """ adds columns of the game dimension to df through the integer game keys. games that are not on the schedule
+    get NaN. pass keys when you already have them to skip the lookup"""
+    keys = game_keys(df, games) if keys is None else keys
+    found = keys >= 0
+    attached = {}
+    for c in columns:
+        values = games[c].to_numpy()[np.where(found, keys, 0)]
+        attached[c] = values if found.all() else pd.Series(values, index = df.index).where(found)
+    return df.assign(**attached)
+
+
+def is_regular_season(df, games, keys = None):
+    """ boolean mask of the rows of df that belong to a regular season game"""
+    keys = game_keys(df, games) if keys is None else keys
+    regular = (games['game_type'] == 'REG').to_numpy()
+    return (keys >= 0) & regular[np.where(keys >= 0, keys, 0)]
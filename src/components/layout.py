@@ -4,7 +4,7 @@ import pandas as pd
 from . import receiving_leaders, team_dropdown, position_dropdown
 
 
-def create_layout(app: Dash, data:pd.DataFrame) -> html.Div:
+def create_layout(app: Dash, data:pd.DataFrame, database:str = None) -> html.Div:
     return html.Div(
         className="app-div",
         children=[
@@ -21,34 +21,11 @@ def create_layout(app: Dash, data:pd.DataFrame) -> html.Div:
                 ]
             ),
             page_container,
-            # html.Hr(),
-            # html.Div(
-            #     className="dropdown-container",
-            #     children=[
-            #         team_dropdown.render(app, data),
-            #         position_dropdown.render(app, data),
-            #     ],
-            # ),
-            # receiving_leaders.render(app, data),
+            home_layout(app, data, database),
         ]
     )
-    # return html.Div(
-    #     className="app-div",
-    #     children=[
-    #         html.H1(app.title),
-    #         html.Hr(),
-    #         html.Div(
-    #             className="dropdown-container",
-    #             children=[
-    #                 team_dropdown.render(app, data),
-    #                 position_dropdown.render(app, data),
-    #             ],
-    #         ),
-    #         receiving_leaders.render(app, data),
-    #     ],
-    # )
 
-def home_layout(app: Dash, data:pd.DataFrame) -> html.Div:
+def home_layout(app: Dash, data:pd.DataFrame, database:str = None) -> html.Div:
      return html.Div(
         className="app-div",
         children=[html.Hr(),
@@ -59,7 +36,7 @@ def home_layout(app: Dash, data:pd.DataFrame) -> html.Div:
                     position_dropdown.render(app, data),
                 ],
             ),
-            receiving_leaders.render(app, data)
+            receiving_leaders.render(app, data, database)
         ])
 
 
@@ -1,11 +1,14 @@
 import pandas as pd
 
+from database import aggregate
+
 # check out https://www.youtube.com/watch?v=L_KlPZ5qBOU for pipelining and creating the dataset when the app is spun up
 
 class DataSchema:
     PLAYER_ID = 'player_id'
     GAME_ID = 'game_id'
     WEEK = 'week'
+    SEASON = 'season'
     POSITION = 'position'
     PLAYER_NAME = 'player_name'
     TEAM = 'team'
@@ -91,6 +94,27 @@ class DataSchema:
 
 
 def load_fantasy_data(path:str) -> pd.DataFrame:
-    # load the xlsx file
+    # load the xlsx file. for the database (database.py) the dropdowns only need the distinct teams, positions and
+    # seasons, the charts query their own rows
+    if path.endswith(".db"):
+        return aggregate("receiving", {}, by=[DataSchema.TEAM, DataSchema.POSITION, DataSchema.SEASON], path=path)
     data = pd.read_excel(path)
-    return data
\ No newline at end of file
+    return data
+
+
+def load_receiving_leaders(path:str, teams:list[str], positions:list[str], n:int = 20) -> pd.DataFrame:
+    # the top n receivers of the selected teams and positions, summed up in the database
+    return aggregate(
+        "receiving",
+        {
+            "receiving_yards": DataSchema.RECEIVING_YARDS,
+            "receptions": DataSchema.RECEPTIONS,
+            "targets": DataSchema.TOTAL_TARGETS,
+        },
+        by=[DataSchema.PLAYER_ID, DataSchema.PLAYER_NAME, DataSchema.TEAM],
+        teams=teams,
+        positions=positions,
+        order_by="receiving_yards",
+        limit=n,
+        path=path,
+    )
\ No newline at end of file
@@ -0,0 +1,155 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+
+import pandas as pd
+
+from season_calendar import current_season
+
+CACHE_PATH = './data/cache/'
+RAW_PATH = './data/raw/'
+
+
+def fingerprint_files(paths):
+    """ a cheap fingerprint of input files. if the path, size or modification time changes, so does everything downstream"""
+    return [[p, os.path.getsize(p), os.path.getmtime(p)] for p in sorted(paths)]
+
+
+def frame_fingerprint(frames):
+    """ a fingerprint of the contents of {name: DataFrame}, for inputs that did not come from fingerprinted files"""
+    digest = hashlib.sha256()
+    for name in sorted(frames):
+        df = frames[name]
+        digest.update(json.dumps([name, [str(c) for c in df.columns], [str(t) for t in df.dtypes]]).encode())
+        digest.update(pd.util.hash_pandas_object(df, index = False).to_numpy().tobytes())
+    return digest.hexdigest()[:24]
+
+
+def stage_key(*parts):
+    """ hashes anything json-able (upstream key, stage name, parameters, fingerprints) into a cache key"""
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()[:24]
+
+
+class StageCache():
+    """ stores the DataFrames a pipeline stage produced on disk (one parquet file per frame) under a content key.
+    the total size is bounded, when it grows past max_bytes the least recently used entries are evicted."""
+
+    def __init__(self, path = CACHE_PATH, max_bytes = 2 * 1024**3):
+        self._path = path
+        self._max_bytes = max_bytes
+        self._index_path = os.path.join(path, 'index.json')
+
+        os.makedirs(path, exist_ok = True)
+        if os.path.exists(self._index_path):
+            with open(self._index_path) as f:
+                self._index = json.load(f)
+        else:
+            self._index = {}
+
+    def get(self, key):
+        """ returns {frame name: DataFrame} for key, or None if the stage has not been cached"""
+        entry = self._index.get(key)
+        if entry is None:
+            return None
+
+        try:
+            frames = {name: pd.read_parquet(os.path.join(self._path, key, name + '.parquet')) for name in entry['frames']}
+        except (OSError, ValueError):
+            # someone removed or corrupted the files underneath us, treat it as a miss
+            self.invalidate(key = key)
+            return None
+
+        entry['last_used'] = time.time()
+        self._write_index()
+        return frames
+
+    def put(self, key, frames, stage = None):
+        """ stores {frame name: DataFrame} under key and evicts old entries if we are over budget"""
+        entry_path = os.path.join(self._path, key)
+        os.makedirs(entry_path, exist_ok = True)
+
+        size = 0
+        for name, df in frames.items():
+            file_path = os.path.join(entry_path, name + '.parquet')
+            df.to_parquet(file_path)
+            size += os.path.getsize(file_path)
+
+        self._index[key] = {'stage': stage, 'frames': list(frames), 'bytes': size, 'last_used': time.time()}
+        self._evict(keep = key)
+        self._write_index()
+
+    def invalidate(self, key = None, stage = None):
+        """ drops a single entry, every entry of a stage, or the whole cache when called without arguments"""
+        if key is not None:
+            keys = [key] if key in self._index else []
+        elif stage is not None:
+            keys = [k for k, v in self._index.items() if v['stage'] == stage]
+        else:
+            keys = list(self._index)
+
+        for k in keys:
+            shutil.rmtree(os.path.join(self._path, k), ignore_errors = True)
+            del self._index[k]
+        self._write_index()
+
+    def size(self):
+        return sum(v['bytes'] for v in self._index.values())
+
+    def _evict(self, keep = None):
+        # least recently used first, but never the entry we just wrote
+        for k in sorted(self._index, key = lambda k: self._index[k]['last_used']):
+            if self.size() <= self._max_bytes:
+                break
+            if k != keep:
+                shutil.rmtree(os.path.join(self._path, k), ignore_errors = True)
+                del self._index[k]
+
+    def _write_index(self):
+        with open(self._index_path, 'w') as f:
+            json.dump(self._index, f)
+
+
+class DatasetCache():
+    """ the raw downloads (nfl_data_py importers) on disk, one file per dataset and season. finished seasons never
+    change, so they are downloaded once. the live season (and datasets without a season) are downloaded again when
+    their file is older than ttl seconds. offline = True never touches the network and serves everything from
+    mirror, a directory with the same layout (by default the cache itself)"""
+
+    def __init__(self, path = RAW_PATH, ttl = 24 * 3600, offline = False, mirror = None, live_season = None):
+        self._path = path
+        self._ttl = ttl
+        self.offline = offline
+        self._mirror = mirror or path
+        self._live_season = current_season() if live_season is None else live_season
+
+    def file_path(self, dataset, season = None):
+        root = self._mirror if self.offline else self._path
+        return os.path.join(root, dataset, f"{'all' if season is None else season}.pkl")
+
+    def is_fresh(self, path, season = None):
+        """ whether the file at path can be used as is. offline anything we have is good enough"""
+        if not os.path.exists(path):
+            return False
+        if self.offline:
+            return True
+        live = season is None or season >= self._live_season
+        return not live or time.time() - os.path.getmtime(path) <= self._ttl
+
+    def get(self, dataset, fetch, season = None):
+        """ the dataset for one season, fetch([season]) or fetch(None) when it has no seasons. only downloads when
+        the file is missing or stale"""
+        file_path = self.file_path(dataset, season)
+        if self.is_fresh(file_path, season):
+            return pd.read_pickle(file_path)
+        if self.offline:
+            raise FileNotFoundError(f"{dataset} ({season or 'all seasons'}) is not in the offline mirror {self._mirror}")
+
+        df = fetch(None if season is None else [season])
+        # raw frames can hold mixed type object columns parquet won't take, so these are pickles.
+        # written to a temporary file first so a crash never leaves half a file behind
+        os.makedirs(os.path.dirname(file_path), exist_ok = True)
+        df.to_pickle(file_path + '.tmp')
+        os.replace(file_path + '.tmp', file_path)
+        return df
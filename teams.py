@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+
+# every franchise gets a team id that never changes, even when the club code does. new teams are appended, never
+# inserted, so the ids (and the categorical codes below) stay stable
+TEAM_IDS = {
+    'ARI': 1, 'ATL': 2, 'BAL': 3, 'BUF': 4, 'CAR': 5, 'CHI': 6, 'CIN': 7, 'CLE': 8,
+    'DAL': 9, 'DEN': 10, 'DET': 11, 'GB': 12, 'HOU': 13, 'IND': 14, 'JAX': 15, 'KC': 16,
+    'LAC': 17, 'LAR': 18, 'LV': 19, 'MIA': 20, 'MIN': 21, 'NE': 22, 'NO': 23, 'NYG': 24,
+    'NYJ': 25, 'PHI': 26, 'PIT': 27, 'SEA': 28, 'SF': 29, 'TB': 30, 'TEN': 31, 'WAS': 32,
+}
+
+# every other code we have seen for a team, relocated franchises (OAK, SD, STL, ...) and provider specific spellings
+# (pfr, espn, ...). none of them has ever meant two different teams, so the mapping doesn't depend on the season
+TEAM_ALIASES = {
+    'OAK': 'LV',
+    'SD': 'LAC',
+    'SDC': 'LAC',
+    'STL': 'LAR',
+    'SL': 'LAR',
+    'LA': 'LAR',
+    'RAM': 'LAR',
+    'LVR': 'LV',
+    'KCC': 'KC',
+    'NOS': 'NO',
+    'TBB': 'TB',
+    'SFO': 'SF',
+    'NEP': 'NE',
+    'GBP': 'GB',
+    'JAC': 'JAX',
+    'BLT': 'BAL',
+    'HST': 'HOU',
+    'CLV': 'CLE',
+    'ARZ': 'ARI',
+    'WSH': 'WAS',
+}
+
+# the one categorical every team column is stored as, the code of a team is its team id - 1
+TEAM_DTYPE = pd.CategoricalDtype(sorted(TEAM_IDS, key = TEAM_IDS.get))
+
+# alias -> team, including the teams themselves
+_CANONICAL = {**{t: t for t in TEAM_IDS}, **TEAM_ALIASES}
+
+
+def team_dimension():
+    """ the team dimension, one row per code a team has gone by"""
+    rows = [{'team_id': i, 'team': t, 'code': t} for t, i in TEAM_IDS.items()]
+    rows += [{'team_id': TEAM_IDS[t], 'team': t, 'code': a} for a, t in TEAM_ALIASES.items()]
+    return pd.DataFrame(rows).astype({'team': TEAM_DTYPE})
+
+
+def normalize_team_column(values):
+    """ maps a column of club codes to our codes. only the distinct values are looked up, the rows are then a
+    single take. returns a TEAM_DTYPE categorical, or None when the column holds anything that is not a club code"""
+    codes, uniques = pd.factorize(values)
+    canonical = [_CANONICAL.get(u) for u in uniques]
+    if any(c is None for c in canonical):
+        return None
+    team_codes = np.append(TEAM_DTYPE.categories.get_indexer(canonical), -1)
+    # factorize marks nulls with -1, which picks the -1 we appended
+    return pd.Series(pd.Categorical.from_codes(team_codes[codes], dtype = TEAM_DTYPE), index = values.index)
+
+
+def normalize_teams(df, columns = None):
+    """ converts the team columns of df to TEAM_DTYPE in place. by default that is every text column with 'team' in
+    its name, columns that turn out not to hold club codes (posteam_type, ...) are left alone.
+    when columns are given, aliases are still mapped in columns that also hold other values (free agents, ...)
+    but those stay strings. returns the columns that were converted"""
+    explicit = columns is not None
+    if not explicit:
+        columns = [c for c in df.columns if 'team' in c and (df[c].dtype == object or isinstance(df[c].dtype, pd.CategoricalDtype))]
+
+    converted = []
+    for c in columns:
+        normalized = normalize_team_column(df[c])
+        if normalized is not None:
+            df[c] = normalized
+            converted.append(c)
+        elif explicit:
+            df[c] = df[c].replace(_CANONICAL)
+    return converted
+
+
+def team_ids(values):
+    """ the integer team id of every row of a TEAM_DTYPE column, 0 for missing teams"""
+    return values.cat.codes.to_numpy() + 1
@@ -0,0 +1,35 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# the modules live at the top of the repo, not in a package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def wr_stats():
+    """ a small synthetic receiving table (what PrepData.read_data leaves in _raw_wr_stats): a few seasons of players
+    who miss random weeks, with random stats in every lag column"""
+    from prepare_data import lag_columns, non_lag_columns
+
+    rng = np.random.default_rng(7)
+    teams = ['KC', 'BUF', 'SF', 'DAL']
+    rows = []
+    for season in range(2020, 2023):
+        for week in range(1, 18):
+            for p in range(60):
+                # every player sits out about a fifth of the weeks
+                if rng.random() < 0.2:
+                    continue
+                team = teams[p % len(teams)]
+                rows.append({'player_id': f'00-{p:07d}', 'season': season, 'week': week, 'team': team,
+                             'game_id': f'{season}_{week:02d}_{team}', 'position': 'WR'})
+    df = pd.DataFrame(rows)
+
+    stats = [c for c in dict.fromkeys(lag_columns + non_lag_columns) if c not in df.columns]
+    df[stats] = rng.gamma(2, 3, size = (len(df), len(stats))).round(2)
+    df['opp_team'] = df['team'].map(dict(zip(teams, teams[::-1])))
+    return df
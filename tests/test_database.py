@@ -0,0 +1,77 @@
+import pandas as pd
+import pytest
+
+from database import _where, aggregate, connect, load_frames, load_table, player_games, read_rows, table_columns
+
+
+@pytest.fixture
+def db(tmp_path):
+    path = str(tmp_path / 'fantasy.db')
+    receiving = pd.DataFrame({
+        'game_id': ['2022_01_BUF_LA', '2022_01_BUF_LA', '2023_02_KC_JAX', '2023_02_KC_JAX'],
+        'player_id': ['00-1', '00-2', '00-1', '00-3'],
+        'week': [1, 1, 2, 2],
+        'team': ['BUF', 'LA', 'BUF', 'KC'],
+        'position': ['WR', 'TE', 'WR', 'WR'],
+        'player_name': ['S.Diggs', 'T.Higbee', 'S.Diggs', 'R.Rice'],
+        'receiving_yards': [122.0, 34.0, 41.0, 55.0],
+    })
+    load_frames({'receiving': receiving}, path = path)
+    return path
+
+
+def test_season_comes_from_the_game_id(db):
+    rows = read_rows('receiving', columns = ['game_id', 'season'], path = db)
+    assert dict(zip(rows['game_id'], rows['season'])) == {'2022_01_BUF_LA': 2022, '2023_02_KC_JAX': 2023}
+    assert read_rows('receiving', seasons = [2023], path = db)['player_id'].tolist() == ['00-1', '00-3']
+
+
+def test_upserting_twice_updates_in_place(db):
+    changed = pd.DataFrame({
+        'game_id': ['2022_01_BUF_LA', '2024_03_KC_ATL'],
+        'player_id': ['00-1', '00-3'],
+        'week': [1, 3],
+        'team': ['BUF', 'KC'],
+        'position': ['WR', 'WR'],
+        'receiving_yards': [127.0, 80.0],
+        # a column the table doesn't have yet is added
+        'receptions': [8, 6],
+    })
+    con = connect(db)
+    try:
+        load_table(con, 'receiving', changed)
+        load_table(con, 'receiving', changed)
+    finally:
+        con.close()
+
+    rows = read_rows('receiving', path = db).set_index(['game_id', 'player_id'])
+    # the corrected row replaced the old one, the new game was added once, nothing else moved
+    assert len(rows) == 5
+    assert rows.loc[('2022_01_BUF_LA', '00-1'), ['receiving_yards', 'receptions']].tolist() == [127.0, 8]
+    assert rows.loc[('2024_03_KC_ATL', '00-3'), 'season'] == 2024
+    assert rows.loc[('2023_02_KC_JAX', '00-1'), 'receiving_yards'] == 41.0
+    assert pd.isna(rows.loc[('2022_01_BUF_LA', '00-2'), 'receptions'])
+    assert 'receptions' in table_columns('receiving', path = db)
+
+
+def test_filters(db):
+    assert player_games('00-1', path = db)['game_id'].tolist() == ['2022_01_BUF_LA', '2023_02_KC_JAX']
+    leaders = aggregate('receiving', {'yards': 'receiving_yards'}, by = ['player_id'], positions = ['WR'], order_by = 'yards', path = db)
+    assert leaders.values.tolist() == [['00-1', 163.0], ['00-3', 55.0]]
+    # without sums we get the distinct groups
+    distinct = aggregate('receiving', {}, by = ['team', 'season'], path = db)
+    assert sorted(map(tuple, distinct.values.tolist())) == [('BUF', 2022), ('BUF', 2023), ('KC', 2023), ('LA', 2022)]
+
+
+def test_where_rejects_unknown_filters():
+    # games have no team column to filter on
+    with pytest.raises(ValueError):
+        _where('games', teams = ['KC'])
+    where, params = _where('receiving', seasons = [2023], teams = ['KC', 'BUF'])
+    assert where == ' WHERE "season" IN (?) AND "team" IN (?, ?)'
+    assert params == [2023, 'KC', 'BUF']
+
+
+def test_unknown_columns(db):
+    with pytest.raises(KeyError):
+        read_rows('receiving', columns = ['receiving_yards', 'nope'], path = db)
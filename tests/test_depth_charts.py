@@ -0,0 +1,67 @@
+import pandas as pd
+import pytest
+
+from depth_charts import build_depth_index, injured_starters
+from players import build_player_index
+
+
+@pytest.fixture
+def players():
+    return build_player_index(pd.DataFrame({'gsis_id': ['00-a', '00-b', '00-c', '00-d', '00-e'], 'name': list('abcde')}), path = None)
+
+
+@pytest.fixture
+def depth_index(players):
+    columns = ['team', 'season', 'week', 'formation', 'position', 'depth_position', 'gsis_id', 'depth_team', 'game_type']
+    charts = pd.DataFrame([
+        ['KC', 2023, 1, 'Offense', 'WR', 'WR', '00-a', '1', 'REG'],
+        ['KC', 2023, 1, 'Offense', 'WR', 'WR', '00-b', '2', 'REG'],
+        # listed twice, the best depth counts
+        ['KC', 2023, 1, 'Offense', 'WR', 'WR', '00-a', '3', 'REG'],
+        # listed away from their own position, doesn't count
+        ['KC', 2023, 1, 'Offense', 'TE', 'WR', '00-b', '1', 'REG'],
+        ['KC', 2023, 1, 'Defense', 'CB', 'CB', '00-c', '1', 'REG'],
+        # the starters swap in week 3, there is no chart for weeks 2 and 4
+        ['KC', 2023, 3, 'Offense', 'WR', 'WR', '00-b', '1', 'REG'],
+        ['KC', 2023, 3, 'Offense', 'WR', 'WR', '00-a', '2', 'REG'],
+        # BUF only has a chart from the season before
+        ['BUF', 2022, 17, 'Offense', 'WR', 'WR', '00-e', '1', 'REG'],
+        ['KC', 2023, 19, 'Offense', 'WR', 'WR', '00-d', '1', 'POST'],
+    ], columns = columns)
+    return build_depth_index(charts, players)
+
+
+def test_depth_index(depth_index):
+    kc = depth_index[(depth_index['team'] == 'KC') & (depth_index['formation'] == 'Offense')]
+    assert kc[['week', 'gsis_id', 'depth_team', 'rank']].values.tolist() == [[1, '00-a', 1, 1], [1, '00-b', 2, 2], [3, '00-b', 1, 1], [3, '00-a', 2, 2]]
+    # only regular season charts
+    assert '00-d' not in depth_index['gsis_id'].tolist()
+
+
+def test_injured_starters_use_the_latest_chart(depth_index, players):
+    columns = ['team', 'season', 'week', 'gsis_id', 'report_status', 'game_type']
+    injuries = pd.DataFrame([
+        # week 2 has no chart, week 1's has a and c starting
+        ['KC', 2023, 2, '00-a', 'Out', 'REG'],
+        ['KC', 2023, 2, '00-a', 'Out', 'REG'],
+        ['KC', 2023, 2, '00-c', 'Out', 'REG'],
+        ['KC', 2023, 2, '00-b', 'Questionable', 'REG'],
+        # week 4 uses week 3's chart, where b starts and a doesn't
+        ['KC', 2023, 4, '00-a', 'Out', 'REG'],
+        ['KC', 2023, 4, '00-b', 'Out', 'REG'],
+        # last season's chart doesn't carry over
+        ['BUF', 2023, 1, '00-e', 'Out', 'REG'],
+        # a player the index doesn't know
+        ['KC', 2023, 3, '00-z', 'Out', 'REG'],
+    ], columns = columns)
+    team_games = pd.DataFrame({
+        'game_id': ['g1', 'g2', 'g3', 'g4', 'g5'],
+        'team': ['KC', 'KC', 'KC', 'KC', 'BUF'],
+        'season': 2023,
+        'week': [1, 2, 3, 4, 1],
+    })
+
+    out = injured_starters(injuries, depth_index, players, team_games)
+    assert out['game_id'].tolist() == team_games['game_id'].tolist()
+    assert out['num_injured_offense_starters'].tolist() == [0, 1, 0, 1, 0]
+    assert out['num_injured_starters'].tolist() == [0, 1, 0, 0, 0]
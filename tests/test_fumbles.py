@@ -0,0 +1,99 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip('nfl_data_py')
+
+from data_ingestion_pipeline import fumble_lost_flags, fumble_player_columns
+
+
+def fumble_rule(row, player_col):
+    """ the row by row rule fumble_lost_flags replaced (DataCreator.__get_fumbles), kept here as the reference"""
+    rpid = row[player_col]
+    fpid1 = '' if row['fumbled_1_player_id'] is None else row['fumbled_1_player_id']
+    fpid2 = '' if row['fumbled_2_player_id'] is None else row['fumbled_2_player_id']
+    fteam1 = '' if row['fumbled_1_team'] is None else row['fumbled_1_team']
+    fteam2 = '' if row['fumbled_2_team'] is None else row['fumbled_2_team']
+    offense = row['posteam']
+
+    if row['fumble_lost'] == 1 and (fpid1 == rpid or fpid2 == rpid):
+        if (fpid1 == rpid and fpid2 != rpid) and (fteam1 == offense and fteam2 == offense):
+            return 0
+        return 1
+    return 0
+
+
+@pytest.fixture
+def plays():
+    """ random plays where the fumblers are drawn from the players on the play, so every branch of the rule comes up.
+    ids and teams go missing as both None and NaN, like they do in the play by play data"""
+    rng = np.random.default_rng(11)
+    size = 5000
+    players = np.array(['00-1', '00-2', '00-3', '00-4', None, np.nan], dtype = object)
+    teams = np.array(['KC', 'BUF', None, np.nan], dtype = object)
+    return pd.DataFrame({
+        'posteam': rng.choice(teams[:3], size),
+        'receiver_player_id': rng.choice(players, size),
+        'rusher_player_id': rng.choice(players, size),
+        'passer_player_id': rng.choice(players, size),
+        'fumbled_1_player_id': rng.choice(players, size),
+        'fumbled_2_player_id': rng.choice(players, size),
+        'fumbled_1_team': rng.choice(teams, size, p = [0.6, 0.2, 0.1, 0.1]),
+        'fumbled_2_team': rng.choice(teams, size, p = [0.6, 0.2, 0.1, 0.1]),
+        'fumble_lost': rng.choice([0, 1], size, p = [0.3, 0.7]),
+    })
+
+
+def test_fumble_lost_flags_match_row_rule(plays):
+    flags = fumble_lost_flags(plays)
+    for flag, player_col in fumble_player_columns.items():
+        expected = plays.apply(fumble_rule, axis = 1, player_col = player_col)
+        assert flags[flag].tolist() == expected.tolist(), flag
+        # the fixture has to actually exercise the flag
+        assert 0 < flags[flag].sum() < len(plays)
+
+
+def test_teammate_recovery_is_not_a_lost_fumble():
+    # the receiver fumbled, a teammate recovered and then lost it
+    play = pd.DataFrame({
+        'posteam': ['KC'], 'receiver_player_id': ['00-1'], 'rusher_player_id': [None], 'passer_player_id': ['00-9'],
+        'fumbled_1_player_id': ['00-1'], 'fumbled_2_player_id': ['00-2'],
+        'fumbled_1_team': ['KC'], 'fumbled_2_team': ['KC'], 'fumble_lost': [1],
+    })
+    assert fumble_lost_flags(play).iloc[0].tolist() == [0, 0, 0]
+    # the teammate is charged with it
+    assert fumble_lost_flags(play.assign(receiver_player_id = '00-2')).iloc[0].tolist() == [1, 0, 0]
+
+
+def play(**columns):
+    """ one play where the KC receiver 00-1 fumbled and lost it, columns override that"""
+    row = {
+        'posteam': 'KC', 'receiver_player_id': '00-1', 'rusher_player_id': None, 'passer_player_id': '00-9',
+        'fumbled_1_player_id': '00-1', 'fumbled_2_player_id': None,
+        'fumbled_1_team': 'KC', 'fumbled_2_team': None, 'fumble_lost': 1,
+    }
+    row.update(columns)
+    return pd.DataFrame({k: [v] for k, v in row.items()})
+
+
+@pytest.mark.parametrize('columns, expected', [
+    # the plain lost fumble
+    ({}, [1, 0, 0]),
+    # two fumbles: the defender who recovered it fumbled it back, the receiver still lost it
+    ({'fumbled_2_player_id': '00-7', 'fumbled_2_team': 'BUF'}, [1, 0, 0]),
+    # two fumbles by the passer, the second one lost
+    ({'receiver_player_id': None, 'fumbled_1_player_id': '00-9', 'fumbled_2_player_id': '00-9', 'fumbled_2_team': 'KC'}, [0, 0, 1]),
+    # the receiver fumbled, the passer recovered and lost it
+    ({'fumbled_2_player_id': '00-9', 'fumbled_2_team': 'KC'}, [0, 0, 1]),
+    # recovered by the same team: not lost at all
+    ({'fumble_lost': 0}, [0, 0, 0]),
+    ({'fumble_lost': 0, 'fumbled_2_player_id': '00-2', 'fumbled_2_team': 'KC'}, [0, 0, 0]),
+    # the fumbler is missing, nobody on the play is charged, not even a missing receiver
+    ({'fumbled_1_player_id': None}, [0, 0, 0]),
+    ({'fumbled_1_player_id': np.nan, 'receiver_player_id': None}, [0, 0, 0]),
+    ({'fumbled_1_player_id': None, 'fumbled_1_team': None, 'rusher_player_id': np.nan}, [0, 0, 0]),
+])
+def test_fumble_cases(columns, expected):
+    plays = play(**columns)
+    assert fumble_lost_flags(plays).iloc[0].tolist() == expected
+    assert [fumble_rule(plays.iloc[0], c) for c in fumble_player_columns.values()] == expected
@@ -0,0 +1,43 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip('nfl_data_py')
+
+from data_ingestion_pipeline import aggregate_player_games
+
+
+@pytest.fixture
+def plays():
+    """ the targets of one receiver in one game"""
+    columns = ['play_type', 'pass_attempt', 'complete_pass', 'down', 'yardline_100', 'air_yards', 'yards_after_catch',
+               'receiving_yards', 'yards_gained', 'touchdown', 'first_down', 'epa']
+    rows = [
+        # a 15 yard catch
+        ['pass', 1, 1, 1, 50, 10, 5, 15, 15, 0, 1, 1.0],
+        # incomplete
+        ['pass', 1, 0, 2, 35, 20, np.nan, 0, 0, 0, 0, -0.5],
+        # complete_pass is missing, a target but neither a catch nor unrealized air yards
+        ['pass', 1, np.nan, 3, 35, 30, np.nan, 0, 0, 0, 0, -1.0],
+        # an 8 yard touchdown in the red zone
+        ['pass', 1, 1, 3, 8, 8, 0, 8, 8, 1, 1, 2.0],
+    ]
+    df = pd.DataFrame(rows, columns = columns)
+    return df.assign(
+        receiver_player_id = '00-w', game_id = '2023_01_DET_KC', receiver_fumble_lost = 0, fumble_lost = 0,
+        is_two_point_conversion = 0, score_differential = 0, game_seconds_remaining = 1800,
+    )
+
+
+def test_receiving_stats(plays):
+    game = aggregate_player_games(plays).iloc[0]
+    assert game[['receptions', 'receiving_yards', 'receiving_touchdowns', 'total_targets', 'rz_targets', 'receiving_first_downs']].tolist() == [2, 23, 1, 4, 1, 2]
+    assert game[['air_yards', 'max_target_depth', 'avg_yac', 'receiving_fpoints', 'receiving_epa']].astype(float).round(6).tolist() == [68, 30, 2.5, 10.3, 1.5]
+    assert game['racr'] == pytest.approx(23 / 68)
+
+
+def test_unrealized_air_yards_need_an_incomplete_pass(plays):
+    # only the plain incompletion counts, like the notebook's complete_pass == 0
+    assert aggregate_player_games(plays)['unrealized_air_yards'].tolist() == [20]
+    notebook = plays[(plays['pass_attempt'] == 1) & (plays['complete_pass'] == 0)]['air_yards'].sum()
+    assert notebook == 20
@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+
+from players import attach_player_ids, build_player_index, correct_player_ids, player_ids, player_keys
+
+
+def id_map():
+    """ a few rows of nfl.import_ids: the espn and sleeper ids come as floats, some are missing"""
+    return pd.DataFrame({
+        'gsis_id': ['00-0034439', '00-0034270', '00-0033873', None],
+        'pfr_id': ['ConkTy00', 'IzzoRy00', 'MahoPa00', 'NewbJo00'],
+        'espn_id': [3915486.0, 3128724.0, 3139477.0, np.nan],
+        'sleeper_id': [5022.0, np.nan, 4046.0, 9999.0],
+        'name': ['Tyler Conklin', 'Ryan Izzo', 'Patrick Mahomes', 'Joe Newby'],
+    })
+
+
+def test_id_corrections_swap():
+    ids = id_map()
+    correct_player_ids(ids)
+    # Conklin moves onto the id the id map gave Izzo, and Izzo gets the placeholder, both at once
+    assert ids['gsis_id'].tolist()[:3] == ['00-0034270', '11-1111111', '00-0033873']
+
+
+def test_ids_resolve_across_sources():
+    ids = id_map()
+    correct_player_ids(ids)
+    index = build_player_index(ids, path = None)
+    assert index['player_key'].tolist() == [0, 1, 2, 3]
+
+    conklin = [player_keys(['00-0034270'], 'gsis', index), player_keys(['ConkTy00'], 'pfr', index),
+               player_keys([3915486], 'espn', index), player_keys(['5022'], 'sleeper', index), player_keys(['Tyler Conklin'], 'name', index)]
+    assert [k.tolist() for k in conklin] == [[0]] * 5
+    # unknown ids (and a missing one) are -1
+    assert player_keys(['00-0034439', None, 'NoneSu00'], 'gsis', index).tolist() == [-1, -1, -1]
+
+    assert player_ids(np.array([2, -1, 3]), index).tolist() == ['00-0033873', None, None]
+    assert player_ids(np.array([1]), index, source = 'espn').tolist() == ['3128724']
+
+    pfr = pd.DataFrame({'pfr_player_id': ['MahoPa00', 'Unknown0', 'ConkTy00'], 'rec': [1, 2, 3]})
+    attached = attach_player_ids(pfr, 'pfr_player_id', 'pfr', index)
+    assert attached[['rec', 'player_key', 'player_id']].values.tolist() == [[1, 2, '00-0033873'], [3, 0, '00-0034270']]
+
+
+def test_keys_survive_rebuilds(tmp_path):
+    path = str(tmp_path / 'player_index.parquet')
+    ids = id_map()
+    correct_player_ids(ids)
+    build_player_index(ids, path = path)
+
+    # next season: Mahomes is listed first, Newby got a gsis id, Izzo dropped out and there is a rookie
+    later = pd.concat([ids.iloc[[2, 0, 3]], pd.DataFrame({'gsis_id': ['00-0039999'], 'pfr_id': ['RookAa00'], 'name': ['Aaron Rookie']})], ignore_index = True)
+    later.loc[2, 'gsis_id'] = '00-0038888'
+    index = build_player_index(later, path = path)
+
+    assert player_keys(['00-0033873', '00-0034270', '00-0038888', '00-0039999'], 'gsis', index).tolist() == [2, 0, 3, 4]
+    # Izzo keeps their row, so the key is never reused
+    assert player_keys(['IzzoRy00'], 'pfr', index).tolist() == [1]
+    pd.testing.assert_frame_equal(pd.read_parquet(path), index, check_dtype = False)
@@ -0,0 +1,125 @@
+import pandas as pd
+import pytest
+
+pytest.importorskip('nfl_data_py')
+
+from prepare_data import PrepData, lag_columns, non_lag_columns
+from stage_cache import StageCache
+
+
+def lookback_loop(raw, n, roll_window):
+    """ the row by row top n filter get_top_n replaced, kept here as the reference"""
+    wrs = raw.sort_values(by = ['season', 'week', 'receiving_fpoints'], ascending = [True, True, False]).copy()
+    wrs = wrs.groupby(['season', 'week']).head(n)
+
+    temp = pd.DataFrame(columns = raw.columns)
+    for idx, row in wrs.iterrows():
+        if row['week'] == 1:
+            continue
+        week = row['week']
+        final_week = max(week - roll_window, 1)
+        for pweek in range(week - 1, final_week - 1, -1):
+            if len(wrs[(wrs['season'] == row['season']) & (wrs['week'] == pweek) & (wrs['player_id'] == row['player_id'])]) == 0:
+                temp = pd.concat([temp, raw[(raw['season'] == row['season']) & (raw['week'] == pweek) & (raw['player_id'] == row['player_id'])]],
+                                 ignore_index = True)
+
+    return pd.concat([wrs, temp], ignore_index = True).sort_values(by = ['season', 'player_id', 'week']).drop_duplicates()
+
+
+def window_loop(wr_stats, roll_window):
+    """ the groupby rolling + row by row new_week window_data replaced, kept here as the reference"""
+    new_dataset = wr_stats[non_lag_columns]
+    rolling_av = wr_stats[lag_columns].sort_values(by = ['player_id', 'season', 'week'])
+    rolling_av = rolling_av.set_index(['week', 'game_id']).groupby(['player_id', 'season']).rolling(roll_window, min_periods = roll_window).mean().reset_index().rename({'receiving_fpoints': 'past_fpoints'}, axis = 1)
+
+    for idx, row in new_dataset.iterrows():
+        same_player = (rolling_av.season == row.season) & (rolling_av.player_id == row.player_id)
+        temp_week = rolling_av[same_player & (rolling_av.week < row.week)].week.max()
+        rolling_av.loc[rolling_av[same_player & (rolling_av.week == temp_week)].index, 'new_week'] = row.week
+
+    windowed = new_dataset.merge(rolling_av.drop('game_id', axis = 1),
+                                 left_on = ['player_id', 'season', 'week'],
+                                 right_on = ['player_id', 'season', 'new_week'],
+                                 suffixes = ('', '_remove'))
+    windowed = windowed.drop([x for x in windowed.columns if '_remove' in x], axis = 1)
+    return windowed.dropna(subset = rolling_av.columns.tolist())
+
+
+def same_rows(left, right, keys):
+    """ compares two frames ignoring row/column order and int vs float for the same numbers"""
+    left = left.sort_values(keys).reset_index(drop = True)
+    right = right.sort_values(keys).reset_index(drop = True)
+    pd.testing.assert_frame_equal(left, right[left.columns], check_dtype = False, check_like = True)
+
+
+def prep(raw, **kwargs):
+    data = PrepData(**kwargs)
+    data._raw_wr_stats = raw
+    return data
+
+
+# the reference loop concats onto an empty frame, which pandas warns about
+@pytest.mark.filterwarnings('ignore::FutureWarning')
+@pytest.mark.parametrize('n, roll_window', [(10, 2), (25, 3)])
+def test_get_top_n_matches_lookback_loop(wr_stats, n, roll_window):
+    data = prep(wr_stats)
+    data.get_top_n(n = n, roll_window = roll_window, viz = False)
+
+    expected = lookback_loop(wr_stats, n, roll_window)
+    assert len(data._wr_stats) == len(expected)
+    same_rows(data._wr_stats, expected, ['season', 'player_id', 'week'])
+
+
+def test_window_data_matches_row_loop(wr_stats):
+    data = prep(wr_stats)
+    data.get_top_n(n = 10, roll_window = 2, viz = False)
+    data.window_data()
+
+    expected = window_loop(data._wr_stats, 2)
+    assert len(data._windowed_data) == len(expected)
+    same_rows(data._windowed_data, expected, ['season', 'player_id', 'week'])
+
+
+def test_window_data_extra_windows_match_pandas(wr_stats):
+    data = prep(wr_stats, roll_windows = [2, 6], ewm_spans = [3])
+    data.get_top_n(n = 10, roll_window = 2, viz = False)
+    data.window_data()
+
+    # the extra features look at every earlier game of the season in the raw stats, not just the top n cut
+    raw = wr_stats.sort_values(['player_id', 'season', 'week'])
+    grouped = raw.groupby(['player_id', 'season'])['receiving_fpoints']
+    expected = raw[['player_id', 'season', 'week']].assign(
+        roll6 = grouped.transform(lambda s: s.rolling(6, min_periods = 1).mean().shift(1)),
+        ewm3 = grouped.transform(lambda s: s.ewm(span = 3).mean().shift(1)),
+    )
+    windowed = data._windowed_data.merge(expected, on = ['player_id', 'season', 'week'], how = 'left')
+    assert len(windowed) == len(data._windowed_data) == len(window_loop(data._wr_stats, 2))
+
+    # roll_window = 2 stays the main window, so there is no separate _roll2
+    assert 'past_fpoints_roll2' not in windowed.columns
+    pd.testing.assert_series_equal(windowed['past_fpoints_roll6'], windowed['roll6'], check_names = False)
+    pd.testing.assert_series_equal(windowed['past_fpoints_ewm3'], windowed['ewm3'], check_names = False)
+
+
+def test_stages_load_from_the_cache(wr_stats, tmp_path, capsys):
+    cache = StageCache(path = str(tmp_path))
+    first = prep(wr_stats, cache = cache)
+    first.get_top_n(n = 10, viz = False)
+    first.window_data()
+    assert 'from the cache' not in capsys.readouterr().out
+
+    # a second run over the same input never recomputes a stage
+    second = prep(wr_stats.copy(), cache = cache)
+    second.get_top_n(n = 10, viz = False)
+    second.window_data()
+    out = capsys.readouterr().out
+    assert 'Loaded get_top_n from the cache' in out and 'Loaded window_data from the cache' in out
+    pd.testing.assert_frame_equal(second._windowed_data, first._windowed_data)
+
+    # a changed input misses
+    changed = wr_stats.assign(receiving_fpoints = wr_stats['receiving_fpoints'] + 1)
+    third = prep(changed, cache = cache)
+    third.get_top_n(n = 10, viz = False)
+    third.window_data()
+    assert 'from the cache' not in capsys.readouterr().out
+    assert not third._windowed_data['past_fpoints'].equals(first._windowed_data['past_fpoints'])
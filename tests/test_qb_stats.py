@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from qb_stats import passer_rating, qb_game_stats, qb_starters
+
+
+def test_passer_rating_known_seasons():
+    # Tom Brady 2007 (398/578, 4806 yds, 50 td, 8 int) and Aaron Rodgers 2011 (343/502, 4643 yds, 45 td, 6 int)
+    comp, att, yds, td, ints = np.array([[398, 578, 4806, 50, 8], [343, 502, 4643, 45, 6]], dtype = float).T
+    assert passer_rating(comp / att, yds / att, td / att, ints / att).round(1).tolist() == [117.2, 122.5]
+
+
+def test_passer_rating_is_clamped():
+    # perfect: every component capped at 2.375, even way past it. nothing: every component floored at 0. the last one
+    # only gets the completion component (5 * (0.5 - 0.3) = 1), the others are floored
+    ratings = passer_rating([1.0, 0.0, 0.5], [20.0, 0.0, 1.0], [0.5, 0.0, 0.0], [0.0, 0.3, 0.2])
+    assert ratings.round(1).tolist() == [158.3, 0.0, 16.7]
+
+
+def test_qb_game_stats():
+    plays = pd.DataFrame({
+        'passer_player_id': ['00-q'] * 5,
+        'game_id': '2023_01_DET_KC',
+        'posteam': 'KC',
+        'week': 1,
+        'play_type': ['pass', 'pass', 'pass', 'pass', 'run'],
+        'complete_pass': [1, 1, 0, 0, 0],
+        'passing_yards': [30, 10, 0, 0, 0],
+        'touchdown': [1, 0, 0, 0, 0],
+        'interception': [0, 0, 1, 0, 0],
+        'down': [1, 2, 3, np.nan, 1],
+    })
+    qb = qb_game_stats(plays).iloc[0]
+    assert qb[['completions', 'attempts', 'passing_yards', 'touchdowns', 'interceptions', 'qb_num_snaps']].tolist() == [2, 4, 40, 1, 1, 4]
+    assert qb['QBR'] == pytest.approx(passer_rating([0.5], [10.0], [0.25], [0.25])[0])
+
+
+def test_qb_starters_flags_new_starters():
+    rows = [
+        # game, season, week, player, depth
+        ['2023_01', 2023, 1, 'A', 1], ['2023_01', 2023, 1, 'B', 2],
+        ['2023_02', 2023, 2, 'A', 1],
+        # A hurt, B starts
+        ['2023_03', 2023, 3, 'B', 1], ['2023_03', 2023, 3, 'A', 2],
+        # after the bye in week 4, always a change
+        ['2023_05', 2023, 5, 'B', 1],
+        # a tie goes to the first one listed
+        ['2023_06', 2023, 6, 'B', 1], ['2023_06', 2023, 6, 'C', 1],
+        # a new season starts without a change
+        ['2024_01', 2024, 1, 'C', 1],
+        ['2024_02', 2024, 2, 'C', 1],
+    ]
+    qbs = pd.DataFrame(rows, columns = ['game_id', 'season', 'week', 'player_id', 'depth_team']).assign(team = 'KC')
+    # another team's starters don't leak in
+    qbs = pd.concat([qbs, pd.DataFrame({'game_id': ['2023_02'], 'season': [2023], 'week': [2], 'player_id': ['X'], 'depth_team': [1], 'team': ['BUF']})], ignore_index = True)
+
+    starters = qb_starters(qbs)
+    kc = starters[starters['team'] == 'KC']
+    assert kc['player_id'].tolist() == ['A', 'A', 'B', 'B', 'B', 'C', 'C']
+    assert kc['is_new_qb_starter'].tolist() == [0, 0, 1, 1, 0, 0, 0]
+    assert starters.loc[starters['team'] == 'BUF', 'is_new_qb_starter'].tolist() == [1]
@@ -0,0 +1,92 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from scoring import SCORING_RULES, custom_rules, defense_fpoints_allowed, player_game_fpoints, score_plays
+
+
+def notebook_fpoints(x, possession_type):
+    """ the per play formula of the dataset creation notebook (4 pt passing td ppr), kept here as the reference"""
+    if possession_type == 'pass':
+        return x['passing_yards'] / 25 + x['pass_touchdown'] * 4 + 2 * x['is_two_point_conversion'] - 2 * x['interception'] - 2 * x['passer_fumble_lost']
+    if possession_type == 'rush':
+        return x['rushing_yards'] / 10 + x['touchdown'] * 6 + 2 * x['is_two_point_conversion'] - 2 * x['rusher_fumble_lost']
+    return x['receiving_yards'] / 10 + 1 * x['complete_pass'] + x['touchdown'] * 6 + 2 * x['is_two_point_conversion'] - 2 * x['receiver_fumble_lost']
+
+
+@pytest.fixture
+def plays():
+    """ one game of the QB q, the WR w and the RB r against BUF. the points in the comments are ppr"""
+    columns = ['passer_player_id', 'receiver_player_id', 'rusher_player_id', 'passing_yards', 'receiving_yards', 'rushing_yards',
+               'complete_pass', 'pass_touchdown', 'touchdown', 'is_two_point_conversion', 'interception',
+               'passer_fumble_lost', 'receiver_fumble_lost', 'rusher_fumble_lost']
+    rows = [
+        # 25 yard td pass: q 1 + 4, w 2.5 + 1 + 6
+        ['q', 'w', None, 25, 25, 0, 1, 1, 1, 0, 0, 0, 0, 0],
+        # 12 yard run: r 1.2
+        [None, None, 'r', 0, 0, 12, 0, 0, 0, 0, 0, 0, 0, 0],
+        # two point pass: q 2, w 2
+        ['q', 'w', None, 0, 0, 0, 0, 0, 0, 1, 0, 0, 0, 0],
+        # two point run: r 2
+        [None, None, 'r', 0, 0, 0, 0, 0, 0, 1, 0, 0, 0, 0],
+        # intercepted: q -2, w 0
+        ['q', 'w', None, 0, 0, 0, 0, 0, 0, 0, 1, 0, 0, 0],
+        # 10 yard catch and a lost fumble: q 0.4, w 1 + 1 - 2
+        ['q', 'w', None, 10, 10, 0, 1, 0, 0, 0, 0, 0, 1, 0],
+        # a catch without receiving yards: q 0.2, w is NaN for the play and gets nothing
+        ['q', 'w', None, 5, np.nan, 0, 1, 0, 0, 0, 0, 0, 0, 0],
+    ]
+    df = pd.DataFrame(rows, columns = columns)
+    return df.assign(game_id = '2023_01_BUF_KC', defteam = 'BUF', week = 1)
+
+
+def totals(plays, rules):
+    games = player_game_fpoints(plays, rules).set_index('player_id')
+    return games['total_fpoints'].round(6).to_dict()
+
+
+@pytest.mark.parametrize('rules, expected', [
+    ('ppr', {'q': 5.6, 'w': 11.5, 'r': 3.2}),
+    ('half_ppr', {'q': 5.6, 'w': 10.5, 'r': 3.2}),
+    ('standard', {'q': 5.6, 'w': 9.5, 'r': 3.2}),
+])
+def test_hand_scored_totals(plays, rules, expected):
+    assert totals(plays, rules) == expected
+
+
+def test_custom_rules(plays):
+    six_pt = custom_rules('ppr', {'pass': {'pass_touchdown': 6}})
+    assert totals(plays, six_pt) == {'q': 7.6, 'w': 11.5, 'r': 3.2}
+    # the base rules are left alone
+    assert SCORING_RULES['ppr']['pass']['pass_touchdown'] == 4
+
+    # a role can be dropped to nothing, the other roles don't move
+    no_2pt = custom_rules('ppr', {role: {'is_two_point_conversion': 0} for role in ['pass', 'rush', 'rec']})
+    assert totals(plays, no_2pt) == {'q': 3.6, 'w': 9.5, 'r': 1.2}
+
+
+def test_two_point_credit(plays):
+    two_point = plays[plays['is_two_point_conversion'] == 1]
+    scores = score_plays(two_point)
+    # the pass credits both the passer and the receiver, the run the rusher
+    assert scores.loc[two_point['passer_player_id'].notna(), ['pass_fpoints', 'rec_fpoints']].to_numpy().tolist() == [[2, 2]]
+    assert scores.loc[two_point['rusher_player_id'].notna(), 'rush_fpoints'].tolist() == [2]
+
+
+def test_missing_yardage_matches_notebook(plays):
+    scores = score_plays(plays)
+    assert scores['rec_fpoints'].isna().tolist() == plays['receiving_yards'].isna().tolist()
+
+    # the notebook summed its per play formula, which skips the NaN plays too
+    games = player_game_fpoints(plays).set_index('player_id')
+    for role, player_col in [('pass', 'passer_player_id'), ('rush', 'rusher_player_id'), ('rec', 'receiver_player_id')]:
+        expected = notebook_fpoints(plays, role).groupby(plays[player_col]).sum()
+        assert games.loc[expected.index, f'{role}_fpoints'].to_numpy() == pytest.approx(expected.to_numpy())
+
+
+def test_defense_fpoints_allowed(plays):
+    positions = pd.DataFrame({'player_id': ['q', 'w', 'r'], 'game_id': '2023_01_BUF_KC', 'position': ['QB', 'WR', 'RB']})
+    allowed = defense_fpoints_allowed(plays, positions).iloc[0]
+    assert allowed[['total_qb_fpoints_given_up', 'total_rb_fpoints_given_up', 'total_wr_fpoints_given_up']].astype(float).round(6).tolist() == [5.6, 3.2, 11.5]
+    # nobody played TE
+    assert np.isnan(allowed['total_te_fpoints_given_up'])
@@ -0,0 +1,40 @@
+import pandas as pd
+
+from season_calendar import attach_games, build_games, current_season, is_regular_season, season_weeks
+
+
+def schedule(season, last_week):
+    """ a schedule with one game a week, the regular season runs to last_week and then there is a playoff game"""
+    weeks = list(range(1, last_week + 2))
+    return pd.DataFrame({
+        'game_id': [f'{season}_{w:02d}_KC_BUF' for w in weeks],
+        'season': season,
+        'week': weeks,
+        'game_type': ['REG'] * last_week + ['WC'],
+        'home_team': 'BUF',
+        'away_team': 'KC',
+    })
+
+
+def test_season_weeks_come_from_the_schedule():
+    games = build_games(pd.concat([schedule(2021, 18), schedule(2020, 17)], ignore_index = True))
+    assert season_weeks(games).to_dict() == {2020: 17, 2021: 18}
+    # sorted by season and week, the row is the game key
+    assert games['game_id'].iloc[[0, -1]].tolist() == ['2020_01_KC_BUF', '2021_19_KC_BUF']
+
+
+def test_is_regular_season():
+    games = build_games(pd.concat([schedule(2020, 17), schedule(2021, 18)], ignore_index = True))
+    # week 18 is the playoffs in 2020 and the regular season from 2021 on, a game that's not on the schedule is neither
+    plays = pd.DataFrame({'game_id': ['2020_17_KC_BUF', '2020_18_KC_BUF', '2021_18_KC_BUF', '2021_19_KC_BUF', '2019_01_KC_BUF']})
+    assert is_regular_season(plays, games).tolist() == [True, False, True, False, False]
+
+    attached = attach_games(plays, games, columns = ['season', 'week'])
+    assert attached['week'].tolist()[:4] == [17, 18, 18, 19]
+    assert attached['season'].isna().tolist() == [False, False, False, False, True]
+
+
+def test_current_season():
+    assert current_season(pd.Timestamp('2024-09-05')) == 2024
+    assert current_season(pd.Timestamp('2025-02-09')) == 2024
+    assert current_season(pd.Timestamp('2025-08-31')) == 2024
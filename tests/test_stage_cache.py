@@ -0,0 +1,153 @@
+import os
+
+import pandas as pd
+import pytest
+
+import stage_cache
+from stage_cache import DatasetCache, StageCache, frame_fingerprint, stage_key
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """ a clock that moves a second every time it is read, so the last_used order never ties"""
+    now = [1000.0]
+
+    def tick():
+        now[0] += 1
+        return now[0]
+    monkeypatch.setattr(stage_cache.time, 'time', tick)
+    return now
+
+
+def frame(seed):
+    return pd.DataFrame({'a': range(seed, seed + 50), 'b': [float(seed)] * 50})
+
+
+def entry_bytes(tmp_path):
+    probe = StageCache(path = str(tmp_path / 'probe'))
+    probe.put('probe', {'df': frame(0)})
+    return probe.size()
+
+
+def test_round_trip_and_persistence(tmp_path):
+    cache = StageCache(path = str(tmp_path / 'cache'))
+    assert cache.get('missing') is None
+    cache.put('k', {'df': frame(1), 'other': frame(2)}, stage = 'clean_data')
+
+    # a new cache on the same directory reads the index back
+    frames = StageCache(path = str(tmp_path / 'cache')).get('k')
+    pd.testing.assert_frame_equal(frames['df'], frame(1))
+    pd.testing.assert_frame_equal(frames['other'], frame(2))
+
+
+def test_least_recently_used_is_evicted(tmp_path, clock):
+    cache = StageCache(path = str(tmp_path / 'cache'), max_bytes = int(entry_bytes(tmp_path) * 2.5))
+    cache.put('a', {'df': frame(1)})
+    cache.put('b', {'df': frame(2)})
+    # reading a makes b the least recently used one
+    assert cache.get('a') is not None
+    cache.put('c', {'df': frame(3)})
+
+    assert cache.get('b') is None
+    assert not os.path.exists(tmp_path / 'cache' / 'b')
+    assert cache.get('a') is not None and cache.get('c') is not None
+    assert cache.size() <= cache._max_bytes
+
+
+def test_an_entry_over_budget_is_kept(tmp_path, clock):
+    cache = StageCache(path = str(tmp_path / 'cache'), max_bytes = 1)
+    cache.put('a', {'df': frame(1)})
+    cache.put('b', {'df': frame(2)})
+    # only the entry just written survives
+    assert cache.get('a') is None
+    pd.testing.assert_frame_equal(cache.get('b')['df'], frame(2))
+
+
+def test_invalidate(tmp_path):
+    cache = StageCache(path = str(tmp_path / 'cache'))
+    cache.put('a', {'df': frame(1)}, stage = 'get_top_n')
+    cache.put('b', {'df': frame(2)}, stage = 'get_top_n')
+    cache.put('c', {'df': frame(3)}, stage = 'window_data')
+
+    cache.invalidate(key = 'a')
+    assert cache.get('a') is None and cache.get('b') is not None
+    cache.invalidate(stage = 'get_top_n')
+    assert cache.get('b') is None and cache.get('c') is not None
+    cache.invalidate()
+    assert cache.get('c') is None and cache.size() == 0
+
+
+def test_missing_files_are_a_miss(tmp_path):
+    cache = StageCache(path = str(tmp_path / 'cache'))
+    cache.put('a', {'df': frame(1)})
+    os.remove(tmp_path / 'cache' / 'a' / 'df.parquet')
+    assert cache.get('a') is None
+    assert 'a' not in cache._index
+
+
+def test_keys():
+    assert stage_key(None, 'get_top_n', {'n': 10}) == stage_key(None, 'get_top_n', {'n': 10})
+    assert stage_key(None, 'get_top_n', {'n': 10}) != stage_key(None, 'get_top_n', {'n': 11})
+
+    frames = {'x': frame(1), 'y': frame(2)}
+    assert frame_fingerprint(frames) == frame_fingerprint({'y': frame(2), 'x': frame(1)})
+    assert frame_fingerprint(frames) != frame_fingerprint({'x': frame(1), 'y': frame(3)})
+    # same values, different dtype
+    assert frame_fingerprint(frames) != frame_fingerprint({'x': frame(1).astype({'a': float}), 'y': frame(2)})
+
+
+class Fetch():
+    """ a stand in for an nfl_data_py importer that counts its calls"""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, years):
+        self.calls.append(years)
+        return pd.DataFrame({'season': years or [0], 'version': [len(self.calls)] * len(years or [0])})
+
+
+def age(path, seconds):
+    """ makes the file at path look seconds old"""
+    then = os.path.getmtime(path) - seconds
+    os.utime(path, (then, then))
+
+
+def test_finished_seasons_are_downloaded_once(tmp_path):
+    cache = DatasetCache(path = str(tmp_path / 'raw'), ttl = 60, live_season = 2024)
+    fetch = Fetch()
+    cache.get('weekly', fetch, 2022)
+    age(cache.file_path('weekly', 2022), 10**6)
+    assert cache.get('weekly', fetch, 2022)['version'].tolist() == [1]
+    assert fetch.calls == [[2022]]
+
+
+def test_live_data_expires_after_the_ttl(tmp_path):
+    cache = DatasetCache(path = str(tmp_path / 'raw'), ttl = 60, live_season = 2024)
+    fetch = Fetch()
+    for season in [2024, None]:
+        cache.get('weekly', fetch, season)
+        # still fresh
+        cache.get('weekly', fetch, season)
+        age(cache.file_path('weekly', season), 120)
+        assert not cache.is_fresh(cache.file_path('weekly', season), season)
+        cache.get('weekly', fetch, season)
+    assert fetch.calls == [[2024], [2024], None, None]
+    assert cache.get('weekly', fetch, 2024)['version'].tolist() == [2]
+
+
+def test_offline_mirror(tmp_path):
+    mirror = str(tmp_path / 'mirror')
+    online = DatasetCache(path = mirror, ttl = 60, live_season = 2024)
+    fetch = Fetch()
+    online.get('weekly', fetch, 2024)
+    age(online.file_path('weekly', 2024), 10**6)
+
+    # offline anything in the mirror is served, however old, and nothing is ever fetched
+    offline = DatasetCache(path = str(tmp_path / 'raw'), ttl = 60, offline = True, mirror = mirror, live_season = 2024)
+    assert offline.file_path('weekly', 2024).startswith(mirror)
+    assert offline.get('weekly', fetch, 2024)['version'].tolist() == [1]
+    with pytest.raises(FileNotFoundError):
+        offline.get('weekly', fetch, 2023)
+    assert fetch.calls == [[2024]]
+    assert not os.path.exists(tmp_path / 'raw')
@@ -0,0 +1,36 @@
+import pandas as pd
+
+from teams import TEAM_DTYPE, TEAM_IDS, normalize_team_column, normalize_teams, team_dimension, team_ids
+
+
+def test_aliases():
+    codes = pd.Series(['LA', 'STL', 'WSH', 'LVR', 'OAK', 'KC', None])
+    normalized = normalize_team_column(codes)
+    assert normalized.dtype == TEAM_DTYPE
+    assert normalized.astype(object).tolist()[:6] == ['LAR', 'LAR', 'WAS', 'LV', 'LV', 'KC']
+    assert normalized.isna().tolist() == [False] * 6 + [True]
+    assert team_ids(normalized).tolist() == [18, 18, 32, 19, 19, 16, 0]
+
+
+def test_normalize_teams():
+    df = pd.DataFrame({
+        'posteam': ['LA', 'WSH'],
+        'defteam': ['LVR', 'SF'],
+        # not club codes, left alone
+        'posteam_type': ['home', 'away'],
+        'team': ['LA', 'FA'],
+    })
+    assert normalize_teams(df) == ['posteam', 'defteam']
+    assert df['posteam'].astype(object).tolist() == ['LAR', 'WAS']
+    assert df['posteam_type'].tolist() == ['home', 'away']
+    assert df['team'].tolist() == ['LA', 'FA']
+
+    # asked for by name, the aliases are mapped even next to values that aren't teams
+    assert normalize_teams(df, ['team']) == []
+    assert df['team'].tolist() == ['LAR', 'FA']
+
+
+def test_team_dimension():
+    dimension = team_dimension()
+    assert len(dimension[dimension['code'] == dimension['team'].astype(object)]) == len(TEAM_IDS)
+    assert dimension.loc[dimension['code'] == 'WSH', 'team_id'].tolist() == [TEAM_IDS['WAS']]